@@ -0,0 +1,6 @@
+"""
+Benchmarks of the system data hot paths: ingesting the EDDB dump, system lookups and nearest-system queries.
+
+Run from the repository root in an environment with the integration's requirements installed:
+python -m benchmarks --sizes 10000 100000 --output results.json
+"""
@@ -0,0 +1,4 @@
+"""Runs the benchmarks, see benchmarks.run"""
+from .run import main
+
+main()
@@ -0,0 +1,141 @@
+"""Generates synthetic EDDB systems_populated.json dumps"""
+import json
+import random
+from typing import Any, Dict, Iterator, NamedTuple, Optional, Set, Tuple
+
+from custom_components.ed_integration.db import SYSTEM_COLUMNS
+
+POWERS = (
+    "Aisling Duval", "Archon Delaine", "Arissa Lavigny-Duval", "Denton Patreus", "Edmund Mahon", "Felicia Winters",
+    "Li Yong-Rui", "Pranav Antal", "Yuri Grom", "Zachary Hudson", "Zemina Torval",
+)
+# (id, name, weight) as used by EDDB, weights roughly follow the shares in the real dump
+POWER_STATES = ((16, "Control", 0.12), (32, "Exploited", 0.83), (48, "Contested", 0.05))
+GOVERNMENTS = (
+    (16, "Anarchy", 0.05), (32, "Communism", 0.03), (48, "Confederacy", 0.1), (64, "Corporate", 0.3),
+    (80, "Cooperative", 0.05), (96, "Democracy", 0.17), (112, "Dictatorship", 0.12), (128, "Feudal", 0.06),
+    (144, "Patronage", 0.1), (150, "Prison Colony", 0.01), (208, "Theocracy", 0.01),
+)
+ALLEGIANCES = ((1, "Alliance", 0.22), (2, "Empire", 0.25), (3, "Federation", 0.3), (4, "Independent", 0.23))
+SECURITIES = ((16, "Low", 0.4), (32, "Medium", 0.35), (48, "High", 0.2), (64, "Anarchy", 0.05))
+ECONOMIES = (
+    (1, "Agriculture", 0.15), (2, "Extraction", 0.2), (3, "High Tech", 0.12), (4, "Industrial", 0.2),
+    (5, "Military", 0.03), (6, "Refinery", 0.15), (7, "Service", 0.05), (8, "Terraforming", 0.03),
+    (9, "Tourism", 0.05), (10, "Colony", 0.02),
+)
+RESERVE_TYPES = ((1, "Pristine", 0.1), (2, "Major", 0.3), (3, "Common", 0.4), (4, "Low", 0.15), (5, "Depleted", 0.05))
+FACTION_COUNT = 5000
+POWER_SHARE = 0.35  # share of systems within reach of a power's headquarters that are controlled or exploited
+POWER_REACH = 120.0  # ly
+BUBBLE_SPREAD = 110.0  # ly, standard deviation of the coordinates around Sol
+COLONIA = (-9530.5, -910.28125, 19808.125)
+COLONIA_SHARE = 0.03
+COLONIA_SPREAD = 30.0  # ly
+UPDATED_AT_START = 1577836800  # 2020-01-01
+UPDATED_AT_SPAN = 180 * 24 * 3600  # s
+
+
+class DumpInfo(NamedTuple):
+    """
+    Summary of a written dump.
+    """
+
+    path: str
+    systems: int
+    size: int
+    controlling_powers: Set[str]
+
+
+def _weighted(rng: random.Random, choices: Tuple[Tuple[int, str, float], ...]) -> Tuple[int, str]:
+    choice = rng.choices(choices, weights=[weight for _, _, weight in choices])[0]
+    return choice[0], choice[1]
+
+
+def _position(rng: random.Random) -> Tuple[float, float, float]:
+    if rng.random() < COLONIA_SHARE:
+        centre, spread = COLONIA, COLONIA_SPREAD
+    else:
+        centre, spread = (0.0, 0.0, 0.0), BUBBLE_SPREAD
+    # the galactic plane is thin, y spreads less than x and z
+    return (
+        round(rng.gauss(centre[0], spread), 5),
+        round(rng.gauss(centre[1], spread / 3), 5),
+        round(rng.gauss(centre[2], spread), 5),
+    )
+
+
+def iter_systems(count: int, seed: int = 0) -> Iterator[Dict[str, Any]]:
+    """
+    Generates synthetic populated systems, deterministic for a seed.
+    System n is named "Synthetic n" and has the EDDB id n + 1.
+    :param count: number of systems
+    :param seed: seed of the random generator
+    :return: iterator of system dicts with the keys of the EDDB systems JSON
+    """
+    rng = random.Random(seed)
+    headquarters = [_position(rng) for _ in POWERS]
+    for n in range(count):
+        x, y, z = _position(rng)
+        power: Optional[str] = None
+        power_state: Tuple[Optional[int], Optional[str]] = (None, None)
+        distance, nearest = min(
+            ((x - hq[0]) ** 2 + (y - hq[1]) ** 2 + (z - hq[2]) ** 2, i) for i, hq in enumerate(headquarters)
+        )
+        if distance < POWER_REACH ** 2 and rng.random() < POWER_SHARE:
+            power = POWERS[nearest]
+            power_state = _weighted(rng, POWER_STATES)
+        government = _weighted(rng, GOVERNMENTS)
+        allegiance = _weighted(rng, ALLEGIANCES)
+        security = _weighted(rng, SECURITIES)
+        economy = _weighted(rng, ECONOMIES)
+        reserve_type = _weighted(rng, RESERVE_TYPES)
+        faction_id = rng.randrange(FACTION_COUNT)
+        values = {
+            "id": n + 1,
+            "edsm_id": n + 1,
+            "name": f"Synthetic {n}",
+            "x": x,
+            "y": y,
+            "z": z,
+            "population": int(rng.lognormvariate(15, 3)),
+            "is_populated": True,
+            "government_id": government[0],
+            "government": government[1],
+            "allegiance_id": allegiance[0],
+            "allegiance": allegiance[1],
+            "security_id": security[0],
+            "security": security[1],
+            "primary_economy_id": economy[0],
+            "primary_economy": economy[1],
+            "power": power,
+            "power_state": power_state[1],
+            "power_state_id": power_state[0],
+            "needs_permit": rng.random() < 0.01,
+            "updated_at": UPDATED_AT_START + rng.randrange(UPDATED_AT_SPAN),
+            "controlling_minor_faction_id": faction_id,
+            "controlling_minor_faction": f"Synthetic Faction {faction_id}",
+            "reserve_type_id": reserve_type[0],
+            "reserve_type": reserve_type[1],
+        }
+        yield {column: values[column] for column in SYSTEM_COLUMNS}
+
+
+def write_dump(path: str, count: int, seed: int = 0) -> DumpInfo:
+    """
+    Writes a synthetic systems_populated.json, one system at a time.
+    :param path: file to write
+    :param count: number of systems
+    :param seed: seed of the random generator
+    :return: summary of the dump
+    """
+    size = 0
+    controlling_powers = set()
+    with open(path, "w") as dump:
+        separator = "["
+        for system in iter_systems(count, seed):
+            size += dump.write(separator + json.dumps(system))
+            separator = ","
+            if system["power_state"] == "Control":
+                controlling_powers.add(system["power"])
+        size += dump.write("]" if count else "[]")
+    return DumpInfo(path, count, size, controlling_powers)
@@ -0,0 +1,221 @@
+"""
+Measures the system data hot paths on synthetic dumps and writes the results as JSON.
+
+Each dump size is benchmarked in a fresh process with its own database, so the peak RSS belongs to that size alone.
+The dump is served by a local HTTP server and ingested through SystemDataService.async_refresh, the path
+Client.refresh_system_data takes, so download, decompression, parsing and Database.add_systems are all measured.
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import datetime
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from .generate import DumpInfo, write_dump
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_SIZES = (10000, 100000, 1000000)
+DEFAULT_LOOKUPS = 1000
+DEFAULT_SEED = 0
+RESULTS_VERSION = 1
+
+
+def peak_rss() -> Optional[int]:
+    """
+    Gets the peak resident set size of the current process.
+    :return: bytes, None where the platform does not report it
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def latency_stats(latencies: List[float]) -> Dict[str, Any]:
+    """
+    Summarizes latencies.
+    :param latencies: seconds
+    :return: count, mean, p50 and p99 in milliseconds, None without latencies
+    """
+    from custom_components.ed_integration.telemetry import percentile
+
+    if not latencies:
+        return {"count": 0, "mean_ms": None, "p50_ms": None, "p99_ms": None}
+    ordered = sorted(latencies)
+    return {
+        "count": len(ordered),
+        "mean_ms": statistics.mean(ordered) * 1000,
+        "p50_ms": percentile(ordered, 50) * 1000,
+        "p99_ms": percentile(ordered, 99) * 1000,
+    }
+
+
+async def _time_calls(calls: List[Callable[[], Awaitable[Any]]]) -> List[float]:
+    latencies = []
+    for call in calls:
+        started = time.perf_counter()
+        await call()
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+async def _async_benchmark_dump(dump: DumpInfo, db_filepath: str, lookups: int, seed: int) -> Dict[str, Any]:
+    from aiohttp import web
+    from homeassistant.core import HomeAssistant
+
+    from custom_components.ed_integration import db, systems
+
+    app = web.Application()
+    app.router.add_get("/systems_populated.json", lambda request: web.FileResponse(dump.path))
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    host, port = runner.addresses[0][:2]
+    systems.URL_EDDB_POP_SYSTEMS_JSON = f"http://{host}:{port}/systems_populated.json"
+    db.DB_FILEPATH = db_filepath
+
+    hass = HomeAssistant()
+    service = systems.async_get_system_data(hass)
+    try:
+        started = time.perf_counter()
+        await service.async_refresh(0, reset=True)
+        ingest_seconds = time.perf_counter() - started
+        ingested = await service.db.get_system_count()
+        if ingested != dump.systems:
+            raise RuntimeError(f"Ingested {ingested} of {dump.systems} systems")
+
+        rng = random.Random(seed)
+        # distinct systems, so every lookup misses the system cache and reaches SQLite
+        sample = rng.sample(range(dump.systems), min(lookups, dump.systems))
+        by_name = await _time_calls(
+            [lambda n=n: service.db.get_system_by_name(f"Synthetic {n}") for n in sample]
+        )
+        powers = sorted(dump.controlling_powers)
+        queries = [(n + 1, rng.choice(powers)) for n in sample] if powers else []
+        closest_allied = await _time_calls(
+            [lambda q=q: service.db.get_closest_allied_system(*q) for q in queries]
+        )
+    finally:
+        await systems.async_release_system_data(hass)
+        await runner.cleanup()
+
+    return {
+        "systems": dump.systems,
+        "dump_bytes": dump.size,
+        # pages not yet checkpointed are still in the write-ahead log
+        "database_bytes": sum(
+            os.path.getsize(path) for path in (db_filepath, f"{db_filepath}-wal") if os.path.exists(path)
+        ),
+        "ingest": {
+            "seconds": ingest_seconds,
+            "rows_per_second": ingested / ingest_seconds,
+            "bytes_per_second": dump.size / ingest_seconds,
+        },
+        "get_system_by_name": latency_stats(by_name),
+        "get_closest_allied_system": latency_stats(closest_allied),
+        "peak_rss_bytes": peak_rss(),
+    }
+
+
+def benchmark_dump(dump: DumpInfo, db_filepath: str, lookups: int, seed: int) -> Dict[str, Any]:
+    """
+    Ingests a dump into a new database and measures lookups on it. Meant to run in a fresh process.
+    :param dump: dump to benchmark
+    :param db_filepath: database file to create
+    :param lookups: number of lookups per query type
+    :param seed: seed of the lookup sample
+    :return: results
+    """
+    logging.basicConfig(level=logging.WARNING)
+    return asyncio.run(_async_benchmark_dump(dump, db_filepath, lookups, seed))
+
+
+def _format_ms(milliseconds: Optional[float]) -> str:
+    return "n/a" if milliseconds is None else f"{milliseconds:.3f} ms"
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, check=True, text=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes: List[int], lookups: int = DEFAULT_LOOKUPS, seed: int = DEFAULT_SEED) -> Dict[str, Any]:
+    """
+    Benchmarks dumps of the given sizes.
+    :param sizes: numbers of systems
+    :param lookups: number of lookups per query type and size
+    :param seed: seed of the dumps and lookup samples
+    :return: results with the environment they were measured in
+    """
+    results = []
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in sizes:
+            _LOGGER.info(f"Generating dump of {size} systems...")
+            dump = write_dump(os.path.join(workdir, f"systems_{size}.json"), size, seed)
+            _LOGGER.info(f"Benchmarking {size} systems...")
+            with concurrent.futures.ProcessPoolExecutor(1, mp_context=context) as executor:
+                result = executor.submit(
+                    benchmark_dump, dump, os.path.join(workdir, f"systems_{size}.db"), lookups, seed
+                ).result()
+            _LOGGER.info(
+                f"{size} systems: {result['ingest']['rows_per_second']:.0f} rows/s, "
+                f"by name p99 {_format_ms(result['get_system_by_name']['p99_ms'])}, "
+                f"closest allied p99 {_format_ms(result['get_closest_allied_system']['p99_ms'])}"
+            )
+            results.append(result)
+            os.remove(dump.path)
+    return {
+        "version": RESULTS_VERSION,
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "revision": _git_revision(),
+        "environment": {
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "parameters": {"lookups": lookups, "seed": seed},
+        "results": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="numbers of systems of the dumps"
+    )
+    parser.add_argument("--lookups", type=int, default=DEFAULT_LOOKUPS, help="lookups per query type and size")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="seed of the dumps and lookup samples")
+    parser.add_argument("--output", help="file to write the JSON results to, printed if not given")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    results = run(args.sizes, args.lookups, args.seed)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
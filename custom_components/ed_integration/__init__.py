@@ -11,20 +11,35 @@ import logging
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import Config, HomeAssistant
 from homeassistant.exceptions import ConfigEntryNotReady
+from homeassistant.helpers.event import async_track_time_interval
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
 
 from custom_components.ed_integration.const import (
+    DEFAULT_CACHE_TTLS,
     DOMAIN,
     KEY_CMDR_NAME,
+    KEY_EDDN_LIVE_UPDATES,
     KEY_EDSM_API_KEY,
     KEY_INARA_API_KEY,
+    KEY_JOURNAL_DIRECTORY,
+    KEY_MAX_SCAN_INTERVAL,
+    KEY_OUTPUT_BALANCE_STR,
+    KEY_OUTPUT_LOCATION_STR,
+    KEY_POP_SYSTEMS_INCREMENTAL_REFRESH,
     KEY_POP_SYSTEMS_REFRESH_INTERVAL,
     STARTUP_MESSAGE,
 )
 
 from .client import Client, Configuration
+from .services import async_register_services, async_unregister_services
+from .systems import async_get_system_data, async_release_system_data
 
 SCAN_INTERVAL = timedelta(minutes=1)
+MIN_SCAN_INTERVAL = timedelta(seconds=30)
+JOURNAL_POLL_INTERVAL = timedelta(seconds=5)
+SYSTEM_DATA_CHECK_INTERVAL = timedelta(minutes=30)  # refreshes only start once the data expired
+IDLE_SCAN_INTERVAL_FACTOR = 2
+ACTIVITY_KEYS = (KEY_OUTPUT_LOCATION_STR, KEY_OUTPUT_BALANCE_STR)
 _LOGGER = logging.getLogger(__name__)
 
 
@@ -42,20 +57,48 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
     cmdr_name = entry.data.get(KEY_CMDR_NAME)
     edsm_api_key = entry.data.get(KEY_EDSM_API_KEY)
     inara_api_key = entry.data.get(KEY_INARA_API_KEY)
-    pop_systems_refresh_interval = \
-        entry.data.get(KEY_POP_SYSTEMS_REFRESH_INTERVAL) \
-        if KEY_POP_SYSTEMS_REFRESH_INTERVAL in entry.data.keys() \
-        else 24
+    pop_systems_refresh_interval = _get_option(entry, KEY_POP_SYSTEMS_REFRESH_INTERVAL, 24)
+    pop_systems_incremental_refresh = _get_option(entry, KEY_POP_SYSTEMS_INCREMENTAL_REFRESH, True)
+    cache_ttls = {key: _get_option(entry, key, ttl) for key, ttl in DEFAULT_CACHE_TTLS.items()}
+    max_scan_interval = timedelta(minutes=_get_option(entry, KEY_MAX_SCAN_INTERVAL, 30))
+    journal_directory = _get_option(entry, KEY_JOURNAL_DIRECTORY, "")
+    eddn_live_updates = _get_option(entry, KEY_EDDN_LIVE_UPDATES, False)
 
     coordinator = EDDataUpdateCoordinator(
-        hass, cmdr_name, edsm_api_key, inara_api_key, pop_systems_refresh_interval
+        hass,
+        async_get_system_data(hass),
+        cmdr_name,
+        edsm_api_key,
+        inara_api_key,
+        pop_systems_refresh_interval,
+        pop_systems_incremental_refresh,
+        cache_ttls,
+        max_scan_interval,
+        journal_directory,
+        eddn_live_updates,
     )
     await coordinator.async_refresh()
 
     if not coordinator.last_update_success:
+        await coordinator.api.async_close()
+        await async_release_system_data(hass)
         raise ConfigEntryNotReady
 
     hass.data[DOMAIN][entry.entry_id] = coordinator
+    async_register_services(hass)
+    coordinator.api.start_live_updates()
+    # the system data refresh takes minutes, it runs in the background instead of delaying the setup
+    hass.async_create_task(coordinator.async_refresh_system_data())
+    coordinator.unsub_system_data = async_track_time_interval(
+        hass, coordinator.async_refresh_system_data, SYSTEM_DATA_CHECK_INTERVAL
+    )
+
+    if journal_directory:
+        async def async_poll_journal(_now):
+            if await coordinator.api.async_poll_journal():
+                await coordinator.async_request_refresh()
+
+        coordinator.unsub_journal = async_track_time_interval(hass, async_poll_journal, JOURNAL_POLL_INTERVAL)
 
     coordinator.platforms.append("sensor")
     hass.async_add_job(
@@ -66,29 +109,94 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
     return True
 
 
-class EDDataUpdateCoordinator(DataUpdateCoordinator):
-    """Class to manage fetching data from the API."""
+def _get_option(entry: ConfigEntry, key: str, default):
+    """Get a setting from the entry options, falling back to the entry data."""
+    if key in entry.options:
+        return entry.options[key]
+    return entry.data.get(key, default)
 
-    def __init__(self, hass, cmdr_name, edsm_api_key, inara_api_key, pop_systems_refresh_interval):
+
+class EDDataUpdateCoordinator(DataUpdateCoordinator):
+    """
+    Class to manage fetching data from the API.
+    Polls faster while location or balance change and stretches the interval geometrically while they don't.
+    """
+
+    def __init__(
+        self,
+        hass,
+        systems,
+        cmdr_name,
+        edsm_api_key,
+        inara_api_key,
+        pop_systems_refresh_interval,
+        pop_systems_incremental_refresh=True,
+        cache_ttls=None,
+        max_scan_interval=SCAN_INTERVAL,
+        journal_directory=None,
+        eddn_live_updates=False,
+    ):
         """Initialize."""
-        config = Configuration(cmdr_name, edsm_api_key, inara_api_key, pop_systems_refresh_interval)
-        self.api = Client(hass, config)
+        config = Configuration(
+            cmdr_name,
+            edsm_api_key,
+            inara_api_key,
+            pop_systems_refresh_interval,
+            pop_systems_incremental_refresh,
+            cache_ttls,
+            journal_directory,
+            eddn_live_updates,
+        )
+        self.api = Client(hass, config, systems)
         self.platforms = []
+        self.max_update_interval = max(max_scan_interval, MIN_SCAN_INTERVAL)
+        self._last_activity = None
+        self.unsub_journal = None
+        self.unsub_system_data = None
 
         super().__init__(hass, _LOGGER, name=DOMAIN, update_interval=SCAN_INTERVAL)
 
     async def _async_update_data(self):
         """Update data via library."""
         try:
-            data = await self.api.async_get_data()
-            return data.get("data", {})
+            with self.api.telemetry.span("coordinator.update"):
+                data = await self.api.async_get_data()
         except Exception as exception:
             raise UpdateFailed(exception)
+        finally:
+            await self.api.async_update_db_file_size()
+        data = data.get("data", {})
+        self._adapt_update_interval(data)
+        return data
+
+    async def async_refresh_system_data(self, _now=None) -> None:
+        """Refresh the system data if expired, updating the sensors if it changed."""
+        try:
+            generation = await self.api.get_system_generation()
+            await self.api.refresh_system_data()
+            changed = await self.api.get_system_generation() != generation
+        except Exception as exception:  # pylint: disable=broad-except
+            _LOGGER.warning(f"Refreshing system data failed: {exception}")
+            return
+        if changed:
+            await self.async_request_refresh()
+
+    def _adapt_update_interval(self, data) -> None:
+        """Shorten the update interval on activity, stretch it up to the maximum while idle."""
+        activity = tuple(data.get(key) for key in ACTIVITY_KEYS)
+        if self._last_activity is not None:
+            if activity != self._last_activity:
+                self.update_interval = MIN_SCAN_INTERVAL
+            else:
+                self.update_interval = min(
+                    self.update_interval * IDLE_SCAN_INTERVAL_FACTOR, self.max_update_interval
+                )
+        self._last_activity = activity
+        _LOGGER.debug(f"Next update in {self.update_interval}")
 
 
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry):
     """Handle removal of an entry."""
-    # coordinator = hass.data[DOMAIN][entry.entry_id]
     unloaded = all(
         await asyncio.gather(
             *[
@@ -97,7 +205,15 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry):
         )
     )
     if unloaded:
-        hass.data[DOMAIN].pop(entry.entry_id)
+        coordinator = hass.data[DOMAIN].pop(entry.entry_id)
+        if coordinator.unsub_journal is not None:
+            coordinator.unsub_journal()
+        if coordinator.unsub_system_data is not None:
+            coordinator.unsub_system_data()
+        await coordinator.api.async_close()
+        await async_release_system_data(hass)
+        if not hass.data[DOMAIN]:
+            async_unregister_services(hass)
 
     return unloaded
 
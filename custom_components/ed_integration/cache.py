@@ -0,0 +1,226 @@
+"""Provides caching of remote API responses"""
+import asyncio
+from collections import OrderedDict
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class CacheStats:
+    """
+    Counters of a cache, to tune its time-to-live.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """
+        Share of lookups served from the cache, including stale ones.
+        :return: hit rate between 0 and 1
+        """
+        lookups = self.hits + self.stale_hits + self.misses
+        return (self.hits + self.stale_hits) / lookups if lookups else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        """
+        :return: counters as dictionary
+        """
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_rate": round(self.hit_rate, 3),
+        }
+
+
+class TTLCache:
+    """
+    Caches values fetched by coroutines for a time-to-live.
+    Once it elapsed, the stale value is still served for a grace period while a single background fetch revalidates
+    it (stale-while-revalidate). Concurrent lookups of a missing key share one fetch.
+    """
+
+    def __init__(self, name: str, ttl: float, stale_ttl: float = 0):
+        """
+        :param name: name of the cache, used for logging
+        :param ttl: seconds a fetched value is fresh
+        :param stale_ttl: seconds after the ttl during which the stale value is served while revalidating
+        """
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.stats = CacheStats()
+        self._entries: Dict[Hashable, tuple] = {}  # key -> (value, fetched_at)
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+
+    async def get(
+            self,
+            key: Hashable,
+            fetch: Callable[[], Awaitable],
+            cacheable: Optional[Callable[[Any], bool]] = None,
+    ) -> Any:
+        """
+        Gets the value for a key, fetching it if missing or expired.
+        :param key: cache key
+        :param fetch: callable returning an awaitable fetching the value
+        :param cacheable: predicate deciding if a fetched value may be cached, e.g. to skip error responses
+        :return: cached or fetched value
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, fetched_at = entry
+            age = time.monotonic() - fetched_at
+            if age < self.ttl:
+                self.stats.hits += 1
+                return value
+            if age < self.ttl + self.stale_ttl:
+                self.stats.stale_hits += 1
+                self._fetch_task(key, fetch, cacheable).add_done_callback(self._log_revalidation_error)
+                return value
+        self.stats.misses += 1
+        # shielded so a caller timing out does not abort the fetch other callers or the cache wait for
+        return await asyncio.shield(self._fetch_task(key, fetch, cacheable))
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        """
+        Drops a cached value, or all of them.
+        :param key: key to drop, all keys if None
+        """
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def cancel(self) -> None:
+        """
+        Cancels all running fetches.
+        """
+        for task in list(self._inflight.values()):
+            task.cancel()
+
+    def _fetch_task(
+            self,
+            key: Hashable,
+            fetch: Callable[[], Awaitable],
+            cacheable: Optional[Callable[[Any], bool]],
+    ) -> asyncio.Task:
+        task = self._inflight.get(key)
+        # a finished task is only dropped by its done callback, which may not have run yet
+        if task is None or task.done():
+            task = asyncio.ensure_future(self._fetch(key, fetch, cacheable))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget_fetch(key, done))
+        return task
+
+    def _forget_fetch(self, key: Hashable, task: asyncio.Task) -> None:
+        # a newer fetch of the key may have been started meanwhile
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    async def _fetch(
+            self,
+            key: Hashable,
+            fetch: Callable[[], Awaitable],
+            cacheable: Optional[Callable[[Any], bool]],
+    ) -> Any:
+        try:
+            value = await fetch()
+        except Exception:
+            self.stats.errors += 1
+            raise
+        if cacheable is None or cacheable(value):
+            self._entries[key] = (value, time.monotonic())
+        return value
+
+    def _log_revalidation_error(self, task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            _LOGGER.warning(f"Revalidating <{self.name}> failed, serving stale value: {task.exception()}")
+
+
+class LRUCache:
+    """
+    Keeps the most recently used values up to a maximum number of entries.
+    Values are tagged with the generation of the data they were derived from, looking up a newer generation drops
+    all entries, so no explicit invalidation is needed when the data changes.
+    """
+
+    def __init__(self, name: str, maxsize: int):
+        """
+        :param name: name of the cache, used for logging
+        :param maxsize: maximum number of entries, the least recently used one is evicted beyond it
+        """
+        self.name = name
+        self.maxsize = maxsize
+        self.stats = CacheStats()
+        self.generation: Optional[Hashable] = None
+        self.evictions = 0
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, generation: Hashable) -> Optional[Any]:
+        """
+        Gets a cached value.
+        :param key: cache key
+        :param generation: current generation of the data
+        :return: cached value, None if missing or from an older generation
+        """
+        self._check_generation(generation)
+        value = self._entries.get(key)
+        if value is None:
+            self.stats.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.stats.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: Any, generation: Hashable) -> None:
+        """
+        Caches a value, unless the data changed since it was looked up.
+        :param key: cache key
+        :param value: value to cache, not None
+        :param generation: generation of the data the value was derived from
+        """
+        if generation != self.generation:
+            return
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """
+        Drops all entries.
+        """
+        self._entries.clear()
+
+    def as_dict(self) -> Dict[str, Any]:
+        """
+        :return: counters and size as dictionary
+        """
+        return {
+            "hits": self.stats.hits,
+            "misses": self.stats.misses,
+            "hit_rate": round(self.stats.hit_rate, 3),
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "evictions": self.evictions,
+            "generation": self.generation,
+        }
+
+    def _check_generation(self, generation: Hashable) -> None:
+        if generation != self.generation:
+            if self._entries:
+                _LOGGER.debug(f"Data of <{self.name}> changed to generation {generation}, dropping cached values")
+            self._entries.clear()
+            self.generation = generation
@@ -1,20 +1,35 @@
 """Main file doing all the heavy lifting."""
+import asyncio
 import datetime
 import json
 import locale
 import logging
 import os
-import shutil
-import sqlite3
-import urllib.parse
-import urllib.request
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
 
+import aiohttp
 from homeassistant.core import HomeAssistant
-import ijson
-import requests
-
-from .const import KEY_OUTPUT_LOCATION_STR, KEY_OUTPUT_BALANCE_STR
-from .db import Database, System
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+
+from .cache import TTLCache
+from .const import (
+    DEFAULT_CACHE_TTLS,
+    DOMAIN,
+    KEY_CACHE_TTL_CREDITS,
+    KEY_CACHE_TTL_POSITION,
+    KEY_CACHE_TTL_PROFILE,
+    KEY_OUTPUT_BALANCE_STR,
+    KEY_OUTPUT_LOCATION_STR,
+    KEY_OUTPUT_POWER_STR,
+)
+from .db import SEARCH_PAGE_SIZE, SearchPage, System, SystemFilter
+from .journal import JournalTailer
+from .profiling import Profiler
+from .route import Route
+from .ratelimit import HEADER_RETRY_AFTER, RateLimiter, parse_retry_after
+from .systems import RefreshProgress, SystemDataService
+from .telemetry import Telemetry
 
 cwd = os.path.dirname(__file__)
 
@@ -24,10 +39,23 @@ URL_SYSTEM = "https://www.edsm.net/api-v1/system"
 URL_POSITION = "https://www.edsm.net/api-logs-v1/get-position"
 URL_CREDITS = "https://www.edsm.net/api-commander-v1/get-credits"
 URL_INARA = "https://inara.cz/inapi/v1/"
-URL_EDDB_POP_SYSTEMS_JSON = "https://eddb.io/archive/v6/systems_populated.json"
-POP_SYSTEMS_JSON_FILEPATH = os.path.join(cwd, "populated_systems.json")
 INI_FILEPATH = os.path.join(cwd, "app.ini")
 
+HTTP_TIMEOUT = aiohttp.ClientTimeout(total=30, sock_connect=10, sock_read=20)
+API_EDSM = "edsm"
+API_INARA = "inara"
+RATE_LIMITS = {  # (requests per second, burst) per API
+    API_EDSM: (360 / 3600, 10),
+    API_INARA: (2 / 60, 2),  # Inara asks for no more than a couple of requests per minute and user
+}
+SOURCE_TIMEOUTS = {  # s, per remote source polled by async_get_data
+    KEY_OUTPUT_LOCATION_STR: 20,
+    KEY_OUTPUT_BALANCE_STR: 15,
+    KEY_OUTPUT_POWER_STR: 20,
+}
+
+SIGNAL_ROUTE_PLANNED = f"{DOMAIN}_route_planned"
+
 locale.setlocale(locale.LC_ALL, "")  # auto locale for thousands delimiter
 
 event_codes_edsm = {
@@ -38,11 +66,31 @@ event_codes_edsm = {
 
 
 # TODO: error code resolving
-# TODO: make async
 
 _LOGGER = logging.getLogger(__name__)
 
 
+def _is_edsm_success(data: Any) -> bool:
+    """Check if an EDSM response is a successful one, others are not cached and make requests back off."""
+    return isinstance(data, dict) and data.get("msgnum") == 100
+
+
+def _is_inara_success(data: Any) -> bool:
+    """Check if an Inara response is a successful one, others are not cached and make requests back off."""
+    return isinstance(data, dict) and isinstance(data.get("header"), dict) and data["header"].get("eventStatus") == 200
+
+
+def format_balance(balance: int, loan: int) -> str:
+    """
+    Formats a CMDR's credits as shown by the balance sensor.
+    :param balance: credit balance
+    :param loan: outstanding loan
+    :return: formatted balance
+    """
+    total = balance - loan
+    return f"{f'{total:n}'} Cr"
+
+
 class Configuration:
     """
     Contains all configuration, user- and integration-generated.
@@ -52,16 +100,32 @@ class Configuration:
     __edsm_api_key: str = None
     __inara_api_key: str = None
     __pop_systems_refresh_interval: int = 24
+    __pop_systems_incremental_refresh: bool = True
+    __cache_ttls: Dict[str, int] = None
+    __journal_directory: str = None
+    __eddn_live_updates: bool = False
     __pop_systems_last_download: datetime.datetime = None
 
     def __init__(
-        self, cmdr_name: str, edsm_api_key: str, inara_api_key: str, pop_systems_refresh_interval: int = None
+        self,
+        cmdr_name: str,
+        edsm_api_key: str,
+        inara_api_key: str,
+        pop_systems_refresh_interval: int = None,
+        pop_systems_incremental_refresh: bool = True,
+        cache_ttls: Dict[str, int] = None,
+        journal_directory: str = None,
+        eddn_live_updates: bool = False,
     ):
         # set member values
         self.__cmdr_name = cmdr_name
         self.__inara_api_key = inara_api_key
         self.__edsm_api_key = edsm_api_key
         self.__pop_systems_refresh_interval = pop_systems_refresh_interval or 24
+        self.__pop_systems_incremental_refresh = pop_systems_incremental_refresh
+        self.__cache_ttls = {**DEFAULT_CACHE_TTLS, **(cache_ttls or {})}
+        self.__journal_directory = journal_directory or None
+        self.__eddn_live_updates = eddn_live_updates
         self.__pop_systems_last_download = datetime.datetime.fromisocalendar(1900, 1, 1)
 
     def get_cmdr_name(self):
@@ -106,133 +170,326 @@ class Configuration:
     def set_pop_systems_refresh_interval(self, interval: int):
         self.__pop_systems_refresh_interval = interval
 
+    def get_pop_systems_incremental_refresh(self):
+        """
+        Getter for the incremental refresh flag, i.e. if a refresh should only write systems that changed since
+        the last one instead of rewriting all of them.
+        :return: Incremental refresh flag
+        :rtype: bool
+        """
+        return self.__pop_systems_incremental_refresh
+
+    def set_pop_systems_incremental_refresh(self, incremental: bool):
+        self.__pop_systems_incremental_refresh = incremental
+
+    def get_cache_ttls(self):
+        """
+        Getter for the time-to-live of cached API responses per endpoint in seconds, keyed by the
+        KEY_CACHE_TTL_* constants.
+        :return: Cache TTLs
+        :rtype: Dict[str, int]
+        """
+        return self.__cache_ttls
+
+    def set_cache_ttls(self, cache_ttls: Dict[str, int]):
+        self.__cache_ttls = {**DEFAULT_CACHE_TTLS, **cache_ttls}
+
+    def get_journal_directory(self):
+        """
+        Getter for the directory of the game's journal files. If set, location and balance are read from the
+        journal instead of EDSM.
+        :return: Journal directory, None if not set
+        :rtype: str
+        """
+        return self.__journal_directory
+
+    def set_journal_directory(self, journal_directory: str):
+        self.__journal_directory = journal_directory or None
+
+    def get_eddn_live_updates(self):
+        """
+        Getter for the live update flag, i.e. if systems in the local database should be updated from EDDN as
+        other CMDRs visit them.
+        :return: Live update flag
+        :rtype: bool
+        """
+        return self.__eddn_live_updates
+
+    def set_eddn_live_updates(self, live_updates: bool):
+        self.__eddn_live_updates = live_updates
+
     cmdr_name = property(get_cmdr_name, set_cmdr_name)
     edsm_api_key = property(get_edsm_api_key, set_edsm_api_key)
     inara_api_key = property(get_inara_api_key, set_inara_api_key)
     pop_systems_refresh_interval = property(
         get_pop_systems_refresh_interval, set_pop_systems_refresh_interval
     )
+    pop_systems_incremental_refresh = property(
+        get_pop_systems_incremental_refresh, set_pop_systems_incremental_refresh
+    )
+    cache_ttls = property(get_cache_ttls, set_cache_ttls)
+    journal_directory = property(get_journal_directory, set_journal_directory)
+    eddn_live_updates = property(get_eddn_live_updates, set_eddn_live_updates)
 
 
 class Client:
     """API client"""
 
-    def __init__(self, hass: HomeAssistant, config: Configuration):
+    def __init__(self, hass: HomeAssistant, config: Configuration, systems: SystemDataService):
+        """
+        :param hass: Home Assistant instance
+        :param config: configuration of the config entry
+        :param systems: system data shared with the clients of other config entries
+        """
         self._hass = hass
         self._config = config
-        self._db = Database(_LOGGER)
+        self._systems = systems
+        self._db = systems.db
+        # pooled by Home Assistant, which also closes it
+        self._session = async_get_clientsession(hass)
+        self._last_values: Dict[str, Any] = {}
+        self._journal = JournalTailer(config.journal_directory) if config.journal_directory else None
+        # stale values are served for another TTL while being revalidated
+        self._caches = {
+            key: TTLCache(key, ttl, ttl) for key, ttl in config.cache_ttls.items()
+        }
+        self._rate_limiters = {
+            api: RateLimiter(api, rate, burst) for api, (rate, burst) in RATE_LIMITS.items()
+        }
+        # api.<API_*> for remote requests, source.<key> for the sources of an update, coordinator.update
+        self.telemetry = Telemetry()
+        self.db_file_size: Optional[int] = None
+        self.route: Optional[Route] = None
+
+    @property
+    def cache_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Hit and miss counters of the API response caches.
+        :return: counters per cache
+        """
+        return {key: cache.stats.as_dict() for key, cache in self._caches.items()}
+
+    @property
+    def system_cache_stats(self) -> Dict[str, Any]:
+        """
+        Hit rate and size of the system lookup cache.
+        :return: counters as dictionary
+        """
+        return self._db.system_cache_stats
+
+    @property
+    def rate_limit_state(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Tokens, quota and backoff of the API rate limiters.
+        :return: state per API
+        """
+        return {api: limiter.state for api, limiter in self._rate_limiters.items()}
+
+    @property
+    def db_telemetry(self) -> Telemetry:
+        """
+        Query and ingest spans of the shared system database.
+        """
+        return self._db.telemetry
+
+    async def async_update_db_file_size(self) -> None:
+        """
+        Updates db_file_size off the event loop.
+        """
+        self.db_file_size = await self._hass.async_add_executor_job(self._db.get_file_size)
+
+    def get_diagnostics(self) -> Dict[str, Any]:
+        """
+        Collects the performance counters of the client and the shared system data.
+        :return: spans, caches, rate limits and system data state as dictionary
+        """
+        return {
+            "spans": self.telemetry.as_dict(),
+            "db_spans": self.db_telemetry.as_dict(),
+            "response_caches": self.cache_stats,
+            "system_cache": self.system_cache_stats,
+            "coordinate_snapshot": self._db.snapshot_stats,
+            "system_table": self._db.table_stats,
+            "rate_limits": self.rate_limit_state,
+            "system_data": self.system_data_progress.as_dict(),
+            "db_file_size": self.db_file_size,
+        }
+
+    async def async_profile(self, operation: Awaitable) -> Dict[str, Any]:
+        """
+        Profiles an operation, including the statements it runs on the database threads, see Profiler.
+        :param operation: awaitable to profile
+        :return: result of Profiler.async_profile
+        """
+        profiler = Profiler()
+        self._db.profiler = profiler
+        try:
+            return await profiler.async_profile(operation)
+        finally:
+            self._db.profiler = None
+
+    def start_live_updates(self) -> None:
+        """
+        Starts applying system updates from EDDN to the local database, if enabled.
+        """
+        if self._config.eddn_live_updates:
+            self._systems.start_live_updates()
+
+    async def async_close(self) -> None:
+        """
+        Cancels pending revalidations of the response caches. The system database is closed by the shared service.
+        """
+        for cache in self._caches.values():
+            cache.cancel()
 
     async def async_get_data(self):
-        """Return data."""
-        location_sys = await self.get_last_known_position_sys()
-        balance_str = await self.get_balance_str()
+        """
+        Return data.
+        Remote sources are fetched concurrently, each with its own timeout. A source that fails or times out keeps
+        its last known value, only if all of them fail the update fails.
+        Location and balance are taken from the journal instead of EDSM once it provided them.
+        """
+        await self.async_poll_journal()
+        journal = self._journal.state if self._journal is not None else None
+        if journal is not None and journal.system_name is not None:
+            location_fetch = self._db.get_system_by_name(journal.system_name)
+        else:
+            location_fetch = self.get_last_known_position_sys()
+        if journal is not None and journal.credits is not None:
+            balance_fetch = self._get_journal_balance_str(journal.credits, journal.loan or 0)
+        else:
+            balance_fetch = self.get_balance_str()
+        results = await asyncio.gather(
+            self._fetch_source(KEY_OUTPUT_LOCATION_STR, location_fetch),
+            self._fetch_source(KEY_OUTPUT_BALANCE_STR, balance_fetch),
+            self._fetch_source(KEY_OUTPUT_POWER_STR, self.get_cmdr_power_str()),
+        )
+        if not any(success for _, success in results):
+            raise ConnectionError("No data source could be reached")
+        (location_sys, _), (balance_str, _), (power_str, _) = results
         now = datetime.datetime.now()
         data = {
             "cmdr_name": self._config.cmdr_name,
             "data": {
                 "static": f"Providing data for CMDR {self._config.cmdr_name}.",
                 "time": f"{now.strftime('%d.%m.%Y, %H:%M:%S')}",
-                KEY_OUTPUT_LOCATION_STR: location_sys.name,
+                KEY_OUTPUT_LOCATION_STR: location_sys.name if location_sys is not None else None,
                 KEY_OUTPUT_BALANCE_STR: balance_str,
+                KEY_OUTPUT_POWER_STR: power_str,
                 "none": None,
             },
         }
         return data
 
+    async def async_poll_journal(self) -> bool:
+        """
+        Reads journal events written since the last poll, if a journal directory is configured.
+        :return: if location or balance changed
+        """
+        if self._journal is None:
+            return False
+        return await self._hass.async_add_executor_job(self._journal.poll)
+
+    @staticmethod
+    async def _get_journal_balance_str(balance: int, loan: int) -> str:
+        return format_balance(balance, loan)
+
+    async def _fetch_source(self, key: str, fetch: Awaitable) -> Tuple[Any, bool]:
+        """
+        Awaits a single remote source within its timeout.
+        :param key: output key of the source
+        :param fetch: awaitable fetching the source
+        :return: fetched value, or the last known one on failure, and if fetching succeeded
+        """
+        try:
+            with self.telemetry.span(f"source.{key}"):
+                value = await asyncio.wait_for(fetch, SOURCE_TIMEOUTS[key])
+        except asyncio.TimeoutError:
+            _LOGGER.warning(f"Timed out fetching <{key}>, keeping last known value.")
+            return self._last_values.get(key), False
+        except Exception as e:  # pylint: disable=broad-except
+            _LOGGER.warning(f"Error fetching <{key}>, keeping last known value: {e}")
+            return self._last_values.get(key), False
+        self._last_values[key] = value
+        return value, True
+
+    async def _request_json(
+            self,
+            api: str,
+            cache_key: str,
+            method: str,
+            url: str,
+            is_success: Callable[[Any], bool],
+            **kwargs,
+    ) -> Any:
+        """
+        Requests JSON from a remote API through the response cache of the endpoint and the rate limiter of the API.
+        Unsuccessful responses are neither cached nor retried until the API's backoff is over.
+        :param api: API_* constant of the API
+        :param cache_key: KEY_CACHE_TTL_* constant of the endpoint
+        :param method: HTTP method
+        :param url: endpoint URL
+        :param is_success: predicate deciding if a response is a successful one
+        :param kwargs: further arguments of the request
+        :return: decoded JSON response
+        :raises RateLimitedError: if the API is backing off or its request rate is exceeded
+        """
+        limiter = self._rate_limiters[api]
+
+        async def fetch():
+            await limiter.acquire()
+            retry_after = None
+            try:
+                with self.telemetry.span(f"api.{api}"):
+                    async with self._session.request(method, url, timeout=HTTP_TIMEOUT, **kwargs) as r:
+                        limiter.update_from_headers(r.headers)
+                        if r.status == 429:
+                            retry_after = r.headers.get(HEADER_RETRY_AFTER)
+                        r.raise_for_status()
+                        data = await r.json(content_type=None)
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+                limiter.record_error(parse_retry_after(retry_after))
+                raise
+            if is_success(data):
+                limiter.record_success()
+            else:
+                limiter.record_error()
+            return data
+
+        data = await self._caches[cache_key].get(CMDR_NAME, fetch, is_success)
+        _LOGGER.debug(f"Response cache stats: {self.cache_stats}")
+        return data
+
     async def is_systems_json_expired(self) -> bool:
         """
         Check in accordance to user settings and last refresh if the systems database needs to be refreshed from EDDB.
         :return: Boolean if data is expired
         :rtype: bool
         """
-        last_download_time = await self._db.get_last_refreshed_datetime()
-        if last_download_time is None or not os.path.isfile(POP_SYSTEMS_JSON_FILEPATH):
-            return True
-        now_time = datetime.datetime.now()
-        time_delta = now_time - last_download_time
-        return not (
-            int(time_delta.total_seconds() / 60 / 60)
-            < self._config.pop_systems_refresh_interval
-        )
+        return await self._systems.is_expired(self._config.pop_systems_refresh_interval)
 
     async def refresh_system_data(self, reset: bool = False) -> None:
         """
-        Redownloads system data and refreshes database if needed.
-        :param reset: force refresh, ignoring user refresh interval settings
-        """
-        # check if refresh needed
-        if not reset and not await self.is_systems_json_expired():
-            _LOGGER.debug("Skipping refresh of non-expired systems JSON.")
-            return
-        _LOGGER.debug("System data expired, redownload needed.")
-
-        params = {"Accept-Encoding": "gzip, deflate, sdch"}
-        data = urllib.parse.urlencode(params)
-        data = data.encode("ascii")
-
-        def wrapper():
-            """Wrapper for sync json retrieval"""
-            with urllib.request.urlopen(URL_EDDB_POP_SYSTEMS_JSON, data) as response, open(
-                    POP_SYSTEMS_JSON_FILEPATH, "wb"
-            ) as out_file:
-                _LOGGER.debug("Writing to %s..." % POP_SYSTEMS_JSON_FILEPATH)
-                shutil.copyfileobj(response, out_file)
-        await self._hass.async_add_executor_job(wrapper)
-        _LOGGER.debug("Updating last_download...")
-        await self._db.set_last_refreshed_datetime(datetime.datetime.now())
-
-        if reset:
-            self._db.reset()
-
-        # Push changes to database
-        try:
-            with open(POP_SYSTEMS_JSON_FILEPATH, "r") as systems_json:
-                def wrapper():
-                    """Wrapper for sync json parsing"""
-                    return ijson.items(systems_json, "item")
-                systems = await self._hass.async_add_executor_job(wrapper)
-                _LOGGER.debug('Systems JSON loaded from filesystem')
-                systems_list = []
-                for s in systems:
-                    systems_list.append(
-                        (
-                            s["id"],
-                            s["edsm_id"],
-                            s["name"],
-                            float(s["x"]),
-                            float(s["y"]),
-                            float(s["z"]),
-                            s["population"],
-                            s["is_populated"],
-                            s["government_id"],
-                            s["government"],
-                            s["allegiance_id"],
-                            s["allegiance"],
-                            s["security_id"],
-                            s["security"],
-                            s["primary_economy_id"],
-                            s["primary_economy"],
-                            s["power"],
-                            s["power_state"],
-                            s["power_state"],
-                            s["needs_permit"],
-                            s["updated_at"],
-                            s["controlling_minor_faction_id"],
-                            s["controlling_minor_faction"],
-                            s["reserve_type_id"],
-                            s["reserve_type"],
-                        )
-                    )
-                await self._db.add_systems(systems_list)
-        except sqlite3.Error as e:
-            _LOGGER.warning(
-                "Error while updating systems table, trying to rebuild database.",
-                exc_info=e,
-            )
-            # TODO: param with retry count, fail after n retries
-            await self.refresh_system_data(True)
-        os.remove(POP_SYSTEMS_JSON_FILEPATH)
-        _LOGGER.debug('Deleted systems JSON.')
+        Redownloads system data and refreshes database if needed, see SystemDataService.async_refresh.
+        A refresh already started by another caller or config entry is joined, a reset runs after it.
+        :param reset: force full rebuild, ignoring user refresh interval settings
+        """
+        await self._systems.async_refresh(
+            self._config.pop_systems_refresh_interval, self._config.pop_systems_incremental_refresh, reset
+        )
+
+    async def get_system_generation(self) -> int:
+        """
+        Gets the generation of the system data, which changes whenever a refresh changed it.
+        """
+        return await self._db.get_generation()
+
+    @property
+    def system_data_progress(self) -> RefreshProgress:
+        """
+        Progress of the running or last system data refresh.
+        """
+        return self._systems.progress
 
     async def get_last_known_position_sys(self) -> System:
         """
@@ -241,14 +498,13 @@ class Client:
         :rtype: System
         """
         _LOGGER.debug(f"Entering <{self.get_last_known_position_sys.__name__}>")
-        api_key = self._config.edsm_api_key if self._config.edsm_api_key != "" else None
-        params = {"commanderName": CMDR_NAME, "apiKey": api_key}
-
-        def wrapper():
-            """Wrapper for sync position request"""
-            return requests.get(URL_POSITION, params)
-        r = await self._hass.async_add_executor_job(wrapper)
-        data = r.json()
+        params = {"commanderName": CMDR_NAME}
+        if self._config.edsm_api_key:
+            params["apiKey"] = self._config.edsm_api_key
+
+        data = await self._request_json(
+            API_EDSM, KEY_CACHE_TTL_POSITION, "GET", URL_POSITION, _is_edsm_success, params=params
+        )
         _LOGGER.debug(f"EDSM response: {data}")
         try:
             msgnum = data["msgnum"]
@@ -260,7 +516,6 @@ class Client:
                 return System()  # empty
             system_name = data["system"]
             _LOGGER.debug(f"Retrieved current system name: <{system_name}>")
-            await self.refresh_system_data()
             return await self._db.get_system_by_name(system_name)
         except (KeyError, TypeError) as e:
             _LOGGER.warning(f"Unknown error occured while parsing response JSON: {e}")
@@ -277,11 +532,9 @@ class Client:
             return 'No API key provided'
         params = {"commanderName": CMDR_NAME, "apiKey": self._config.edsm_api_key}
 
-        def wrapper():
-            """Wrapper for sync balance request"""
-            return requests.get(URL_CREDITS, params)
-        r = await self._hass.async_add_executor_job(wrapper)
-        data = r.json()
+        data = await self._request_json(
+            API_EDSM, KEY_CACHE_TTL_CREDITS, "GET", URL_CREDITS, _is_edsm_success, params=params
+        )
         try:
             msgnum = data["msgnum"]
             if msgnum != 100:
@@ -289,10 +542,7 @@ class Client:
                     return event_codes_edsm[msgnum]
                 return f"Error: {data['msg']}"
             credits_ = data["credits"][0]
-            balance = credits_["balance"]
-            loan = credits_["loan"]
-            total = balance - loan
-            return f"{f'{total:n}'} Cr"
+            return format_balance(credits_["balance"], credits_["loan"])
         except (KeyError, TypeError) as e:
             return f"Unknown error occured: {e}"
 
@@ -319,16 +569,15 @@ class Client:
             ],
         }
 
-        def wrapper():
-            """Wrapper for sync cmdr profile request"""
-            return requests.post(URL_INARA, data=json.dumps(payload))
-        r = await self._hass.async_add_executor_job(wrapper)
+        data = await self._request_json(
+            API_INARA, KEY_CACHE_TTL_PROFILE, "POST", URL_INARA, _is_inara_success, data=json.dumps(payload)
+        )
         try:
-            header = r.json()["header"]
+            header = data["header"]
             if header["eventStatus"] != 200:
                 _LOGGER.error(f"Inara API error: {header['eventStatusText']}")
                 return f"Inara API error: {header['eventStatusText']}"
-            event_data = r.json()["events"][0]["eventData"]
+            event_data = data["events"][0]["eventData"]
             power_name = event_data["preferredPowerName"]
             return power_name if power_name and power_name != "" else None
         except (KeyError, TypeError) as e:
@@ -340,7 +589,6 @@ class Client:
         :return: closest allied system
         :rtype: System
         """
-        await self.refresh_system_data()
         power = await self.get_cmdr_power_str()
         last_known_position_sys = await self.get_last_known_position_sys()
         if power is None or power == "":
@@ -349,3 +597,110 @@ class Client:
             last_known_position_sys.sid,
             power,
         )
+
+    async def get_nearest_systems(self, system_name: str, k: int) -> List[Tuple[System, float]]:
+        """
+        Get the systems closest to a system.
+        :param system_name: name of the reference system
+        :param k: number of systems
+        :return: up to k systems and their distance in ly, closest first
+        :raises ValueError: if the reference system is unknown
+        """
+        ref_system = await self._db.get_system_by_name(system_name)
+        if ref_system.sid < 0:
+            raise ValueError(f"Unknown system: {system_name}")
+        return await self._db.get_nearest_systems(
+            ref_system.x, ref_system.y, ref_system.z, k, exclude_sid=ref_system.sid
+        )
+
+    async def search_systems(
+            self,
+            radius: float,
+            system_name: Optional[str] = None,
+            position: Optional[Tuple[float, float, float]] = None,
+            filters: SystemFilter = SystemFilter(),
+            page_size: int = SEARCH_PAGE_SIZE,
+    ) -> AsyncIterator[SearchPage]:
+        """
+        Search the systems within a radius around a system or a point, page by page.
+        :param radius: search radius in ly
+        :param system_name: name of the reference system, left out of the results
+        :param position: coordinates of the center if no reference system is given
+        :param filters: attributes the systems must have
+        :param page_size: maximum number of systems per page
+        :return: async iterator of result pages, closest systems first
+        :raises ValueError: if the reference system is unknown or neither it nor a position is given
+        """
+        position, exclude_sid = await self._resolve_center(system_name, position)
+        return self._db.iter_search_systems(*position, radius, filters, page_size, exclude_sid)
+
+    async def count_systems(
+            self,
+            radius: float,
+            group_by: str,
+            system_name: Optional[str] = None,
+            position: Optional[Tuple[float, float, float]] = None,
+            filters: SystemFilter = SystemFilter(),
+    ) -> List[Tuple[str, int]]:
+        """
+        Count the systems within a radius around a system or a point per value of an attribute.
+        :param radius: search radius in ly
+        :param group_by: attribute to count per, e.g. power
+        :param system_name: name of the reference system, left out of the counts
+        :param position: coordinates of the center if no reference system is given
+        :param filters: attributes the systems must have
+        :return: names and numbers of systems, most systems first
+        :raises ValueError: if the reference system or attribute is unknown or neither system nor position is given
+        """
+        position, exclude_sid = await self._resolve_center(system_name, position)
+        return await self._db.count_systems(*position, radius, group_by, filters, exclude_sid)
+
+    async def get_top_systems(
+            self,
+            radius: float,
+            limit: int,
+            system_name: Optional[str] = None,
+            position: Optional[Tuple[float, float, float]] = None,
+            filters: SystemFilter = SystemFilter(),
+    ) -> List[Tuple[System, float]]:
+        """
+        Get the most populated systems within a radius around a system or a point.
+        :param radius: search radius in ly
+        :param limit: maximum number of systems
+        :param system_name: name of the reference system, left out of the results
+        :param position: coordinates of the center if no reference system is given
+        :param filters: attributes the systems must have
+        :return: systems and their distance, most populated first
+        :raises ValueError: if the reference system is unknown or neither it nor a position is given
+        """
+        position, exclude_sid = await self._resolve_center(system_name, position)
+        return await self._db.get_top_systems(*position, radius, limit, filters, exclude_sid)
+
+    async def _resolve_center(
+            self, system_name: Optional[str], position: Optional[Tuple[float, float, float]]
+    ) -> Tuple[Tuple[float, float, float], Optional[int]]:
+        """
+        :return: coordinates of the center and the EDDB ID of the reference system, if one is given
+        """
+        if system_name is None:
+            if position is None:
+                raise ValueError("Either a system or a position is required")
+            return position, None
+        ref_system = await self._db.get_system_by_name(system_name)
+        if ref_system.sid < 0:
+            raise ValueError(f"Unknown system: {system_name}")
+        return (ref_system.x, ref_system.y, ref_system.z), ref_system.sid
+
+    async def plan_route(self, source_name: str, destination_name: str, jump_range: float) -> Optional[Route]:
+        """
+        Plan a near-shortest route between two systems and keep it as the CMDR's current route.
+        The route has at most 1.5 times the fewest possible jumps, see RoutePlanner.async_plan.
+        :param source_name: name of the first system
+        :param destination_name: name of the last system
+        :param jump_range: maximum distance of a single jump in ly
+        :return: route, None if the destination can't be reached with the jump range
+        :raises ValueError: if a system is unknown or the jump range not positive
+        """
+        self.route = await self._systems.routes.async_plan(source_name, destination_name, jump_range)
+        async_dispatcher_send(self._hass, SIGNAL_ROUTE_PLANNED)
+        return self.route
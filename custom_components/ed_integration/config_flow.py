@@ -6,10 +6,15 @@ from homeassistant.core import callback
 import voluptuous as vol
 
 from .const import (
+    DEFAULT_CACHE_TTLS,
     DOMAIN,
     KEY_CMDR_NAME,
+    KEY_EDDN_LIVE_UPDATES,
     KEY_EDSM_API_KEY,
     KEY_INARA_API_KEY,
+    KEY_JOURNAL_DIRECTORY,
+    KEY_MAX_SCAN_INTERVAL,
+    KEY_POP_SYSTEMS_INCREMENTAL_REFRESH,
     KEY_POP_SYSTEMS_REFRESH_INTERVAL,
 )
 
@@ -103,6 +108,12 @@ class EDOptionsFlowHandler(config_entries.OptionsFlow):
     async def _async_show_form(self):
         data_schema = OrderedDict()
         data_schema[vol.Required(KEY_POP_SYSTEMS_REFRESH_INTERVAL, default=24)] = int
+        data_schema[vol.Required(KEY_POP_SYSTEMS_INCREMENTAL_REFRESH, default=True)] = bool
+        data_schema[vol.Required(KEY_EDDN_LIVE_UPDATES, default=False)] = bool
+        data_schema[vol.Required(KEY_MAX_SCAN_INTERVAL, default=30)] = vol.All(int, vol.Range(min=1))
+        for key, ttl in DEFAULT_CACHE_TTLS.items():
+            data_schema[vol.Required(key, default=ttl)] = vol.All(int, vol.Range(min=0))
+        data_schema[vol.Optional(KEY_JOURNAL_DIRECTORY, default="")] = str
         return self.async_show_form(
             step_id="user",
             data_schema=vol.Schema(data_schema),
@@ -11,13 +11,32 @@ KEY_CMDR_NAME = "cmdr_name"
 KEY_EDSM_API_KEY = "edsm_api_key"
 KEY_INARA_API_KEY = "inara_api_key"
 KEY_POP_SYSTEMS_REFRESH_INTERVAL = "pop_systems_refresh_interval"
+KEY_POP_SYSTEMS_INCREMENTAL_REFRESH = "pop_systems_incremental_refresh"
+KEY_MAX_SCAN_INTERVAL = "max_scan_interval"
+KEY_CACHE_TTL_POSITION = "cache_ttl_position"
+KEY_CACHE_TTL_CREDITS = "cache_ttl_credits"
+KEY_CACHE_TTL_PROFILE = "cache_ttl_profile"
+KEY_JOURNAL_DIRECTORY = "journal_directory"
+KEY_EDDN_LIVE_UPDATES = "eddn_live_updates"
+
+DEFAULT_CACHE_TTLS = {  # s
+    KEY_CACHE_TTL_POSITION: 30,
+    KEY_CACHE_TTL_CREDITS: 300,
+    KEY_CACHE_TTL_PROFILE: 6 * 60 * 60,  # pledges change at most weekly
+}
 
 KEY_OUTPUT_LOCATION_STR = "location_str"
 KEY_OUTPUT_BALANCE_STR = "balance_str"
+KEY_OUTPUT_POWER_STR = "power_str"
 
 # Icons
 ICON_LOCATION = "mdi:map-marker"
 ICON_BALANCE = "mdi:cash"
+ICON_POWER = "mdi:shield-star"
+ICON_POLL_INTERVAL = "mdi:timer-outline"
+ICON_SYSTEM_DATA = "mdi:database"
+ICON_DIAGNOSTICS = "mdi:speedometer"
+ICON_ROUTE = "mdi:map-marker-path"
 
 STARTUP_MESSAGE = f"""
 -------------------------------------------------------------------
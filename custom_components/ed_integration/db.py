@@ -1,10 +1,22 @@
 """Provides system database related functions"""
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor
 import datetime
+from itertools import islice
 import logging
-from math import pow, sqrt
+from math import sqrt
+from operator import itemgetter
 import os
 import sqlite3 as sql
-from typing import List, Tuple
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from .cache import LRUCache
+from .engine import SystemTable
+from .profiling import Profiler
+from .snapshot import CoordinateSnapshot, open_snapshot, write_snapshot
+from .telemetry import Telemetry
 
 cwd = os.path.dirname(__file__)
 DB_FILEPATH = os.path.join(cwd, "database.db")
@@ -13,86 +25,268 @@ SQL_GET_DB_TABLES_FILEPATH = os.path.join(cwd, "sqls", "get_tables_in_db.sql")
 SQL_UPDATE_SYSTEM_FILEPATH = os.path.join(cwd, "sqls", "update_system.sql")
 SQL_GET_LAST_UPDATED_DATE = os.path.join(cwd, "sqls", "get_last_updated_date.sql")
 SQL_SET_LAST_UPDATED_DATE = os.path.join(cwd, "sqls", "update_last_updated_date.sql")
-DB_TABLES = ["SYSTEMS", "SYSTEMS_META"]
+SQL_CREATE_SYSTEMS_STAGING_FILEPATH = os.path.join(cwd, "sqls", "create_systems_staging.sql")
+SQL_INDEX_SYSTEMS_STAGING_FILEPATH = os.path.join(cwd, "sqls", "index_systems_staging.sql")
+SQL_SWAP_SYSTEMS_STAGING_FILEPATH = os.path.join(cwd, "sqls", "swap_systems_staging.sql")
+SQL_UPDATE_SYSTEM_RTREE_FILEPATH = os.path.join(cwd, "sqls", "update_system_rtree.sql")
+SQL_GET_SYSTEMS_WITHIN_RADIUS_FILEPATH = os.path.join(cwd, "sqls", "get_systems_within_radius.sql")
+SQL_GET_GENERATION_FILEPATH = os.path.join(cwd, "sqls", "get_generation.sql")
+SQL_INCREMENT_GENERATION_FILEPATH = os.path.join(cwd, "sqls", "increment_generation.sql")
+SQL_APPLY_SYSTEM_UPDATE_FILEPATH = os.path.join(cwd, "sqls", "apply_system_update.sql")
+SQL_SET_GENERATION_FILEPATH = os.path.join(cwd, "sqls", "set_generation.sql")
+SQL_GET_DOWNLOAD_VALIDATORS_FILEPATH = os.path.join(cwd, "sqls", "get_download_validators.sql")
+SQL_SET_DOWNLOAD_VALIDATORS_FILEPATH = os.path.join(cwd, "sqls", "set_download_validators.sql")
+SQL_GET_SYSTEM_POSITIONS_FILEPATH = os.path.join(cwd, "sqls", "get_system_positions.sql")
+SQL_SEARCH_SYSTEMS_FILEPATH = os.path.join(cwd, "sqls", "search_systems.sql")
+SQL_GET_SYSTEM_SNAPSHOT_FILEPATH = os.path.join(cwd, "sqls", "get_system_snapshot.sql")
+SQL_FILTER_SYSTEMS_FILEPATH = os.path.join(cwd, "sqls", "filter_systems.sql")
+SQL_COUNT_SYSTEMS_BY_FILEPATH = os.path.join(cwd, "sqls", "count_systems_by.sql")
+SQL_GET_TOP_SYSTEMS_FILEPATH = os.path.join(cwd, "sqls", "get_top_systems.sql")
+SQL_GET_SYSTEM_TABLE_FILEPATH = os.path.join(cwd, "sqls", "get_system_table.sql")
+# schema version -> script migrating it to the next version
+# databases created before the schema was versioned report version 0
+SQL_MIGRATION_FILEPATHS = {
+    0: os.path.join(cwd, "sqls", "migrate_v0_to_v2.sql"),
+    2: os.path.join(cwd, "sqls", "migrate_v2_to_v3.sql"),
+    3: os.path.join(cwd, "sqls", "migrate_v3_to_v4.sql"),
+}
+DB_TABLES = [
+    "SYSTEMS", "SYSTEMS_META", "GOVERNMENTS", "ALLEGIANCES", "SECURITIES", "ECONOMIES", "POWERS", "POWER_STATES",
+    "FACTIONS", "RESERVE_TYPES",
+]
+SCHEMA_VERSION = 4
+NEAREST_INITIAL_RADIUS = 50.0  # ly, doubled until enough systems are found
+NEAREST_MAX_RADIUS = 100000.0  # ly, beyond the extent of the galaxy
+READ_CONNECTIONS = 2
+INGEST_CHUNK_SIZE = 500  # stays below SQLite's historic limit of 999 host parameters per statement
+SYSTEM_CACHE_SIZE = 256
+SEARCH_PAGE_SIZE = 50
+SEARCH_SHELLS = 8  # width of the first shell a search expands by, as fraction of its radius
+SNAPSHOT_SUFFIX = ".coords"  # appended to the database file name
+
+# shared by all statements reading or writing whole systems, also the keys of the EDDB systems JSON
+SYSTEM_COLUMNS = (
+    "id", "edsm_id", "name", "x", "y", "z", "population", "is_populated", "government_id", "government",
+    "allegiance_id", "allegiance", "security_id", "security", "primary_economy_id", "primary_economy",
+    "power", "power_state", "power_state_id", "needs_permit", "updated_at", "controlling_minor_faction_id",
+    "controlling_minor_faction", "reserve_type_id", "reserve_type",
+)
+UPDATED_AT_INDEX = SYSTEM_COLUMNS.index("updated_at")
+# lookup table and id column of SYSTEMS per attribute systems can be filtered and grouped by
+ATTRIBUTE_COLUMNS = {
+    "economy": ("ECONOMIES", "primary_economy_id"),
+    "security": ("SECURITIES", "security_id"),
+    "allegiance": ("ALLEGIANCES", "allegiance_id"),
+    "government": ("GOVERNMENTS", "government_id"),
+    "power": ("POWERS", "power_id"),
+    "power_state": ("POWER_STATES", "power_state_id"),
+}
+SQL_SELECT_SYSTEM_BY = f"SELECT {', '.join(SYSTEM_COLUMNS)} FROM SYSTEMS_VIEW WHERE {{column}} = ?"
+SQL_SELECT_SYSTEMS_BY_IDS = f"SELECT {', '.join(SYSTEM_COLUMNS)} FROM SYSTEMS_VIEW WHERE id IN ({{placeholders}})"
+# lookup table, id column, name column of the categorical values SYSTEMS only stores the ids of
+LOOKUP_COLUMNS = (
+    ("GOVERNMENTS", "government_id", "government"),
+    ("ALLEGIANCES", "allegiance_id", "allegiance"),
+    ("SECURITIES", "security_id", "security"),
+    ("ECONOMIES", "primary_economy_id", "primary_economy"),
+    ("POWER_STATES", "power_state_id", "power_state"),
+    ("FACTIONS", "controlling_minor_faction_id", "controlling_minor_faction"),
+    ("RESERVE_TYPES", "reserve_type_id", "reserve_type"),
+)
+# columns of the SYSTEMS table, power ids are assigned locally since EDDB has none
+SYSTEM_DATA_COLUMNS = tuple(
+    column for column in SYSTEM_COLUMNS if column not in {name for _, _, name in LOOKUP_COLUMNS} | {"power"}
+) + ("power_id",)
+
+SystemRow = Tuple[
+    int, int, str, float, float, float, int, bool, int, str, int, str, int,
+    str, int, str, str, str, int, bool, int, int, str, int, str,
+]
+
+
+class SystemsDelta(NamedTuple):
+    """
+    Row counts of an incremental systems refresh.
+    """
+
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    removed: int = 0
+
+
+class DownloadValidators(NamedTuple):
+    """
+    HTTP validators of the last downloaded systems dump.
+    """
+
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    content_length: Optional[int] = None
+
+
+class SystemFilter(NamedTuple):
+    """
+    Attributes a system search is restricted to, None for any. Names are matched case-insensitively.
+    """
+
+    economy: Optional[str] = None
+    security: Optional[str] = None
+    allegiance: Optional[str] = None
+    government: Optional[str] = None
+    power: Optional[str] = None
+    power_state: Optional[str] = None
+    min_population: Optional[int] = None
+    max_population: Optional[int] = None
+    needs_permit: Optional[bool] = None
+
+
+class SearchCursor(NamedTuple):
+    """
+    Position of a system search after the last row of a page, the next page starts behind it.
+    """
 
+    distance_sq: float
+    sid: int
+    step: float  # ly the search expanded by to fill the page
 
-class System:
+
+class System(NamedTuple):
     """
     Represents a single system as existing in EDDB API JSON.
+    Immutable and tuple-backed, fields in the order of SYSTEM_COLUMNS, so rows map onto it directly.
+    Flags are kept as the integers 0 and 1 SQLite stores them as.
     """
 
-    def __init__(
-            self,
-            sid: int = -1,
-            edsm_id: int = -1,
-            name: str = 'n/a',
-            x: float = 0,
-            y: float = 0,
-            z: float = 0,
-            population: int = -1,
-            is_populated: bool = True,
-            government_id: int = -1,
-            government: str = 'n/a',
-            allegiance_id: int = -1,
-            allegiance: str = 'n/a',
-            security_id: int = -1,
-            security: str = 'n/a',
-            primary_economy_id: int = -1,
-            primary_economy: str = 'n/a',
-            power: str = 'n/a',
-            power_state: str = 'n/a',
-            power_state_id: int = -1,
-            needs_permit: bool = False,
-            updated_at: int = -1,
-            controlling_minor_faction_id: int = -1,
-            controlling_minor_faction: str = 'n/a',
-            reserve_type_id: int = -1,
-            reserve_type: str = 'n/a',
-    ):
-        self.sid = sid
-        self.edsm_id = edsm_id
-        self.name = name
-        self.x = x
-        self.y = y
-        self.z = z
-        self.population = population
-        self.is_populated = is_populated
-        self.government_id = government_id
-        self.government = government
-        self.allegiance_id = allegiance_id
-        self.allegiance = allegiance
-        self.security_id = security_id
-        self.security = security
-        self.primary_economy_id = primary_economy_id
-        self.primary_economy = primary_economy
-        self.power = power
-        self.power_state = power_state
-        self.power_state_id = power_state_id
-        self.needs_permit = needs_permit
-        self.updated_at = updated_at
-        self.controlling_minor_faction_id = controlling_minor_faction_id
-        self.controlling_minor_faction = controlling_minor_faction
-        self.reserve_type_id = reserve_type_id
-        self.reserve_type = reserve_type
+    sid: int = -1
+    edsm_id: int = -1
+    name: str = 'n/a'
+    x: float = 0
+    y: float = 0
+    z: float = 0
+    population: int = -1
+    is_populated: int = 1
+    government_id: int = -1
+    government: str = 'n/a'
+    allegiance_id: int = -1
+    allegiance: str = 'n/a'
+    security_id: int = -1
+    security: str = 'n/a'
+    primary_economy_id: int = -1
+    primary_economy: str = 'n/a'
+    power: str = 'n/a'
+    power_state: str = 'n/a'
+    power_state_id: int = -1
+    needs_permit: int = 0
+    updated_at: int = -1
+    controlling_minor_faction_id: int = -1
+    controlling_minor_faction: str = 'n/a'
+    reserve_type_id: int = -1
+    reserve_type: str = 'n/a'
+
+
+def system_row_factory(_cursor: sql.Cursor, row: tuple) -> System:
+    """
+    Row factory mapping rows selected in the order of SYSTEM_COLUMNS onto System.
+    """
+    return System._make(row)
+
+
+def system_distance_row_factory(_cursor: sql.Cursor, row: tuple) -> Tuple[System, float]:
+    """
+    Row factory for rows in the order of SYSTEM_COLUMNS followed by a squared distance.
+    """
+    return System._make(row[:-1]), sqrt(row[-1])
+
+
+class SearchPage(NamedTuple):
+    """
+    Page of system search results.
+    """
+
+    systems: List[Tuple[System, float]]  # and their distance to the center, closest first
+    next_cursor: Optional[SearchCursor]  # None on the last page
+
+
+class SystemEncoder:
+    """
+    Turns system rows into rows of the SYSTEMS table, writing the names of categorical values to their lookup
+    tables as they appear. Remembers the lookup tables' contents, so one instance should be used per write
+    transaction and only the new or renamed values of each chunk are written.
+    """
+
+    def __init__(self, conn: sql.Connection):
+        """
+        :param conn: connection of the writing transaction
+        """
+        self._conn = conn
+        self._lookups = [
+            (table, SYSTEM_COLUMNS.index(id_column), SYSTEM_COLUMNS.index(name_column),
+             dict(conn.execute(f"SELECT id, name FROM {table}")))
+            for table, id_column, name_column in LOOKUP_COLUMNS
+        ]
+        self._powers: Dict[str, int] = {name: pid for pid, name in conn.execute("SELECT id, name FROM POWERS")}
+        self._power_index = SYSTEM_COLUMNS.index("power")
+        self._data_getter = itemgetter(*(SYSTEM_COLUMNS.index(column) for column in SYSTEM_DATA_COLUMNS[:-1]))
+
+    def power_id(self, power: Optional[str]) -> Optional[int]:
+        """
+        Gets the local id of a power, assigning one to new powers.
+        :param power: power name
+        :return: power id, None if no power is given
+        """
+        if power is None:
+            return None
+        pid = self._powers.get(power)
+        if pid is None:
+            pid = self._conn.execute("INSERT INTO POWERS (name) VALUES (?)", [power]).lastrowid
+            self._powers[power] = pid
+        return pid
+
+    def encode(self, systems: List[SystemRow]) -> List[tuple]:
+        """
+        :param systems: rows as described in Database.add_system
+        :return: rows in the order of SYSTEM_DATA_COLUMNS
+        """
+        for table, id_index, name_index, known in self._lookups:
+            new = {
+                (row[id_index], row[name_index]) for row in systems
+                if row[id_index] is not None and row[name_index] is not None
+                and known.get(row[id_index]) != row[name_index]
+            }
+            if new:
+                self._conn.executemany(f"INSERT OR REPLACE INTO {table} (id, name) VALUES (?, ?)", new)
+                known.update(new)
+        getter = self._data_getter
+        power_index = self._power_index
+        return [getter(row) + (self.power_id(row[power_index]),) for row in systems]
 
 
 class Database:
     """
     Represents a database of populated E:D systems and provides useful functions to retrieve data from it.
+    All statements run off the event loop: writes are serialized on a single writer thread, reads are served
+    by a small pool of threads with read-only connections, which see the last committed data thanks to WAL.
     """
 
-    def __init__(self, logger: logging.Logger):
-        self.__conn = sql.connect(DB_FILEPATH)
+    def __init__(
+            self,
+            logger: logging.Logger,
+            read_connections: int = READ_CONNECTIONS,
+            system_cache_size: int = SYSTEM_CACHE_SIZE,
+    ):
         self._logger = logger
-        self._logger.debug("Connected to database.")
-
-        # Register custom functions
-        self.__conn.create_function("sqrt", 1, sqrt)
-        self.__conn.create_function("pow", 2, pow)
-        self._logger.debug("Registered custom functions.")
 
         with open(SQL_UPDATE_SYSTEM_FILEPATH) as insert_station_sql_file:
-            self.__update_station_sql_str = insert_station_sql_file.read()
+            insert_station_sql_str = insert_station_sql_file.read()
+            columns = ", ".join(SYSTEM_DATA_COLUMNS)
+            placeholders = ", ".join("?" * len(SYSTEM_DATA_COLUMNS))
+            self.__update_station_sql_str = insert_station_sql_str.format(
+                table="SYSTEMS", columns=columns, placeholders=placeholders
+            )
+            self.__insert_staging_sql_str = insert_station_sql_str.format(
+                table="SYSTEMS_STAGING", columns=columns, placeholders=placeholders
+            )
         with open(SQL_GET_DB_TABLES_FILEPATH) as get_db_tables_sql_file:
             self.__get_db_tables_sql_str = get_db_tables_sql_file.read()
         with open(SQL_RESET_DB_FILEPATH) as reset_db_file:
@@ -101,20 +295,243 @@ class Database:
             self.__get_last_updated_date = get_last_updated_date_file.read()
         with open(SQL_SET_LAST_UPDATED_DATE) as set_last_updated_date_file:
             self.__set_last_updated_date = set_last_updated_date_file.read()
+        with open(SQL_CREATE_SYSTEMS_STAGING_FILEPATH) as create_staging_file:
+            self.__create_staging_sql_str = create_staging_file.read()
+        with open(SQL_INDEX_SYSTEMS_STAGING_FILEPATH) as index_staging_file:
+            self.__index_staging_sql_str = index_staging_file.read()
+        with open(SQL_SWAP_SYSTEMS_STAGING_FILEPATH) as swap_staging_file:
+            self.__swap_staging_sql_str = swap_staging_file.read()
+        with open(SQL_UPDATE_SYSTEM_RTREE_FILEPATH) as update_system_rtree_file:
+            self.__update_system_rtree_sql_str = update_system_rtree_file.read()
+        with open(SQL_GET_SYSTEMS_WITHIN_RADIUS_FILEPATH) as get_systems_within_radius_file:
+            self.__get_systems_within_radius_sql_str = get_systems_within_radius_file.read().format(
+                columns=", ".join(f"s.{column}" for column in SYSTEM_COLUMNS)
+            )
+        with open(SQL_GET_GENERATION_FILEPATH) as get_generation_file:
+            self.__get_generation_sql_str = get_generation_file.read()
+        with open(SQL_INCREMENT_GENERATION_FILEPATH) as increment_generation_file:
+            self.__increment_generation_sql_str = increment_generation_file.read()
+        with open(SQL_APPLY_SYSTEM_UPDATE_FILEPATH) as apply_system_update_file:
+            self.__apply_system_update_sql_str = apply_system_update_file.read()
+        with open(SQL_SET_GENERATION_FILEPATH) as set_generation_file:
+            self.__set_generation_sql_str = set_generation_file.read()
+        with open(SQL_GET_DOWNLOAD_VALIDATORS_FILEPATH) as get_download_validators_file:
+            self.__get_download_validators_sql_str = get_download_validators_file.read()
+        with open(SQL_SET_DOWNLOAD_VALIDATORS_FILEPATH) as set_download_validators_file:
+            self.__set_download_validators_sql_str = set_download_validators_file.read()
+        with open(SQL_GET_SYSTEM_POSITIONS_FILEPATH) as get_system_positions_file:
+            self.__get_system_positions_sql_str = get_system_positions_file.read()
+        with open(SQL_FILTER_SYSTEMS_FILEPATH) as filter_systems_file:
+            # indented to line up with the WHERE of the statements it is inserted into
+            filters = "\n".join(filter_systems_file.read().splitlines()[1:]).replace("\n", "\n      ")
+        view_columns = ", ".join(f"s.{column}" for column in SYSTEM_COLUMNS)
+        with open(SQL_SEARCH_SYSTEMS_FILEPATH) as search_systems_file:
+            self.__search_systems_sql_str = search_systems_file.read().format(columns=view_columns, filters=filters)
+        with open(SQL_COUNT_SYSTEMS_BY_FILEPATH) as count_systems_by_file:
+            count_systems_by_sql_str = count_systems_by_file.read()
+            self.__count_systems_by_sql_strs = {
+                attribute: count_systems_by_sql_str.format(table=table, column=column, filters=filters)
+                for attribute, (table, column) in ATTRIBUTE_COLUMNS.items()
+            }
+        with open(SQL_GET_TOP_SYSTEMS_FILEPATH) as get_top_systems_file:
+            self.__get_top_systems_sql_str = get_top_systems_file.read().format(columns=view_columns, filters=filters)
+        with open(SQL_GET_SYSTEM_TABLE_FILEPATH) as get_system_table_file:
+            self.__get_system_table_sql_str = get_system_table_file.read()
+        with open(SQL_GET_SYSTEM_SNAPSHOT_FILEPATH) as get_system_snapshot_file:
+            self.__get_system_snapshot_sql_str = get_system_snapshot_file.read()
         self._logger.debug("Retrieved prefab sql scripts.")
 
-        query = self.__conn.execute(self.__get_db_tables_sql_str)
-        table_list = (t[0] for t in query.fetchall())
-        if not set(DB_TABLES) <= set(table_list):  # if tables not in db, do reset
-            self.reset()
+        # system lookups by id and name, dropped whenever a write changes the generation
+        self._system_cache = LRUCache("systems", system_cache_size)
+        # db.read and db.write for all statements, db.<function> per query, ingest.<phase> for refreshes
+        self.telemetry = Telemetry()
+        # set while an operation is profiled, statements on the database threads are profiled as well
+        self.profiler: Optional[Profiler] = None
+        self.__generation: Optional[int] = None
+        # coordinates mapped from disk, spatial queries use it while it matches the generation
+        self._snapshot: Optional[CoordinateSnapshot] = None
+        # systems held in memory, filtered searches and aggregates use it while it matches the generation
+        self._table: Optional[SystemTable] = None
+        self.__local = threading.local()
+        self.__connections: List[sql.Connection] = []
+        self.__connections_lock = threading.Lock()
+        self.__writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ed_integration_db_writer")
+        self.__readers = ThreadPoolExecutor(
+            max_workers=read_connections, thread_name_prefix="ed_integration_db_reader"
+        )
+        # read connections can only be opened once the writer has created the database
+        self.__ready: Future = self.__writer.submit(self.__setup)
+        # built after the setup, so queries don't wait for it and fall back to SQL until it is ready
+        self.__writer.submit(lambda: self.__update_table(self.__connection(False)))
+
+    @staticmethod
+    def _connect(read_only: bool = False) -> sql.Connection:
+        """
+        Opens a new connection to the database file.
+        :param read_only: open the connection in read-only mode
+        :return: sqlite connection
+        """
+        if read_only:
+            return sql.connect(f"file:{DB_FILEPATH}?mode=ro", uri=True, check_same_thread=False)
+        return sql.connect(DB_FILEPATH, check_same_thread=False)
+
+    @staticmethod
+    def _snapshot_filepath() -> str:
+        return f"{DB_FILEPATH}{SNAPSHOT_SUFFIX}"
 
-    def reset(self) -> None:
+    def __connection(self, read_only: bool) -> sql.Connection:
+        """
+        Gets the connection of the current database thread, opening it on first use.
+        :param read_only: open the connection in read-only mode
+        :return: sqlite connection
+        """
+        conn = getattr(self.__local, "conn", None)
+        if conn is None:
+            conn = self._connect(read_only)
+            self.__local.conn = conn
+            with self.__connections_lock:
+                self.__connections.append(conn)
+            self._logger.debug("Connected to database.")
+        return conn
+
+    def __setup(self) -> None:
+        """
+        Prepares the database on the writer thread, migrating it from older versions where possible and
+        resetting it if tables are missing or outdated.
+        """
+        conn = self.__connection(False)
+        # readers keep seeing the last committed generation while a refresh is being written
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+
+        schema_version = conn.execute("PRAGMA user_version").fetchone()[0]
+        table_list = [t[0] for t in conn.execute(self.__get_db_tables_sql_str).fetchall()]
+        # a new database reports version 0 as well, but has nothing to migrate
+        while "SYSTEMS" in table_list and schema_version in SQL_MIGRATION_FILEPATHS:
+            if not self.__migrate(conn, schema_version):
+                break
+            schema_version = conn.execute("PRAGMA user_version").fetchone()[0]
+            table_list = [t[0] for t in conn.execute(self.__get_db_tables_sql_str).fetchall()]
+        # if tables not in db or created by an older version, do reset
+        if not set(DB_TABLES) <= set(table_list) or schema_version != SCHEMA_VERSION:
+            self._reset(conn)
+        else:
+            self.__load_generation(conn)
+            # left behind by the last run, unless a write was interrupted before the snapshot caught up
+            self._snapshot = open_snapshot(self._snapshot_filepath())
+            self.__update_snapshot(conn)
+
+    def __migrate(self, conn: sql.Connection, schema_version: int) -> bool:
+        """
+        Migrates the database from a schema version to the next one, keeping the stored data.
+        :param schema_version: current schema version
+        :return: if the migration succeeded
+        """
+        self._logger.info(f"Migrating database from schema version {schema_version}...")
+        with open(SQL_MIGRATION_FILEPATHS[schema_version]) as migration_file:
+            migration_sql_str = migration_file.read()
+        try:
+            conn.executescript(migration_sql_str)
+        except sql.Error as e:
+            if conn.in_transaction:
+                conn.rollback()
+            self._logger.warning(f"Migrating database from schema version {schema_version} failed: {e}")
+            return False
+        return True
+
+    def __load_generation(self, conn: sql.Connection) -> None:
+        """
+        Remembers the generation after a write, to be compared by cached lookups without a query.
+        """
+        self.__generation = conn.execute(self.__get_generation_sql_str).fetchone()[0]
+
+    def __update_snapshot(self, conn: sql.Connection) -> None:
+        """
+        Rewrites the coordinate snapshot on the writer thread if it is behind the data. A failed write only costs
+        speed, spatial queries fall back to SQL.
+        """
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.generation == self.__generation:
+            return
+        path = self._snapshot_filepath()
+        try:
+            with self.telemetry.span("snapshot.write"):
+                count = write_snapshot(path, self.__generation, conn.execute(self.__get_system_snapshot_sql_str))
+                # readers may still use the previous snapshot, its mapping is released with the last reference
+                self._snapshot = open_snapshot(path)
+        except OSError as e:
+            self._logger.warning(f"Writing coordinate snapshot failed: {e}")
+            self._snapshot = None
+            return
+        self._logger.debug(f"Wrote coordinate snapshot of {count} systems, generation {self.__generation}.")
+
+    def __submit(self, executor: ThreadPoolExecutor, read_only: bool, func: Callable, *args) -> "asyncio.Future":
+        """
+        Runs a function with the connection of a database thread.
+        :param executor: thread pool to run on
+        :param read_only: if the function only reads
+        :param func: function taking the connection as first argument
+        :param args: further arguments of func
+        :return: awaitable result of func
+        """
+
+        def job():
+            self.__ready.result()
+            conn = self.__connection(read_only)
+            started = time.perf_counter()
+            error = None
+            profiler = self.profiler
+            try:
+                if profiler is not None:
+                    return profiler.runcall(func, conn, *args)
+                return func(conn, *args)
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                duration = time.perf_counter() - started
+                self.telemetry.record("db.read" if read_only else "db.write", duration, error)
+                self.telemetry.record(f"db.{func.__name__.lstrip('_')}", duration, error)
+
+        return asyncio.wrap_future(executor.submit(job))
+
+    def _read(self, func: Callable[..., Any], *args) -> "asyncio.Future":
+        """
+        Runs a function with a read-only connection on one of the reader threads.
+        :param func: function taking the connection as first argument
+        :param args: further arguments of func
+        :return: awaitable result of func
+        """
+        return self.__submit(self.__readers, True, func, *args)
+
+    def _write(self, func: Callable[..., Any], *args) -> "asyncio.Future":
+        """
+        Runs a function with the read-write connection on the writer thread.
+        :param func: function taking the connection as first argument
+        :param args: further arguments of func
+        :return: awaitable result of func
+        """
+        return self.__submit(self.__writer, False, func, *args)
+
+    async def reset(self) -> None:
         """
         Drops and recreates all database tables, dropping all data (!).
         """
+        await self._write(self._reset)
+
+    def _reset(self, conn: sql.Connection) -> None:
         self._logger.debug("Resetting database...")
-        self.__conn.executescript(self.__reset_db_sql_str)
-        self.__conn.commit()
+        try:
+            row = conn.execute(self.__get_generation_sql_str).fetchone()
+        except sql.Error:
+            row = None
+        conn.executescript(self.__reset_db_sql_str)
+        # the generation keeps counting up, so data cached before the reset is never mistaken for current data
+        with conn:
+            conn.execute(self.__set_generation_sql_str, [(row[0] if row else 0) + 1])
+        self.__load_generation(conn)
+        self.__update_snapshot(conn)
+        self.__update_table(conn)
 
     async def add_system(
             self,
@@ -172,8 +589,8 @@ class Database:
         :param reserve_type_id: EDDB mineral reserve type ID
         :param reserve_type: mineral reservere type string
         """
-        self.__conn.execute(
-            self.__update_station_sql_str,
+        await self._write(
+            self._insert_system,
             (
                 sid,
                 edsm_id,
@@ -202,47 +619,351 @@ class Database:
                 reserve_type,
             ),
         )
-        self.__conn.commit()
 
-    async def add_systems(
+    def _insert_system(self, conn: sql.Connection, system: SystemRow) -> None:
+        with conn:
+            conn.execute(self.__update_station_sql_str, SystemEncoder(conn).encode([system])[0])
+            conn.execute(
+                self.__update_system_rtree_sql_str,
+                (system[0], system[3], system[3], system[4], system[4], system[5], system[5]),
+            )
+            conn.execute(self.__increment_generation_sql_str)
+        self.__load_generation(conn)
+        self.__update_snapshot(conn)
+        self.__update_table(conn)
+
+    async def add_systems(self, systems: Iterable[SystemRow], chunk_size: int = INGEST_CHUNK_SIZE) -> int:
+        """
+        Rebuild the systems table from a (possibly lazy) iterable, written in fixed-size chunks.
+        Rows go into a staging table which replaces the live table in a single transaction once it is complete,
+        so readers keep seeing the previous generation until then and a failed ingest leaves it untouched.
+        The iterable is consumed on the writer thread, so it can be fed straight from a download stream.
+        :param systems: iterable of tuple as described in add_system
+        :param chunk_size: number of rows passed to a single executemany call
+        :return: number of rows written
+        """
+        return await self._write(self._insert_systems_staged, systems, chunk_size)
+
+    def _insert_systems_staged(self, conn: sql.Connection, systems: Iterable[SystemRow], chunk_size: int) -> int:
+        systems = iter(systems)
+        total = 0
+        generation = conn.execute(self.__get_generation_sql_str).fetchone()[0]
+        conn.executescript(self.__create_staging_sql_str.format(generation=generation + 1))
+        try:
+            # includes waiting for the download, which ingest.download_wait tells apart
+            with self.telemetry.span("ingest.insert"), conn:
+                encoder = SystemEncoder(conn)
+                while True:
+                    chunk = list(islice(systems, chunk_size))
+                    if not chunk:
+                        break
+                    conn.executemany(self.__insert_staging_sql_str, encoder.encode(chunk))
+                    total += len(chunk)
+                    self._logger.debug("Added %i system rows...", total)
+            with self.telemetry.span("ingest.index"):
+                conn.executescript(self.__index_staging_sql_str.format(generation=generation + 1))
+            with self.telemetry.span("ingest.swap"):
+                conn.executescript(self.__swap_staging_sql_str)
+        except BaseException:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.executescript("DROP TABLE IF EXISTS SYSTEMS_STAGING; DROP TABLE IF EXISTS SYSTEMS_RTREE_STAGING;")
+            raise
+        self.__load_generation(conn)
+        self.__update_snapshot(conn)
+        self.__update_table(conn)
+        self._logger.debug("Swapped in systems table generation %i.", generation + 1)
+        return total
+
+    async def update_systems(self, systems: Iterable[SystemRow], chunk_size: int = INGEST_CHUNK_SIZE) -> SystemsDelta:
+        """
+        Incrementally apply a full set of systems within one database commit.
+        Only rows which are new or whose updated_at is newer than the stored one are written, older rows count as
+        unchanged. Rows without updated_at on either side count as changed. Stored systems missing from the iterable
+        are deleted. Readers see either all or none of the changes. See add_systems.
+        :param systems: iterable of tuple as described in add_system, expected to contain all populated systems
+        :param chunk_size: number of rows compared and written at once
+        :return: counts of inserted, updated, unchanged and removed rows
+        """
+        return await self._write(self._update_systems, systems, chunk_size)
+
+    def _update_systems(self, conn: sql.Connection, systems: Iterable[SystemRow], chunk_size: int) -> SystemsDelta:
+        systems = iter(systems)
+        inserted = updated = unchanged = removed = 0
+        with self.telemetry.span("ingest.update"), conn:
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS SEEN_SYSTEMS (id integer primary key)")
+            conn.execute("DELETE FROM temp.SEEN_SYSTEMS")
+            encoder = SystemEncoder(conn)
+            while True:
+                chunk = list(islice(systems, chunk_size))
+                if not chunk:
+                    break
+                ids = [row[0] for row in chunk]
+                conn.executemany("INSERT OR IGNORE INTO temp.SEEN_SYSTEMS (id) VALUES (?)", ((i,) for i in ids))
+                stored = dict(
+                    conn.execute(
+                        "SELECT id, updated_at FROM SYSTEMS WHERE id IN (%s)" % ",".join("?" * len(ids)),
+                        ids,
+                    )
+                )
+                changed = []
+                for row in chunk:
+                    if row[0] not in stored:
+                        inserted += 1
+                    elif None in (stored[row[0]], row[UPDATED_AT_INDEX]) or stored[row[0]] < row[UPDATED_AT_INDEX]:
+                        updated += 1
+                    else:
+                        unchanged += 1
+                        continue
+                    changed.append(row)
+                conn.executemany(self.__update_station_sql_str, encoder.encode(changed))
+                conn.executemany(
+                    self.__update_system_rtree_sql_str,
+                    ((row[0], row[3], row[3], row[4], row[4], row[5], row[5]) for row in changed),
+                )
+            if inserted + updated + unchanged > 0:
+                removed = conn.execute(
+                    "DELETE FROM SYSTEMS WHERE id NOT IN (SELECT id FROM temp.SEEN_SYSTEMS)"
+                ).rowcount
+                conn.execute("DELETE FROM SYSTEMS_RTREE WHERE id NOT IN (SELECT id FROM temp.SEEN_SYSTEMS)")
+            else:
+                self._logger.warning("Received no systems, keeping stored systems.")
+            if inserted + updated + removed > 0:
+                conn.execute(self.__increment_generation_sql_str)
+            conn.execute("DROP TABLE temp.SEEN_SYSTEMS")
+        self.__load_generation(conn)
+        self.__update_snapshot(conn)
+        self.__update_table(conn)
+        delta = SystemsDelta(inserted, updated, unchanged, removed)
+        self._logger.debug(f"Updated systems: {delta}")
+        return delta
+
+    async def apply_system_updates(self, updates: Iterable[Dict[str, Any]]) -> int:
+        """
+        Applies partial updates of known systems, e.g. as observed by other CMDRs, within one database commit.
+        An update is skipped if the system is unknown or the stored data is newer. Live updates only carry names,
+        a name missing from its lookup table keeps the stored value, new powers are added. The power and its state
+        are only cleared if the update says the system has no power.
+        :param updates: mappings with the keys name, updated_at, population, government, allegiance, security,
+            primary_economy, power, power_state and controlling_minor_faction, None for values not reported, and
+            powerless, True if the system is in no power's sphere
+        :return: number of systems updated
+        """
+        return await self._write(self._apply_system_updates, list(updates))
+
+    def _apply_system_updates(self, conn: sql.Connection, updates: List[Dict[str, Any]]) -> int:
+        with conn:
+            encoder = SystemEncoder(conn)
+            for update in updates:
+                encoder.power_id(update["power"])
+            updated = conn.executemany(self.__apply_system_update_sql_str, updates).rowcount
+            if updated > 0:
+                conn.execute(self.__increment_generation_sql_str)
+        self.__load_generation(conn)
+        if updated > 0:
+            names = [update["name"] for update in updates]
+            self.__patch_snapshot(conn, names)
+            self.__patch_table(conn, names)
+        self._logger.debug(f"Applied {updated} of {len(updates)} live system updates.")
+        return updated
+
+    def __patch_snapshot(self, conn: sql.Connection, names: List[str]) -> None:
+        """
+        Brings the power columns of the coordinate snapshot up to date after live updates, which are too frequent
+        to rewrite it every time. Without numpy the snapshot is rewritten by the next refresh instead.
+        """
+        snapshot = self._snapshot
+        if snapshot is None or not snapshot.available():
+            return
+        rows = []
+        for start in range(0, len(names), INGEST_CHUNK_SIZE):
+            chunk = names[start:start + INGEST_CHUNK_SIZE]
+            rows += conn.execute(
+                "SELECT id, coalesce(power_id, -1), coalesce(power_state_id, -1) FROM SYSTEMS WHERE name IN (%s)"
+                % ",".join("?" * len(chunk)),
+                chunk,
+            ).fetchall()
+        with self.telemetry.span("snapshot.patch"):
+            snapshot.patch_powers(rows, self.__generation)
+
+    def __select_attribute_names(self, conn: sql.Connection) -> Dict[str, Dict[int, str]]:
+        return {
+            attribute: dict(conn.execute(f"SELECT id, name FROM {table}"))
+            for attribute, (table, _) in ATTRIBUTE_COLUMNS.items()
+        }
+
+    def __update_table(self, conn: sql.Connection) -> None:
+        """
+        Rebuilds the in-memory system table on the writer thread if it is behind the data and numpy is installed.
+        """
+        table = self._table
+        if not SystemTable.available() or self.__generation is None or (
+                table is not None and table.generation == self.__generation):
+            return
+        try:
+            with self.telemetry.span("table.build"):
+                rows = conn.execute(self.__get_system_table_sql_str.format(where="")).fetchall()
+                self._table = SystemTable(self.__generation, rows, self.__select_attribute_names(conn))
+        except (sql.Error, MemoryError) as e:
+            self._logger.warning(f"Building in-memory system table failed: {e}")
+            self._table = None
+            return
+        self._logger.debug(f"Built in-memory table of {self._table.count} systems, {self._table.nbytes} bytes.")
+
+    def __patch_table(self, conn: sql.Connection, names: List[str]) -> None:
+        """
+        Brings the in-memory system table up to date after live updates.
+        """
+        table = self._table
+        if table is None:
+            return
+        rows = []
+        for start in range(0, len(names), INGEST_CHUNK_SIZE):
+            chunk = names[start:start + INGEST_CHUNK_SIZE]
+            where = "WHERE name IN (%s)" % ",".join("?" * len(chunk))
+            rows += conn.execute(self.__get_system_table_sql_str.format(where=where), chunk).fetchall()
+        with self.telemetry.span("table.patch"):
+            table.patch(rows, self.__select_attribute_names(conn), self.__generation)
+
+    def _current_table(self) -> Optional[SystemTable]:
+        """
+        :return: in-memory system table if it matches the current data
+        """
+        table = self._table
+        if table is None or table.generation != self.__generation:
+            return None
+        return table
+
+    def _current_snapshot(self) -> Optional[CoordinateSnapshot]:
+        """
+        :return: coordinate snapshot if it matches the current data and numpy is installed to query it
+        """
+        snapshot = self._snapshot
+        if snapshot is None or not snapshot.available() or snapshot.generation != self.__generation:
+            return None
+        return snapshot
+
+    @staticmethod
+    def _select_systems_by_ids(conn: sql.Connection, sids: List[int]) -> Dict[int, System]:
+        """
+        Selects the rows of the systems an in-memory query found.
+        :return: System instances by EDDB ID, unknown ones are left out
+        """
+        cursor = conn.cursor()
+        cursor.row_factory = system_row_factory
+        systems = {}
+        for start in range(0, len(sids), INGEST_CHUNK_SIZE):
+            chunk = sids[start:start + INGEST_CHUNK_SIZE]
+            query = cursor.execute(SQL_SELECT_SYSTEMS_BY_IDS.format(placeholders=",".join("?" * len(chunk))), chunk)
+            systems.update((system.sid, system) for system in query)
+        return systems
+
+    def _select_with_distances(
+            self, conn: sql.Connection, found: List[Tuple[int, float]]
+    ) -> List[Tuple[System, float]]:
+        """
+        Selects the systems of a SystemTable query in its order.
+        :param found: EDDB IDs and squared distances
+        :return: System instances and their distance
+        """
+        systems = self._select_systems_by_ids(conn, [sid for sid, _ in found])
+        return [(systems[sid], sqrt(distance_sq)) for sid, distance_sq in found if sid in systems]
+
+    def _select_from_snapshot(
             self,
-            systems: List[
-                Tuple[
-                    int,
-                    int,
-                    str,
-                    float,
-                    float,
-                    float,
-                    int,
-                    bool,
-                    int,
-                    str,
-                    int,
-                    str,
-                    int,
-                    str,
-                    int,
-                    str,
-                    str,
-                    str,
-                    int,
-                    bool,
-                    int,
-                    int,
-                    str,
-                    int,
-                    str,
-                ]
-            ],
-    ) -> None:
+            conn: sql.Connection,
+            snapshot: CoordinateSnapshot,
+            x: float,
+            y: float,
+            z: float,
+            radius: float,
+            k: int,
+            power: Optional[str],
+            power_state: Optional[str],
+            exclude_sid: Optional[int],
+    ) -> List[Tuple[System, float]]:
+        """
+        Finds the systems on the coordinate snapshot and only selects the rows of those found.
+        See _select_systems_within_radius.
+        """
+        filter_ids = []
+        for table, name in (("POWERS", power), ("POWER_STATES", power_state)):
+            if name is None:
+                filter_ids.append(None)
+                continue
+            row = conn.execute(f"SELECT min(id) FROM {table} WHERE name = ?", [name]).fetchone()
+            if row[0] is None:
+                return []
+            filter_ids.append(row[0])
+        found = snapshot.query(x, y, z, radius, k, *filter_ids, exclude_sid)
+        if not found:
+            return []
+        systems = self._select_systems_by_ids(conn, [sid for sid, _ in found])
+        # exact distances from the stored coordinates, the snapshot only keeps 32 bits of them
+        result = [
+            (system, sqrt((system.x - x) ** 2 + (system.y - y) ** 2 + (system.z - z) ** 2))
+            for system in (systems.get(sid) for sid, _ in found)
+            if system is not None
+        ]
+        result.sort(key=itemgetter(1))
+        return result
+
+    @property
+    def system_cache_stats(self) -> Dict[str, Any]:
+        """
+        Hit rate and size of the system lookup cache.
+        :return: counters as dictionary
+        """
+        return self._system_cache.as_dict()
+
+    @property
+    def table_stats(self) -> Dict[str, Any]:
+        """
+        State of the in-memory system table.
+        :return: generation, number of systems, memory and if queries use it, as dictionary
+        """
+        table = self._table
+        return {
+            "generation": table.generation if table is not None else None,
+            "systems": table.count if table is not None else None,
+            "bytes": table.nbytes if table is not None else None,
+            "in_use": self._current_table() is not None,
+        }
+
+    @property
+    def snapshot_stats(self) -> Dict[str, Any]:
         """
-        Add multiple systems in one database commit.
-        :param systems: list of tuple as described in add_system
+        State of the coordinate snapshot.
+        :return: generation, number of systems and if spatial queries use it, as dictionary
         """
-        self._logger.debug("Adding %i system rows...", len(systems))
-        self.__conn.executemany(self.__update_station_sql_str, systems)
-        self.__conn.commit()
+        snapshot = self._snapshot
+        return {
+            "generation": snapshot.generation if snapshot is not None else None,
+            "systems": snapshot.count if snapshot is not None else None,
+            "in_use": self._current_snapshot() is not None,
+        }
+
+    async def _get_cached_system(self, key: Tuple[str, Any], select: Callable[..., System], *args) -> System:
+        """
+        Looks up a system in the cache, selecting and caching it on a miss. Unknown systems are cached as well.
+        :param key: cache key
+        :param select: function selecting the system, see _read
+        :param args: further arguments of select
+        :return: System instance
+        """
+        generation = self.__generation
+        if generation is None:
+            # database not set up yet
+            return await self._read(select, *args)
+        system = self._system_cache.get(key, generation)
+        if system is None:
+            system = await self._read(select, *args)
+            self._system_cache.put(key, system, generation)
+            if system.population >= 0:
+                # found in the database, serve the other kind of lookup as well
+                self._system_cache.put(("id", system.sid), system, generation)
+                self._system_cache.put(("name", system.name), system, generation)
+        return system
 
     async def get_system_by_id(self, sid: int) -> System:
         """
@@ -251,21 +972,17 @@ class Database:
         :return: System instance, if found
         """
         self._logger.debug(f"Entering <{self.get_system_by_id.__name__}>")
-        select_sql_str = (
-            "SELECT id, edsm_id, name, x, y, z, population, is_populated, government_id, government, "
-            "allegiance_id, allegiance, security_id, security, primary_economy_id, primary_economy, "
-            "power, power_state, power_state_id, needs_permit, updated_at, controlling_minor_faction_id, "
-            "controlling_minor_faction, reserve_type_id, reserve_type "
-            "FROM SYSTEMS WHERE id = ?"
-        )
-        query = self.__conn.execute(select_sql_str, [sid])
-        result = query.fetchone()
+        return await self._get_cached_system(("id", sid), self._select_system_by_id, sid)
+
+    def _select_system_by_id(self, conn: sql.Connection, sid: int) -> System:
+        cursor = conn.cursor()
+        cursor.row_factory = system_row_factory
+        result = cursor.execute(SQL_SELECT_SYSTEM_BY.format(column="id"), [sid]).fetchone()
         if result is None:
             self._logger.debug("No system retrieved from db, returning n/a")
             return System(sid=sid)
-        system = System(*result)
-        self._logger.debug(f"Retrieved system from db: <{system.name}>")
-        return system
+        self._logger.debug(f"Retrieved system from db: <{result.name}>")
+        return result
 
     async def get_system_by_name(self, name: str) -> System:
         """
@@ -274,21 +991,325 @@ class Database:
         :return: System instance, if found
         """
         self._logger.debug(f"Entering <{self.get_system_by_name.__name__}>")
-        select_sql_str = (
-            "SELECT id, edsm_id, name, x, y, z, population, is_populated, government_id, government, "
-            "allegiance_id, allegiance, security_id, security, primary_economy_id, primary_economy, "
-            "power, power_state, power_state_id, needs_permit, updated_at, controlling_minor_faction_id, "
-            "controlling_minor_faction, reserve_type_id, reserve_type "
-            "FROM SYSTEMS WHERE name = ?"
-        )
-        query = self.__conn.execute(select_sql_str, [name])
-        result = query.fetchone()
+        return await self._get_cached_system(("name", name), self._select_system_by_name, name)
+
+    def _select_system_by_name(self, conn: sql.Connection, name: str) -> System:
+        cursor = conn.cursor()
+        cursor.row_factory = system_row_factory
+        result = cursor.execute(SQL_SELECT_SYSTEM_BY.format(column="name"), [name]).fetchone()
         if result is None:
             self._logger.debug(f"No system retrieved from db, returning unpopulated system: <{name}>")
-            return System(name=name, is_populated=False)
-        system = System(*result)
-        self._logger.debug(f"Retrieved system from db: <{system.name}>")
-        return system
+            return System(name=name, is_populated=0)
+        self._logger.debug(f"Retrieved system from db: <{result.name}>")
+        return result
+
+    async def get_systems_within_radius(
+            self,
+            x: float,
+            y: float,
+            z: float,
+            radius: float,
+            power: Optional[str] = None,
+            power_state: Optional[str] = None,
+            exclude_sid: Optional[int] = None,
+            limit: int = -1,
+    ) -> List[Tuple[System, float]]:
+        """
+        Gets systems within a radius around a point in 3D space, using the spatial index.
+        :param x: x-coordinate of the center
+        :param y: y-coordinate of the center
+        :param z: z-coordinate of the center
+        :param radius: search radius in ly
+        :param power: only return systems of this powerplay faction, if set
+        :param power_state: only return systems in this power state, if set
+        :param exclude_sid: EDDB ID of a system to leave out, usually the reference system
+        :param limit: maximum number of systems to return, negative for no limit
+        :return: list of System instances and their distance to the center, closest first
+        """
+        return await self._read(
+            self._select_systems_within_radius, x, y, z, radius, power, power_state, exclude_sid, limit
+        )
+
+    def _select_systems_within_radius(
+            self,
+            conn: sql.Connection,
+            x: float,
+            y: float,
+            z: float,
+            radius: float,
+            power: Optional[str],
+            power_state: Optional[str],
+            exclude_sid: Optional[int],
+            limit: int,
+    ) -> List[Tuple[System, float]]:
+        snapshot = self._current_snapshot()
+        if snapshot is not None:
+            return self._select_from_snapshot(
+                conn, snapshot, x, y, z, radius, limit, power, power_state, exclude_sid
+            )
+        cursor = conn.cursor()
+        cursor.row_factory = system_distance_row_factory
+        query = cursor.execute(
+            self.__get_systems_within_radius_sql_str,
+            {
+                "x": x,
+                "y": y,
+                "z": z,
+                "radius": radius,
+                "power": power,
+                "power_state": power_state,
+                "exclude_sid": exclude_sid,
+                "limit": limit,
+            },
+        )
+        return query.fetchall()
+
+    async def search_systems(
+            self,
+            x: float,
+            y: float,
+            z: float,
+            radius: float,
+            filters: SystemFilter = SystemFilter(),
+            page_size: int = SEARCH_PAGE_SIZE,
+            after: Optional[SearchCursor] = None,
+            exclude_sid: Optional[int] = None,
+    ) -> SearchPage:
+        """
+        Gets a page of the systems within a radius around a point which match the filters, closest first.
+        Pages continue after the last row of the previous one instead of skipping rows, and none are held in between.
+        Each page searches a shell around the previous ones, widened until the page is full, so the spatial index
+        only returns the systems up to a little beyond the page instead of all within the radius. While the in-memory
+        system table is current, it finds the page instead, the cursors of both are interchangeable.
+        :param x: x-coordinate of the center
+        :param y: y-coordinate of the center
+        :param z: z-coordinate of the center
+        :param radius: search radius in ly
+        :param filters: attributes the systems must have
+        :param page_size: maximum number of systems per page
+        :param after: next_cursor of the previous page, None for the first page
+        :param exclude_sid: EDDB ID of a system to leave out
+        :return: page of systems and their distance, with the cursor of the next page
+        """
+        return await self._read(self._search_systems, x, y, z, radius, filters, page_size, after, exclude_sid)
+
+    def _search_systems(
+            self,
+            conn: sql.Connection,
+            x: float,
+            y: float,
+            z: float,
+            radius: float,
+            filters: SystemFilter,
+            page_size: int,
+            after: Optional[SearchCursor],
+            exclude_sid: Optional[int],
+    ) -> SearchPage:
+        after = after or SearchCursor(-1.0, 0, radius / SEARCH_SHELLS)
+        table = self._current_table()
+        if table is not None:
+            found = table.search(
+                x, y, z, radius, filters, page_size, after.distance_sq, after.sid, exclude_sid
+            )
+            next_cursor = SearchCursor(found[-1][1], found[-1][0], after.step) if len(found) == page_size else None
+            return SearchPage(self._select_with_distances(conn, found), next_cursor)
+        inner = sqrt(max(after.distance_sq, 0.0))
+        step = after.step or radius / SEARCH_SHELLS
+        while True:
+            shell = min(radius, inner + step)
+            rows = conn.execute(
+                self.__search_systems_sql_str,
+                {
+                    "x": x,
+                    "y": y,
+                    "z": z,
+                    "radius": shell,
+                    **filters._asdict(),
+                    "exclude_sid": exclude_sid,
+                    "after_distance_sq": after.distance_sq,
+                    "after_sid": after.sid,
+                    "limit": page_size,
+                },
+            ).fetchall()
+            # systems outside the shell are farther than all found, so a full page is complete
+            if len(rows) == page_size or shell >= radius:
+                break
+            step *= 2
+        # the cursor keeps the exact squared distance, the square of the rounded distance could skip rows
+        next_cursor = SearchCursor(rows[-1][-1], rows[-1][0], step) if len(rows) == page_size else None
+        return SearchPage([system_distance_row_factory(None, row) for row in rows], next_cursor)
+
+    async def iter_search_systems(
+            self,
+            x: float,
+            y: float,
+            z: float,
+            radius: float,
+            filters: SystemFilter = SystemFilter(),
+            page_size: int = SEARCH_PAGE_SIZE,
+            exclude_sid: Optional[int] = None,
+    ) -> AsyncIterator[SearchPage]:
+        """
+        Iterates over all pages of a system search, see search_systems. Each page is queried once the previous
+        one was consumed. Pages of different generations of the data may be mixed if a refresh finishes meanwhile.
+        """
+        after = None
+        while True:
+            page = await self.search_systems(x, y, z, radius, filters, page_size, after, exclude_sid)
+            yield page
+            if page.next_cursor is None:
+                return
+            after = page.next_cursor
+
+    async def count_systems(
+            self,
+            x: float,
+            y: float,
+            z: float,
+            radius: float,
+            group_by: str,
+            filters: SystemFilter = SystemFilter(),
+            exclude_sid: Optional[int] = None,
+    ) -> List[Tuple[str, int]]:
+        """
+        Counts the systems within a radius around a point which match the filters per value of an attribute,
+        e.g. the Control systems per power.
+        :param x: x-coordinate of the center
+        :param y: y-coordinate of the center
+        :param z: z-coordinate of the center
+        :param radius: search radius in ly
+        :param group_by: attribute to count per, a key of ATTRIBUTE_COLUMNS
+        :param filters: attributes the systems must have
+        :param exclude_sid: EDDB ID of a system to leave out
+        :return: names and numbers of systems, most systems first, systems without a value are left out
+        :raises ValueError: if the attribute is unknown
+        """
+        if group_by not in ATTRIBUTE_COLUMNS:
+            raise ValueError(f"Systems can't be counted per <{group_by}>")
+        return await self._read(self._count_systems, x, y, z, radius, group_by, filters, exclude_sid)
+
+    def _count_systems(
+            self,
+            conn: sql.Connection,
+            x: float,
+            y: float,
+            z: float,
+            radius: float,
+            group_by: str,
+            filters: SystemFilter,
+            exclude_sid: Optional[int],
+    ) -> List[Tuple[str, int]]:
+        table = self._current_table()
+        if table is not None:
+            return table.count_by(x, y, z, radius, group_by, filters, exclude_sid)
+        query = conn.execute(
+            self.__count_systems_by_sql_strs[group_by],
+            {"x": x, "y": y, "z": z, "radius": radius, **filters._asdict(), "exclude_sid": exclude_sid},
+        )
+        return query.fetchall()
+
+    async def get_top_systems(
+            self,
+            x: float,
+            y: float,
+            z: float,
+            radius: float,
+            limit: int,
+            filters: SystemFilter = SystemFilter(),
+            exclude_sid: Optional[int] = None,
+    ) -> List[Tuple[System, float]]:
+        """
+        Gets the most populated systems within a radius around a point which match the filters.
+        :param x: x-coordinate of the center
+        :param y: y-coordinate of the center
+        :param z: z-coordinate of the center
+        :param radius: search radius in ly
+        :param limit: maximum number of systems
+        :param filters: attributes the systems must have
+        :param exclude_sid: EDDB ID of a system to leave out
+        :return: System instances and their distance to the center, most populated first
+        """
+        return await self._read(self._select_top_systems, x, y, z, radius, limit, filters, exclude_sid)
+
+    def _select_top_systems(
+            self,
+            conn: sql.Connection,
+            x: float,
+            y: float,
+            z: float,
+            radius: float,
+            limit: int,
+            filters: SystemFilter,
+            exclude_sid: Optional[int],
+    ) -> List[Tuple[System, float]]:
+        table = self._current_table()
+        if table is not None:
+            return self._select_with_distances(conn, table.top(x, y, z, radius, filters, limit, exclude_sid))
+        cursor = conn.cursor()
+        cursor.row_factory = system_distance_row_factory
+        query = cursor.execute(
+            self.__get_top_systems_sql_str,
+            {
+                "x": x,
+                "y": y,
+                "z": z,
+                "radius": radius,
+                **filters._asdict(),
+                "exclude_sid": exclude_sid,
+                "limit": limit,
+            },
+        )
+        return query.fetchall()
+
+    async def get_nearest_systems(
+            self,
+            x: float,
+            y: float,
+            z: float,
+            k: int = 1,
+            power: Optional[str] = None,
+            power_state: Optional[str] = None,
+            exclude_sid: Optional[int] = None,
+    ) -> List[Tuple[System, float]]:
+        """
+        Gets the k systems closest to a point in 3D space by searching the spatial index in growing radii.
+        :param x: x-coordinate of the reference point
+        :param y: y-coordinate of the reference point
+        :param z: z-coordinate of the reference point
+        :param k: number of systems to return
+        :param power: only return systems of this powerplay faction, if set
+        :param power_state: only return systems in this power state, if set
+        :param exclude_sid: EDDB ID of a system to leave out, usually the reference system
+        :return: list of up to k System instances and their distance to the reference point, closest first
+        """
+        return await self._read(self._select_nearest_systems, x, y, z, k, power, power_state, exclude_sid)
+
+    def _select_nearest_systems(
+            self,
+            conn: sql.Connection,
+            x: float,
+            y: float,
+            z: float,
+            k: int,
+            power: Optional[str],
+            power_state: Optional[str],
+            exclude_sid: Optional[int],
+    ) -> List[Tuple[System, float]]:
+        snapshot = self._current_snapshot()
+        if snapshot is not None:
+            # all distances are computed at once, no need to grow a radius
+            return self._select_from_snapshot(
+                conn, snapshot, x, y, z, NEAREST_MAX_RADIUS, k, power, power_state, exclude_sid
+            )
+        radius = NEAREST_INITIAL_RADIUS
+        while True:
+            # everything closer than the radius is found, so the first k of them are the k nearest overall
+            result = self._select_systems_within_radius(
+                conn, x, y, z, radius, power, power_state, exclude_sid, k
+            )
+            if len(result) >= k or radius >= NEAREST_MAX_RADIUS:
+                return result
+            radius *= 2
 
     async def get_closest_allied_system(self, ref_sid: int, power: str) -> System:
         """
@@ -300,41 +1321,116 @@ class Database:
         if power is None or power == "":
             # TODO: replace with exception
             return System(name='Not pledged', sid=ref_sid)
-        calc_sql_str = (
-            "WITH distances AS ("
-            "   SELECT b.id as id,"
-            "          b.name,    "
-            "          sqrt(pow(b.x - a.x, 2) + pow(b.y - a.y, 2) + pow(b.z - a.z, 2)) as distance "
-            "   FROM (SELECT x, y, z"
-            "         FROM SYSTEMS"
-            "        WHERE id = ?) a"
-            "   JOIN (SELECT x, y, z, id, name"
-            "        FROM SYSTEMS"
-            "        WHERE id != ? AND power = ? AND power_state = 'Control') b"
-            ")"
-            "SELECT id, min(distance) FROM distances"
+        ref_system = await self.get_system_by_id(ref_sid)
+        return await self._read(self._select_closest_allied_system, ref_system, power)
+
+    def _select_closest_allied_system(self, conn: sql.Connection, ref_system: System, power: str) -> System:
+        ref_sid = ref_system.sid
+        result = self._select_nearest_systems(
+            conn, ref_system.x, ref_system.y, ref_system.z, 1, power, "Control", ref_sid
         )
-        query = self.__conn.execute(calc_sql_str, [ref_sid, ref_sid, power])
-        result = query.fetchone()
-        return await self.get_system_by_id(result[0])
+        if len(result) == 0:
+            self._logger.debug(f"No system controlled by <{power}> found, returning n/a")
+            return System()
+        return result[0][0]
+
+    async def get_generation(self) -> int:
+        """
+        Gets the generation of the system data, which is incremented whenever a refresh changed it.
+        """
+        return await self._read(self._select_generation)
+
+    def _select_generation(self, conn: sql.Connection) -> int:
+        query = conn.execute(self.__get_generation_sql_str)
+        return query.fetchone()[0]
+
+    async def get_system_positions(self) -> Tuple[int, List[Tuple[int, float, float, float]]]:
+        """
+        Gets the coordinates of all systems, e.g. to build a route graph from.
+        :return: generation of the data and tuples of EDDB ID, x, y and z, read from the same snapshot
+        """
+        return await self._read(self._select_system_positions)
+
+    def _select_system_positions(self, conn: sql.Connection) -> Tuple[int, List[Tuple[int, float, float, float]]]:
+        conn.execute("BEGIN")
+        try:
+            generation = conn.execute(self.__get_generation_sql_str).fetchone()[0]
+            return generation, conn.execute(self.__get_system_positions_sql_str).fetchall()
+        finally:
+            conn.execute("COMMIT")
+
+    async def get_system_count(self) -> int:
+        """
+        Gets the number of stored systems.
+        """
+        return await self._read(self._select_system_count)
+
+    @staticmethod
+    def _select_system_count(conn: sql.Connection) -> int:
+        return conn.execute("SELECT count(*) FROM SYSTEMS").fetchone()[0]
 
     async def get_last_refreshed_datetime(self) -> datetime.datetime:
         """
         Gets date of last system data update from db
         """
-        query = self.__conn.execute(self.__get_last_updated_date)
-        result = query.fetchone()[0]
+        result = await self._read(self._select_last_refreshed_datetime)
         self._logger.debug(f"Retrieved last_refreshed: {result}")
-        return result
+        if result is None:
+            return None
+        return datetime.datetime.fromisoformat(result)
+
+    def _select_last_refreshed_datetime(self, conn: sql.Connection) -> Optional[str]:
+        return conn.execute(self.__get_last_updated_date).fetchone()[0]
 
     async def set_last_refreshed_datetime(self, last_refreshed: datetime.datetime) -> None:
         """
         Writes date of last_system_date_update to db
         """
-        self.__conn.execute(self.__set_last_updated_date, [last_refreshed])
-        self.__conn.commit()
+        await self._write(self._update_last_refreshed_datetime, last_refreshed)
         self._logger.debug('Updated last_updated in db.')
 
-    def __del__(self):
-        self.__conn.close()
+    def _update_last_refreshed_datetime(self, conn: sql.Connection, last_refreshed: datetime.datetime) -> None:
+        with conn:
+            conn.execute(self.__set_last_updated_date, [last_refreshed.isoformat(" ")])
+
+    async def get_download_validators(self) -> DownloadValidators:
+        """
+        Gets the HTTP validators of the systems dump the stored data was taken from.
+        """
+        return await self._read(self._select_download_validators)
+
+    def _select_download_validators(self, conn: sql.Connection) -> DownloadValidators:
+        return DownloadValidators(*conn.execute(self.__get_download_validators_sql_str).fetchone())
+
+    async def set_download_validators(self, validators: DownloadValidators) -> None:
+        """
+        Writes the HTTP validators of the systems dump the stored data was taken from.
+        """
+        await self._write(self._update_download_validators, validators)
+
+    def _update_download_validators(self, conn: sql.Connection, validators: DownloadValidators) -> None:
+        with conn:
+            conn.execute(self.__set_download_validators_sql_str, validators)
+
+    def get_file_size(self) -> int:
+        """
+        Gets the size of the database on disk, including the write-ahead log. Blocking.
+        :return: bytes
+        """
+        return sum(
+            os.path.getsize(path) for path in (DB_FILEPATH, f"{DB_FILEPATH}-wal") if os.path.exists(path)
+        )
+
+    def close(self) -> None:
+        """
+        Stops the database threads, waiting for running statements, and closes all connections. Blocking.
+        """
+        self.__writer.shutdown(wait=True, cancel_futures=True)
+        self.__readers.shutdown(wait=True, cancel_futures=True)
+        self._snapshot = None
+        self._table = None
+        with self.__connections_lock:
+            for conn in self.__connections:
+                conn.close()
+            self.__connections.clear()
         self._logger.debug("Connection to database closed.")
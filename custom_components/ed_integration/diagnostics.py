@@ -0,0 +1,24 @@
+"""Diagnostics dump of ed_integration, offered for download by Home Assistant versions supporting it."""
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN, KEY_EDSM_API_KEY, KEY_INARA_API_KEY
+
+REDACTED = "**REDACTED**"
+REDACTED_KEYS = (KEY_EDSM_API_KEY, KEY_INARA_API_KEY)
+
+
+def _redact(data: dict) -> dict:
+    return {key: REDACTED if key in REDACTED_KEYS and value else value for key, value in data.items()}
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry) -> dict:
+    """Return the configuration and performance counters of a config entry, without API keys."""
+    coordinator = hass.data[DOMAIN][entry.entry_id]
+    await coordinator.api.async_update_db_file_size()
+    return {
+        "entry": {"data": _redact(dict(entry.data)), "options": _redact(dict(entry.options))},
+        "update_interval": coordinator.update_interval.total_seconds(),
+        "last_update_success": coordinator.last_update_success,
+        **coordinator.api.get_diagnostics(),
+    }
@@ -0,0 +1,208 @@
+"""Provides live system updates from the Elite Dangerous Data Network (EDDN)"""
+import asyncio
+import datetime
+import json
+import logging
+import re
+import sqlite3
+import time
+from typing import TYPE_CHECKING, Any, Dict, Optional
+import zlib
+
+from .db import Database
+
+if TYPE_CHECKING:
+    import zmq.asyncio
+
+_LOGGER = logging.getLogger(__name__)
+
+EDDN_RELAY = "tcp://eddn.edcd.io:9500"
+EDDN_JOURNAL_SCHEMA = "https://eddn.edcd.io/schemas/journal/1"
+SYSTEM_EVENTS = ("FSDJump", "Location", "CarrierJump")
+BATCH_SIZE = 200
+BATCH_INTERVAL = 5  # s, maximum time an update waits for its batch to be written
+RECONNECT_DELAY = 30  # s
+
+# journal symbols like $economy_HighTech; are turned into the names used by EDDB, these don't follow the pattern
+SYMBOL_NAMES = {
+    "Agri": "Agriculture",
+    "HighTech": "High Tech",
+}
+POWER_STATES = {
+    "Controlled": "Control",
+}
+
+
+def _symbol_name(symbol: Optional[str]) -> Optional[str]:
+    """
+    Gets the readable name of a journal symbol, e.g. Prison Colony for $government_PrisonColony;.
+    :param symbol: journal symbol
+    :return: readable name, None if no symbol is given
+    """
+    if not symbol:
+        return None
+    name = symbol.strip("$;").rsplit("_", 1)[-1]
+    if name in SYMBOL_NAMES:
+        return SYMBOL_NAMES[name]
+    name = re.sub(r"(?<=[a-z])(?=[A-Z])", " ", name)
+    return name[:1].upper() + name[1:]
+
+
+def _epoch(timestamp: str) -> int:
+    """
+    Converts a journal timestamp like 2020-10-01T12:00:00Z to seconds since epoch, as used by EDDB.
+    """
+    parsed = datetime.datetime.fromisoformat(timestamp.rstrip("Z"))
+    return int(parsed.replace(tzinfo=datetime.timezone.utc).timestamp())
+
+
+def parse_message(raw: bytes) -> Optional[Dict[str, Any]]:
+    """
+    Extracts a system update from a compressed EDDN message.
+    :param raw: zlib-compressed JSON message as published by the relay
+    :return: update as expected by Database.apply_system_updates, None if the message carries no system state
+    """
+    try:
+        envelope = json.loads(zlib.decompress(raw))
+    except (zlib.error, ValueError) as e:
+        _LOGGER.debug(f"Skipping malformed EDDN message: {e}")
+        return None
+    if envelope.get("$schemaRef") != EDDN_JOURNAL_SCHEMA:
+        return None
+    message = envelope.get("message", {})
+    if message.get("event") not in SYSTEM_EVENTS or "StarSystem" not in message:
+        return None
+    try:
+        updated_at = _epoch(message["timestamp"])
+    except (KeyError, ValueError):
+        return None
+    powers = message.get("Powers") or []
+    faction = message.get("SystemFaction")
+    if isinstance(faction, dict):
+        faction = faction.get("Name")
+    power_state = message.get("PowerplayState")
+    return {
+        "name": message["StarSystem"],
+        "updated_at": updated_at,
+        "population": message.get("Population"),
+        "government": _symbol_name(message.get("SystemGovernment")),
+        "allegiance": message.get("SystemAllegiance") or None,
+        "security": _symbol_name(message.get("SystemSecurity")),
+        "primary_economy": _symbol_name(message.get("SystemEconomy")),
+        # contested systems report all involved powers, EDDB lists none for them
+        "power": powers[0] if len(powers) == 1 else None,
+        "power_state": POWER_STATES.get(power_state, power_state),
+        # systems outside of all spheres report no powers at all
+        "powerless": not powers,
+        "controlling_minor_faction": faction or None,
+    }
+
+
+class EDDNSubscriber:
+    """
+    Subscribes to an EDDN relay and writes the system state reported by other CMDRs' jumps to the database.
+    Updates are collected and written in batches, a later update of a system replaces a pending one.
+    """
+
+    def __init__(
+            self,
+            db: Database,
+            relay: str = EDDN_RELAY,
+            batch_size: int = BATCH_SIZE,
+            batch_interval: float = BATCH_INTERVAL,
+    ):
+        """
+        :param db: database to write to
+        :param relay: ZeroMQ address of the relay
+        :param batch_size: number of pending systems which triggers a write
+        :param batch_interval: maximum seconds between receiving an update and writing it
+        """
+        self._db = db
+        self.relay = relay
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.received = 0
+        self.applied = 0
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> bool:
+        """
+        Starts receiving in a background task. pyzmq is only imported here, so it is not needed without live updates.
+        :return: True if receiving, False if pyzmq is not installed
+        """
+        if self._task is None:
+            try:
+                import zmq.asyncio  # noqa: F401
+            except ImportError as e:
+                _LOGGER.error(f"EDDN live updates are disabled, pyzmq could not be imported: {e}")
+                return False
+            self._task = asyncio.ensure_future(self._run())
+        return True
+
+    async def stop(self) -> None:
+        """
+        Stops receiving and writes pending updates.
+        """
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await self._flush()
+
+    async def _run(self) -> None:
+        import zmq
+        import zmq.asyncio
+
+        context = zmq.asyncio.Context.instance()
+        while True:
+            socket = context.socket(zmq.SUB)
+            socket.setsockopt(zmq.SUBSCRIBE, b"")
+            socket.setsockopt(zmq.LINGER, 0)
+            socket.connect(self.relay)
+            _LOGGER.debug(f"Subscribed to EDDN relay <{self.relay}>")
+            try:
+                await self._receive(socket)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                _LOGGER.warning(f"EDDN subscription failed, reconnecting in {RECONNECT_DELAY}s: {e}")
+            finally:
+                socket.close()
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    async def _receive(self, socket: "zmq.asyncio.Socket") -> None:
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if await socket.poll(None if timeout is None else timeout * 1000):
+                update = parse_message(await socket.recv())
+                if update is not None:
+                    self.received += 1
+                    pending = self._pending.get(update["name"])
+                    if pending is None or pending["updated_at"] <= update["updated_at"]:
+                        self._pending[update["name"]] = update
+                    if deadline is None:
+                        deadline = time.monotonic() + self.batch_interval
+            if self._pending and (len(self._pending) >= self.batch_size or time.monotonic() >= deadline):
+                await self._flush()
+                deadline = None
+
+    async def _flush(self) -> None:
+        """
+        Writes all pending updates.
+        """
+        if not self._pending:
+            return
+        updates = list(self._pending.values())
+        self._pending.clear()
+        try:
+            self.applied += await self._db.apply_system_updates(updates)
+        except sqlite3.Error as e:
+            _LOGGER.warning(f"Dropping {len(updates)} EDDN system updates, writing them failed: {e}")
+            return
+        _LOGGER.debug(f"EDDN: {self.received} system updates received, {self.applied} applied")
@@ -0,0 +1,205 @@
+"""Vectorized queries over an in-memory copy of the systems table"""
+import math
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # queries stay in SQL
+    np = None
+
+if TYPE_CHECKING:
+    from .db import SystemFilter
+
+# system attributes stored as ids of a lookup table, in the order of the columns of get_system_table.sql
+ATTRIBUTES = ("economy", "security", "allegiance", "government", "power", "power_state")
+# id, x, y, z, population, needs_permit, then the ids of the attributes, NULL selected as -1
+TableRow = Tuple[float, ...]
+
+
+class SystemTable:
+    """
+    Columns of the SYSTEMS table as numpy arrays, sorted by id, so filters, distances and aggregates over all
+    systems are evaluated at once instead of row by row. Built once per generation of the data and patched in
+    place by live updates, which never add or move systems.
+    Filters match SQL: attribute names are compared case-insensitively and missing values match no filter.
+    """
+
+    def __init__(self, generation: int, rows: Sequence[TableRow], names: Dict[str, Dict[int, str]]):
+        """
+        :param generation: generation of the data the rows were read from
+        :param rows: rows as selected by get_system_table.sql
+        :param names: lookup table contents, id -> name per attribute
+        """
+        data = np.array(rows, dtype=np.float64).reshape(-1, 6 + len(ATTRIBUTES))
+        self.generation = generation
+        self.ids = data[:, 0].astype(np.int64)
+        self.x = data[:, 1].copy()
+        self.y = data[:, 2].copy()
+        self.z = data[:, 3].copy()
+        # NaN for unknown populations, which no population filter matches
+        self.population = np.where(data[:, 4] < 0, np.nan, data[:, 4])
+        self.needs_permit = data[:, 5].astype(np.int8)
+        self.attributes = {
+            attribute: data[:, 6 + index].astype(np.int32) for index, attribute in enumerate(ATTRIBUTES)
+        }
+        self._set_names(names)
+
+    def _set_names(self, names: Dict[str, Dict[int, str]]) -> None:
+        self.names = names
+        self._ids_by_name: Dict[str, Dict[str, List[int]]] = {}
+        for attribute, id_names in names.items():
+            by_name = self._ids_by_name[attribute] = {}
+            for lookup_id, name in id_names.items():
+                by_name.setdefault(name.lower(), []).append(lookup_id)
+
+    @staticmethod
+    def available() -> bool:
+        """
+        :return: if numpy is installed, which the table needs
+        """
+        return np is not None
+
+    @property
+    def count(self) -> int:
+        return len(self.ids)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        :return: memory held by the columns
+        """
+        columns = [self.ids, self.x, self.y, self.z, self.population, self.needs_permit, *self.attributes.values()]
+        return sum(column.nbytes for column in columns)
+
+    def patch(self, rows: Iterable[TableRow], names: Dict[str, Dict[int, str]], generation: int) -> int:
+        """
+        Overwrites the values of known systems, e.g. after live updates.
+        :param rows: rows as selected by get_system_table.sql
+        :param names: lookup table contents, which may have grown
+        :param generation: generation of the data after the update
+        :return: number of systems patched, those missing from the table are skipped
+        """
+        data = np.array(list(rows), dtype=np.float64).reshape(-1, 6 + len(ATTRIBUTES))
+        sids = data[:, 0].astype(np.int64)
+        indices = np.minimum(np.searchsorted(self.ids, sids), max(self.count - 1, 0))
+        found = self.ids[indices] == sids if self.count else np.zeros(len(sids), bool)
+        indices, data = indices[found], data[found]
+        self.population[indices] = np.where(data[:, 4] < 0, np.nan, data[:, 4])
+        self.needs_permit[indices] = data[:, 5]
+        for index, attribute in enumerate(ATTRIBUTES):
+            self.attributes[attribute][indices] = data[:, 6 + index]
+        self._set_names(names)
+        self.generation = generation
+        return len(indices)
+
+    def _distance_sq(self, x: float, y: float, z: float) -> "np.ndarray":
+        # same operations in the same order as in SQL, so the results are equal to the last bit
+        return (self.x - x) * (self.x - x) + (self.y - y) * (self.y - y) + (self.z - z) * (self.z - z)
+
+    def _mask(
+            self,
+            distance_sq: "np.ndarray",
+            radius: float,
+            filters: "SystemFilter",
+            exclude_sid: Optional[int],
+    ) -> "np.ndarray":
+        """
+        :return: boolean mask of the systems within the radius matching the filters, see filter_systems.sql
+        """
+        mask = distance_sq <= radius * radius
+        for attribute in ATTRIBUTES:
+            name = getattr(filters, attribute)
+            if name is not None:
+                mask &= np.isin(self.attributes[attribute], self._ids_by_name[attribute].get(name.lower(), []))
+        if filters.min_population is not None:
+            mask &= self.population >= filters.min_population
+        if filters.max_population is not None:
+            mask &= self.population <= filters.max_population
+        if filters.needs_permit is not None:
+            mask &= self.needs_permit == int(filters.needs_permit)
+        if exclude_sid is not None:
+            mask &= self.ids != exclude_sid
+        return mask
+
+    def search(
+            self,
+            x: float,
+            y: float,
+            z: float,
+            radius: float,
+            filters: "SystemFilter",
+            limit: int,
+            after_distance_sq: float = -1.0,
+            after_sid: int = 0,
+            exclude_sid: Optional[int] = None,
+    ) -> List[Tuple[int, float]]:
+        """
+        Gets a page of the systems within a radius matching the filters, see search_systems.sql.
+        :param x: x-coordinate of the center
+        :param y: y-coordinate of the center
+        :param z: z-coordinate of the center
+        :param radius: search radius in ly
+        :param filters: attributes the systems must have
+        :param limit: maximum number of systems
+        :param after_distance_sq: squared distance of the last system of the previous page
+        :param after_sid: EDDB ID of the last system of the previous page
+        :param exclude_sid: EDDB ID of a system to leave out
+        :return: EDDB IDs and squared distances, ordered by distance and id
+        """
+        distance_sq = self._distance_sq(x, y, z)
+        mask = self._mask(distance_sq, radius, filters, exclude_sid)
+        mask &= (distance_sq > after_distance_sq) | ((distance_sq == after_distance_sq) & (self.ids > after_sid))
+        candidates = np.flatnonzero(mask)
+        if 0 < limit < len(candidates):
+            # keep all systems as close as the limit-th one, so ties are broken by id below
+            cutoff = np.partition(distance_sq[candidates], limit - 1)[limit - 1]
+            candidates = candidates[distance_sq[candidates] <= cutoff]
+        candidates = candidates[np.lexsort((self.ids[candidates], distance_sq[candidates]))][:limit]
+        return list(zip(self.ids[candidates].tolist(), distance_sq[candidates].tolist()))
+
+    def top(
+            self,
+            x: float,
+            y: float,
+            z: float,
+            radius: float,
+            filters: "SystemFilter",
+            limit: int,
+            exclude_sid: Optional[int] = None,
+    ) -> List[Tuple[int, float]]:
+        """
+        Gets the most populated systems within a radius matching the filters, see get_top_systems.sql.
+        :return: EDDB IDs and squared distances, most populated first, unknown populations last
+        """
+        distance_sq = self._distance_sq(x, y, z)
+        candidates = np.flatnonzero(self._mask(distance_sq, radius, filters, exclude_sid))
+        population = np.nan_to_num(self.population[candidates], nan=-math.inf)
+        order = np.lexsort((self.ids[candidates], -population))[:limit]
+        candidates = candidates[order]
+        return list(zip(self.ids[candidates].tolist(), distance_sq[candidates].tolist()))
+
+    def count_by(
+            self,
+            x: float,
+            y: float,
+            z: float,
+            radius: float,
+            group_by: str,
+            filters: "SystemFilter",
+            exclude_sid: Optional[int] = None,
+    ) -> List[Tuple[str, int]]:
+        """
+        Counts the systems within a radius matching the filters per value of an attribute,
+        see count_systems_by.sql.
+        :param group_by: attribute to group by, one of ATTRIBUTES
+        :return: names and numbers of systems, most systems first, systems without a value are left out
+        """
+        distance_sq = self._distance_sq(x, y, z)
+        values = self.attributes[group_by][self._mask(distance_sq, radius, filters, exclude_sid)]
+        counts: Dict[str, int] = {}
+        names = self.names[group_by]
+        for lookup_id, count in zip(*(column.tolist() for column in np.unique(values, return_counts=True))):
+            name = names.get(lookup_id)
+            if name is not None:
+                counts[name] = counts.get(name, 0) + count
+        return sorted(counts.items(), key=lambda item: (-item[1], item[0]))
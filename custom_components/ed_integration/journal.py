@@ -0,0 +1,156 @@
+"""Provides CMDR data read from the local Elite Dangerous journal files"""
+import datetime
+import json
+import logging
+import os
+import re
+import threading
+from typing import List, Optional, Tuple
+
+_LOGGER = logging.getLogger(__name__)
+
+# Journal.2022-11-23T123456.01.log since Odyssey update 14, Journal.221123123456.01.log before
+JOURNAL_FILENAME_PATTERN = re.compile(
+    r"^Journal\.(?:(?P<iso>\d{4}-\d{2}-\d{2}T\d{6})|(?P<legacy>\d{12}))\.(?P<part>\d{2})\.log$"
+)
+LOCATION_EVENTS = ("Location", "FSDJump", "CarrierJump")
+
+
+def journal_sort_key(filename: str) -> Optional[Tuple[datetime.datetime, int]]:
+    """
+    Gets the key journal files are ordered by, i.e. the time the game started writing them and their part number.
+    :param filename: journal file name
+    :return: sort key, None if the file is no journal file
+    """
+    match = JOURNAL_FILENAME_PATTERN.match(filename)
+    if match is None:
+        return None
+    if match.group("iso"):
+        started = datetime.datetime.strptime(match.group("iso"), "%Y-%m-%dT%H%M%S")
+    else:
+        started = datetime.datetime.strptime(match.group("legacy"), "%y%m%d%H%M%S")
+    return started, int(match.group("part"))
+
+
+class JournalState:
+    """
+    CMDR data as last seen in the journal.
+    """
+
+    def __init__(self):
+        self.cmdr_name: Optional[str] = None
+        self.system_name: Optional[str] = None
+        self.system_address: Optional[int] = None
+        self.star_pos: Optional[List[float]] = None
+        self.credits: Optional[int] = None
+        self.loan: Optional[int] = None
+        self.timestamp: Optional[str] = None
+
+    def apply(self, event: dict) -> bool:
+        """
+        Updates the state from a journal event.
+        :param event: decoded journal event
+        :return: if the event changed the state
+        """
+        name = event.get("event")
+        before = self.__dict__.copy()
+        if name == "LoadGame":
+            self.cmdr_name = event.get("Commander", self.cmdr_name)
+            self.credits = event.get("Credits", self.credits)
+            self.loan = event.get("Loan", self.loan)
+        elif name in LOCATION_EVENTS:
+            self.system_name = event.get("StarSystem", self.system_name)
+            self.system_address = event.get("SystemAddress", self.system_address)
+            self.star_pos = event.get("StarPos", self.star_pos)
+        else:
+            return False
+        self.timestamp = event.get("timestamp", self.timestamp)
+        before.pop("timestamp")
+        return any(getattr(self, key) != value for key, value in before.items())
+
+
+class JournalTailer:
+    """
+    Incrementally reads the newline-delimited JSON journal files the game writes into a directory.
+    Remembers the offset into the current file and moves on to the newer files once the game starts them.
+    Blocking, meant to be polled from an executor. Polls are serialized, so several threads may poll at once.
+    """
+
+    def __init__(self, directory: str):
+        """
+        :param directory: journal directory, usually Saved Games/Frontier Developments/Elite Dangerous
+        """
+        self.directory = directory
+        self.state = JournalState()
+        self._current: Optional[str] = None
+        self._offset = 0
+        # held while polling, so only one thread at a time reads and advances the offset
+        self._lock = threading.Lock()
+
+    def _journals(self) -> List[Tuple[Tuple[datetime.datetime, int], str]]:
+        """
+        :return: sort keys and names of the journal files in the directory, oldest first
+        """
+        try:
+            filenames = os.listdir(self.directory)
+        except OSError as e:
+            _LOGGER.warning(f"Cannot list journal directory <{self.directory}>: {e}")
+            return []
+        journals = [(journal_sort_key(f), f) for f in filenames]
+        return sorted(j for j in journals if j[0] is not None)
+
+    def _read_new_lines(self) -> bool:
+        """
+        Applies all complete lines appended to the current journal since the last read.
+        :return: if the state changed
+        """
+        path = os.path.join(self.directory, self._current)
+        try:
+            with open(path, "rb") as journal:
+                journal.seek(self._offset)
+                data = journal.read()
+        except OSError as e:
+            _LOGGER.warning(f"Cannot read journal <{path}>: {e}")
+            return False
+        # a line may still be written, it is picked up completely next time
+        end = data.rfind(b"\n") + 1
+        self._offset += end
+        changed = False
+        for line in data[:end].splitlines():
+            if not line.strip():
+                continue
+            try:
+                event = json.loads(line)
+            except ValueError:
+                _LOGGER.debug(f"Skipping malformed journal line in <{self._current}>: {line[:80]}")
+                continue
+            changed |= self.state.apply(event)
+        return changed
+
+    def poll(self) -> bool:
+        """
+        Reads everything written since the last poll, following rotation to newer journal files.
+        :return: if the state changed
+        """
+        with self._lock:
+            return self._poll()
+
+    def _poll(self) -> bool:
+        journals = self._journals()
+        if not journals:
+            return False
+        changed = False
+        if self._current is None:
+            # the newest file starts with LoadGame and Location, so older files are not needed
+            pending = [journals[-1][1]]
+        else:
+            # events written to the current file since the last poll, then all files the game started meanwhile
+            changed |= self._read_new_lines()
+            current_key = journal_sort_key(self._current)
+            pending = [filename for key, filename in journals if key > current_key]
+        for filename in pending:
+            _LOGGER.debug(f"Following journal <{filename}>")
+            self._current = filename
+            self._offset = 0
+            changed |= self._read_new_lines()
+        return changed
@@ -0,0 +1,132 @@
+"""Profiles single operations of the integration in place, with cProfile and tracemalloc"""
+import cProfile
+import datetime
+import io
+import pstats
+import threading
+import time
+import tracemalloc
+from typing import Any, Awaitable, Callable, Dict, List
+
+TRACEMALLOC_FRAMES = 10
+TOP_FUNCTIONS = 40  # functions listed in the report, by cumulative time
+SUMMARY_ENTRIES = 5  # functions and allocation sites listed in the summary
+
+
+class Profiler:
+    """
+    Collects cProfile stats of the event loop and of functions run on other threads, e.g. the database threads,
+    which cProfile does not follow on its own. Memory allocations are traced in all threads.
+    """
+
+    def __init__(self):
+        self._profiles: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+
+    def runcall(self, func: Callable[..., Any], *args) -> Any:
+        """
+        Runs a function on the current thread under a profile of its own.
+        :param func: function to run
+        :param args: arguments of func
+        :return: result of func
+        """
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # since Python 3.12 a single profile covers all threads and no second one can be enabled
+            return func(*args)
+        try:
+            return func(*args)
+        finally:
+            profile.disable()
+            with self._lock:
+                self._profiles.append(profile)
+
+    async def async_profile(self, operation: Awaitable) -> Dict[str, Any]:
+        """
+        Runs an operation under the profiler. Everything else the event loop runs meanwhile is profiled as well.
+        :param operation: awaitable to profile
+        :return: profile stats, allocation statistics, duration and peak traced memory
+        """
+        tracing = tracemalloc.is_tracing()
+        if not tracing:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        elif hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+        baseline = tracemalloc.take_snapshot()
+        profile = cProfile.Profile()
+        started = time.perf_counter()
+        profile.enable()
+        try:
+            await operation
+        finally:
+            profile.disable()
+            duration = time.perf_counter() - started
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            if not tracing:
+                tracemalloc.stop()
+        stats = pstats.Stats(profile)
+        with self._lock:
+            for thread_profile in self._profiles:
+                stats.add(thread_profile)
+        return {
+            "stats": stats,
+            "allocations": snapshot.compare_to(baseline, "lineno"),
+            "duration": duration,
+            "peak_memory": peak,
+        }
+
+
+def write_report(path: str, title: str, result: Dict[str, Any], top_allocations: int) -> Dict[str, Any]:
+    """
+    Writes a profile as text report next to the raw stats, which can be loaded with pstats or snakeviz. Blocking.
+    :param path: path of the report without extension
+    :param title: headline of the report
+    :param result: result of Profiler.async_profile
+    :param top_allocations: number of allocation sites listed
+    :return: summary with the slowest functions and largest allocation sites
+    """
+    stats: pstats.Stats = result["stats"]
+    stats.dump_stats(f"{path}.prof")
+    listing = io.StringIO()
+    stats.stream = listing
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(TOP_FUNCTIONS)
+    allocations = [diff for diff in result["allocations"] if diff.size_diff > 0][:top_allocations]
+    with open(f"{path}.txt", "w") as report:
+        report.write(f"{title}\n")
+        report.write(f"Duration: {result['duration']:.3f} s\n")
+        report.write(f"Peak traced memory: {result['peak_memory'] / 1e6:.1f} MB\n\n")
+        report.write(f"Top {len(allocations)} allocation sites by growth:\n")
+        for diff in allocations:
+            report.write(f"{diff}\n")
+        report.write(f"\n{listing.getvalue()}")
+
+    # (file, line, function) -> (primitive calls, calls, own time, cumulative time, callers)
+    slowest = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:SUMMARY_ENTRIES]
+    return {
+        "title": title,
+        "created_at": datetime.datetime.now().isoformat(),
+        "duration": round(result["duration"], 3),
+        "peak_memory": result["peak_memory"],
+        "slowest": [
+            {"function": pstats.func_std_string(func), "calls": timing[1], "cumulative": round(timing[3], 3)}
+            for func, timing in slowest
+        ],
+        "allocations": [
+            {"site": str(diff.traceback[0]), "size": diff.size_diff, "count": diff.count_diff}
+            for diff in allocations[:SUMMARY_ENTRIES]
+        ],
+        "report": f"{path}.txt",
+        "stats": f"{path}.prof",
+    }
+
+
+def profile_path(config_path: Callable[..., str], operation: str) -> str:
+    """
+    :param config_path: hass.config.path
+    :param operation: name of the profiled operation
+    :return: path in the config directory without extension, unique per second
+    """
+    return config_path(f"ed_integration_profile_{operation}_{datetime.datetime.now():%Y%m%d_%H%M%S}")
@@ -0,0 +1,164 @@
+"""Provides client-side rate limiting of remote API requests"""
+import asyncio
+import datetime
+from email.utils import parsedate_to_datetime
+import logging
+import time
+from typing import Any, Dict, Mapping, Optional
+
+_LOGGER = logging.getLogger(__name__)
+
+# EDSM reports its quota in these headers, the reset one in seconds until the quota is refilled
+HEADER_LIMIT = "X-Rate-Limit-Limit"
+HEADER_REMAINING = "X-Rate-Limit-Remaining"
+HEADER_RESET = "X-Rate-Limit-Reset"
+HEADER_RETRY_AFTER = "Retry-After"
+
+
+def parse_retry_after(value: Optional[str], now: Optional[datetime.datetime] = None) -> Optional[float]:
+    """
+    Parses a Retry-After header, which holds either seconds or an HTTP-date.
+    :param value: header value
+    :param now: current time, defaults to now
+    :return: seconds to wait, None if the header is missing or malformed
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at is None:
+        return None
+    if retry_at.tzinfo is None:
+        # HTTP-dates are always GMT
+        retry_at = retry_at.replace(tzinfo=datetime.timezone.utc)
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    return max(0.0, (retry_at - now).total_seconds())
+
+
+class RateLimitedError(Exception):
+    """
+    Raised instead of sending a request while an API is backing off.
+    """
+
+
+class RateLimiter:
+    """
+    Schedules requests to one API: a token bucket bounds the request rate, quota headers sent by the API shrink it
+    further, and errors make it back off exponentially until a request succeeds again.
+    """
+
+    def __init__(
+            self,
+            name: str,
+            rate: float,
+            burst: int,
+            backoff_base: float = 30,
+            backoff_max: float = 3600,
+    ):
+        """
+        :param name: name of the API, used for logging
+        :param rate: tokens refilled per second
+        :param burst: bucket capacity, i.e. requests allowed at once
+        :param backoff_base: seconds to back off after the first error, doubled with each further one
+        :param backoff_max: maximum seconds to back off
+        """
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._errors = 0
+        self._quota_limit: Optional[int] = None
+        self._quota_remaining: Optional[int] = None
+        self._quota_reset_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, max_wait: float = 10) -> None:
+        """
+        Waits for a token, i.e. until a request may be sent.
+        :param max_wait: maximum seconds to wait for a token
+        :raises RateLimitedError: if the API is backing off or no token is available in time
+        """
+        async with self._lock:
+            now = time.monotonic()
+            if now < self._blocked_until:
+                raise RateLimitedError(f"{self.name} is backing off for {self._blocked_until - now:.0f}s")
+            self._refill(now)
+            if self._tokens < 1:
+                wait = (1 - self._tokens) / self.rate
+                if wait > max_wait:
+                    raise RateLimitedError(f"{self.name} request rate exceeded, next token in {wait:.0f}s")
+                await asyncio.sleep(wait)
+                self._refill(time.monotonic())
+            self._tokens -= 1
+
+    def update_from_headers(self, headers: Mapping[str, str]) -> None:
+        """
+        Adopts the remaining quota reported by the API.
+        :param headers: response headers
+        """
+        try:
+            if HEADER_LIMIT in headers:
+                self._quota_limit = int(headers[HEADER_LIMIT])
+            if HEADER_REMAINING in headers:
+                self._quota_remaining = int(headers[HEADER_REMAINING])
+            if HEADER_RESET in headers:
+                self._quota_reset_at = time.monotonic() + float(headers[HEADER_RESET])
+        except ValueError:
+            _LOGGER.debug(f"Ignoring malformed rate limit headers of {self.name}: {dict(headers)}")
+            return
+        if self._quota_remaining is not None and self._quota_remaining <= 0 and self._quota_reset_at:
+            # quota used up, wait for the refill announced by the API
+            self._blocked_until = max(self._blocked_until, self._quota_reset_at)
+            self._tokens = 0
+        elif self._quota_remaining is not None:
+            self._tokens = min(self._tokens, self._quota_remaining)
+
+    def record_success(self) -> None:
+        """
+        Ends any backoff after a successful request.
+        """
+        self._errors = 0
+
+    def record_error(self, retry_after: Optional[float] = None) -> None:
+        """
+        Backs off exponentially after a failed or throttled request.
+        :param retry_after: seconds the API asked to wait, if any
+        """
+        self._errors += 1
+        backoff = min(self.backoff_max, self.backoff_base * 2 ** (self._errors - 1))
+        if retry_after is not None:
+            backoff = max(backoff, retry_after)
+        self._blocked_until = max(self._blocked_until, time.monotonic() + backoff)
+        _LOGGER.warning(f"{self.name} request failed ({self._errors} in a row), backing off for {backoff:.0f}s")
+
+    @property
+    def state(self) -> Dict[str, Any]:
+        """
+        Current state of the limiter, for diagnostics.
+        :return: state as dictionary
+        """
+        now = time.monotonic()
+        self._refill(now)
+        return {
+            "tokens": round(self._tokens, 2),
+            "rate": self.rate,
+            "burst": self.burst,
+            "consecutive_errors": self._errors,
+            "backoff_remaining": round(max(0.0, self._blocked_until - now), 1),
+            "quota_limit": self._quota_limit,
+            "quota_remaining": self._quota_remaining,
+            "quota_reset_in": round(max(0.0, self._quota_reset_at - now), 1) if self._quota_reset_at else None,
+        }
@@ -0,0 +1,250 @@
+"""Plans multi-jump routes between the systems of the local database"""
+import asyncio
+from collections import deque
+import heapq
+from math import ceil, floor, sqrt
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from .db import Database, System
+
+MAX_EXPANSIONS = 200000  # systems expanded before giving up on a route
+# fewest jumps take seconds where routes need detours, routes found this way rarely have one more jump
+HEURISTIC_WEIGHT = 1.5
+BACKWARD_SEARCH_MIN = 1000  # systems the search from the destination visits before it may be dropped
+
+Position = Tuple[float, float, float]
+Cell = Tuple[int, int, int]
+
+
+class Route(NamedTuple):
+    """
+    Jump sequence from the source to the destination, both included.
+    """
+
+    systems: List[System]
+    jump_distances: List[float]  # ly, of the jump into each system but the source
+    jump_range: float
+
+    @property
+    def jumps(self) -> int:
+        return len(self.jump_distances)
+
+    @property
+    def distance(self) -> float:
+        return sum(self.jump_distances)
+
+    def as_dict(self) -> dict:
+        """
+        :return: route as dictionary of plain values
+        """
+        return {
+            "source": self.systems[0].name,
+            "destination": self.systems[-1].name,
+            "jump_range": self.jump_range,
+            "jumps": self.jumps,
+            "distance": round(self.distance, 2),
+            "route": [
+                {"system": system.name, "distance": round(distance, 2)}
+                for system, distance in zip(self.systems, [0.0] + self.jump_distances)
+            ],
+        }
+
+
+class RouteGraph:
+    """
+    Systems sorted into a uniform grid with cells as large as the jump range, so every system within range of
+    another one is in the same or one of the 26 adjacent cells. Edges are not stored but found while searching.
+    """
+
+    def __init__(self, positions: Dict[int, Position], jump_range: float):
+        """
+        :param positions: coordinates per EDDB ID
+        :param jump_range: maximum distance of a single jump in ly
+        """
+        self.positions = positions
+        self.jump_range = jump_range
+        self._cells: Dict[Cell, List[Tuple[int, float, float, float]]] = {}
+        for sid, position in positions.items():
+            self._cells.setdefault(self._cell(position), []).append((sid, *position))
+
+    def _cell(self, position: Position) -> Cell:
+        return (
+            floor(position[0] / self.jump_range),
+            floor(position[1] / self.jump_range),
+            floor(position[2] / self.jump_range),
+        )
+
+    def neighbours(self, sid: int) -> Iterator[Tuple[int, float]]:
+        """
+        :param sid: EDDB ID of a system
+        :return: EDDB IDs and distances of the systems within jump range of it
+        """
+        x, y, z = position = self.positions[sid]
+        cx, cy, cz = self._cell(position)
+        max_squared = self.jump_range * self.jump_range
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for dz in (-1, 0, 1):
+                    for other, ox, oy, oz in self._cells.get((cx + dx, cy + dy, cz + dz), ()):
+                        squared = (ox - x) ** 2 + (oy - y) ** 2 + (oz - z) ** 2
+                        if squared <= max_squared and other != sid:
+                            yield other, sqrt(squared)
+
+    def distance(self, a: int, b: int) -> float:
+        """
+        :return: straight distance between two systems in ly
+        """
+        (ax, ay, az), (bx, by, bz) = self.positions[a], self.positions[b]
+        return sqrt((ax - bx) ** 2 + (ay - by) ** 2 + (az - bz) ** 2)
+
+    def _reachable_ids(self, sid: int) -> Iterator[int]:
+        """
+        Like neighbours, but only the EDDB IDs and including the system itself, the hot loop of the search.
+        """
+        x, y, z = position = self.positions[sid]
+        cx, cy, cz = self._cell(position)
+        max_squared = self.jump_range * self.jump_range
+        cells = self._cells
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for dz in (-1, 0, 1):
+                    cell = cells.get((cx + dx, cy + dy, cz + dz))
+                    if cell is None:
+                        continue
+                    for other, ox, oy, oz in cell:
+                        ox -= x
+                        oy -= y
+                        oz -= z
+                        if ox * ox + oy * oy + oz * oz <= max_squared:
+                            yield other
+
+    @staticmethod
+    def _trace(previous: Dict[int, int], destination: int) -> List[int]:
+        route = [destination]
+        while route[-1] in previous:
+            route.append(previous[route[-1]])
+        return route[::-1]
+
+    def plan(
+            self,
+            source: int,
+            destination: int,
+            weight: float = HEURISTIC_WEIGHT,
+            max_expansions: int = MAX_EXPANSIONS,
+    ) -> Optional[List[int]]:
+        """
+        Finds a route with few jumps by weighted A*. A jump covers at most the jump range, so the remaining distance
+        divided by it and rounded up never overestimates the jumps left. Weighting this estimate makes the search
+        head for the destination instead of proving that no shorter route exists, the route found has at most
+        weight times the fewest possible jumps. Among systems promising equally short routes, the one closest to
+        the destination is expanded first.
+        A breadth-first search from the destination runs alongside, so a destination cut off from most systems is
+        found unreachable without exploring everything reachable from the source. Blocking.
+        :param source: EDDB ID of the first system
+        :param destination: EDDB ID of the last system
+        :param weight: factor of the remaining jumps estimate, 1 for a route with the fewest jumps
+        :param max_expansions: number of systems expanded before giving up
+        :return: EDDB IDs of the route including source and destination, None if there is none within range
+        """
+        jump_range = self.jump_range
+        dx, dy, dz = self.positions[destination]
+        positions = self.positions
+        jumps = {source: 0}
+        previous: Dict[int, int] = {}
+        remaining = self.distance(source, destination)
+        frontier = [(weight * ceil(remaining / jump_range), remaining, 0, source)]
+        closed = set()
+        # systems the destination can be reached from, dropped once clearly more than the A* visited
+        backward: Optional[set] = {destination}
+        backward_frontier = deque([destination])
+        while frontier and len(closed) < max_expansions:
+            if backward is not None:
+                if not backward_frontier:
+                    return None
+                for other in self._reachable_ids(backward_frontier.popleft()):
+                    if other not in backward:
+                        backward.add(other)
+                        backward_frontier.append(other)
+                if len(backward) > 2 * len(closed) + BACKWARD_SEARCH_MIN:
+                    backward = None
+            _, _, current_jumps, current = heapq.heappop(frontier)
+            if current == destination:
+                return self._trace(previous, destination)
+            if current in closed:
+                continue
+            closed.add(current)
+            next_jumps = current_jumps + 1
+            for neighbour in self._reachable_ids(current):
+                if neighbour in closed:
+                    continue
+                known = jumps.get(neighbour)
+                if known is not None and known <= next_jumps:
+                    continue
+                jumps[neighbour] = next_jumps
+                previous[neighbour] = current
+                if neighbour == destination:
+                    # every system expanded later promises at least as many jumps
+                    return self._trace(previous, destination)
+                nx, ny, nz = positions[neighbour]
+                remaining = sqrt((nx - dx) ** 2 + (ny - dy) ** 2 + (nz - dz) ** 2)
+                estimate = next_jumps + weight * ceil(remaining / jump_range)
+                heapq.heappush(frontier, (estimate, remaining, next_jumps, neighbour))
+        return None
+
+
+class RoutePlanner:
+    """
+    Plans routes on the systems of a database. The coordinates are loaded once per generation of the data,
+    the grid is kept for the last jump range.
+    """
+
+    def __init__(self, db: Database):
+        """
+        :param db: database to plan on
+        """
+        self._db = db
+        self._generation: Optional[int] = None
+        self._positions: Dict[int, Position] = {}
+        self._graph: Optional[RouteGraph] = None
+        self._lock = asyncio.Lock()
+
+    async def _async_get_graph(self, jump_range: float) -> RouteGraph:
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            generation = await self._db.get_generation()
+            if generation != self._generation:
+                generation, rows = await self._db.get_system_positions()
+                self._positions = {sid: (x, y, z) for sid, x, y, z in rows}
+                self._generation = generation
+                self._graph = None
+            if self._graph is None or self._graph.jump_range != jump_range:
+                self._graph = await loop.run_in_executor(None, RouteGraph, self._positions, jump_range)
+            return self._graph
+
+    async def async_plan(self, source_name: str, destination_name: str, jump_range: float) -> Optional[Route]:
+        """
+        Plans a near-shortest route between two systems, with at most HEURISTIC_WEIGHT times the fewest possible
+        jumps, see RouteGraph.plan.
+        :param source_name: name of the first system
+        :param destination_name: name of the last system
+        :param jump_range: maximum distance of a single jump in ly
+        :return: route, None if the destination can't be reached with the jump range
+        :raises ValueError: if a system is unknown or the jump range not positive
+        """
+        if jump_range <= 0:
+            raise ValueError(f"Jump range must be positive: {jump_range}")
+        source = await self._db.get_system_by_name(source_name)
+        destination = await self._db.get_system_by_name(destination_name)
+        for system in (source, destination):
+            if system.sid < 0:
+                raise ValueError(f"Unknown system: {system.name}")
+        graph = await self._async_get_graph(jump_range)
+        for system in (source, destination):
+            if system.sid not in graph.positions:
+                # added by a refresh finished after the positions were loaded
+                raise ValueError(f"System not yet known to the route planner: {system.name}")
+        sids = await asyncio.get_running_loop().run_in_executor(None, graph.plan, source.sid, destination.sid)
+        if sids is None:
+            return None
+        systems = [await self._db.get_system_by_id(sid) for sid in sids]
+        return Route(systems, [graph.distance(a, b) for a, b in zip(sids, sids[1:])], jump_range)
@@ -1,15 +1,50 @@
 """Sensor platform for ed_integration."""
 from custom_components.ed_integration.const import DOMAIN, ICON_LOCATION
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.helpers.entity import Entity
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
-from .const import KEY_CMDR_NAME, KEY_OUTPUT_LOCATION_STR, KEY_OUTPUT_BALANCE_STR, ICON_BALANCE
+from .client import API_EDSM, API_INARA, SIGNAL_ROUTE_PLANNED
+from .const import (
+    ICON_BALANCE,
+    ICON_DIAGNOSTICS,
+    ICON_POLL_INTERVAL,
+    ICON_POWER,
+    ICON_ROUTE,
+    ICON_SYSTEM_DATA,
+    KEY_CMDR_NAME,
+    KEY_OUTPUT_BALANCE_STR,
+    KEY_OUTPUT_LOCATION_STR,
+    KEY_OUTPUT_POWER_STR,
+)
+from .systems import SIGNAL_SYSTEM_DATA_PROGRESS
 
 
 async def async_setup_entry(hass, entry, async_add_entities):
     """Setup sensor platform."""
     coordinator = hass.data[DOMAIN][entry.entry_id]
     cmdr_name = entry.data.get(KEY_CMDR_NAME)
-    async_add_entities([EDLocationSensor(coordinator, cmdr_name), EDBalanceSensor(coordinator, cmdr_name)])
+    async_add_entities(
+        [
+            EDLocationSensor(coordinator, cmdr_name),
+            EDBalanceSensor(coordinator, cmdr_name),
+            EDPowerSensor(coordinator, cmdr_name),
+            EDPollIntervalSensor(coordinator, cmdr_name),
+            EDSystemDataRefreshSensor(coordinator, cmdr_name),
+            EDSystemDataDownloadedSensor(coordinator, cmdr_name),
+            EDSystemDataIngestedSensor(coordinator, cmdr_name),
+            EDSystemDataEtaSensor(coordinator, cmdr_name),
+            EDUpdateDurationSensor(coordinator, cmdr_name),
+            EDApiLatencySensor(coordinator, cmdr_name, API_EDSM, "EDSM"),
+            EDApiLatencySensor(coordinator, cmdr_name, API_INARA, "Inara"),
+            EDDatabaseLatencySensor(coordinator, cmdr_name),
+            EDDatabaseSizeSensor(coordinator, cmdr_name),
+            EDIngestDurationSensor(coordinator, cmdr_name),
+            EDIngestRateSensor(coordinator, cmdr_name),
+            EDCacheHitRateSensor(coordinator, cmdr_name),
+            EDRouteSensor(coordinator, cmdr_name),
+        ]
+    )
 
 
 class EDLocationSensor(CoordinatorEntity):
@@ -73,3 +108,417 @@ class EDBalanceSensor(CoordinatorEntity):
     def icon(self):
         """Return the icon of the sensor."""
         return ICON_BALANCE
+
+
+class EDPowerSensor(CoordinatorEntity):
+    """CMDR powerplay faction sensor class."""
+
+    def __init__(self, coordinator, cmdr_name):
+        super().__init__(coordinator)
+        self._cmdr_name = cmdr_name
+
+    @property
+    def unique_id(self):
+        """Return a unique ID to use for this entity."""
+        cmdr_name_id = self._cmdr_name.replace(" ", "_")
+        return f"{cmdr_name_id}_power"
+
+    @property
+    def name(self):
+        """Return the name of the sensor."""
+        return f"CMDR {self._cmdr_name} Power"
+
+    @property
+    def state(self):
+        """Return the state of the sensor."""
+        return self.coordinator.data.get(KEY_OUTPUT_POWER_STR)
+
+    @property
+    def icon(self):
+        """Return the icon of the sensor."""
+        return ICON_POWER
+
+
+class EDPollIntervalSensor(CoordinatorEntity):
+    """Current adaptive update interval sensor class."""
+
+    def __init__(self, coordinator, cmdr_name):
+        super().__init__(coordinator)
+        self._cmdr_name = cmdr_name
+
+    @property
+    def unique_id(self):
+        """Return a unique ID to use for this entity."""
+        cmdr_name_id = self._cmdr_name.replace(" ", "_")
+        return f"{cmdr_name_id}_poll_interval"
+
+    @property
+    def name(self):
+        """Return the name of the sensor."""
+        return f"CMDR {self._cmdr_name} Update Interval"
+
+    @property
+    def state(self):
+        """Return the state of the sensor."""
+        return int(self.coordinator.update_interval.total_seconds())
+
+    @property
+    def unit_of_measurement(self):
+        """Return the unit of measurement"""
+        return "s"
+
+    @property
+    def device_state_attributes(self):
+        """Return the state attributes."""
+        return {"max_interval": int(self.coordinator.max_update_interval.total_seconds())}
+
+    @property
+    def icon(self):
+        """Return the icon of the sensor."""
+        return ICON_POLL_INTERVAL
+
+
+class EDSystemDataSensor(Entity):
+    """Base class of the system data refresh progress sensors, pushed while a refresh runs."""
+
+    key = None
+    label = None
+
+    def __init__(self, coordinator, cmdr_name):
+        self._progress = coordinator.api.system_data_progress
+        self._cmdr_name = cmdr_name
+
+    async def async_added_to_hass(self):
+        """Subscribe to progress updates."""
+        self.async_on_remove(
+            async_dispatcher_connect(self.hass, SIGNAL_SYSTEM_DATA_PROGRESS, self.async_write_ha_state)
+        )
+
+    @property
+    def should_poll(self):
+        """No polling needed, progress is pushed."""
+        return False
+
+    @property
+    def unique_id(self):
+        """Return a unique ID to use for this entity."""
+        cmdr_name_id = self._cmdr_name.replace(" ", "_")
+        return f"{cmdr_name_id}_system_data_{self.key}"
+
+    @property
+    def name(self):
+        """Return the name of the sensor."""
+        return f"CMDR {self._cmdr_name} System Data {self.label}"
+
+    @property
+    def icon(self):
+        """Return the icon of the sensor."""
+        return ICON_SYSTEM_DATA
+
+
+class EDSystemDataRefreshSensor(EDSystemDataSensor):
+    """System data refresh state sensor class."""
+
+    key = "refresh"
+    label = "Refresh"
+
+    @property
+    def state(self):
+        """Return the state of the sensor."""
+        return self._progress.state
+
+    @property
+    def device_state_attributes(self):
+        """Return the state attributes."""
+        attributes = self._progress.as_dict()
+        attributes.pop("state")
+        return attributes
+
+
+class EDSystemDataDownloadedSensor(EDSystemDataSensor):
+    """System data bytes downloaded sensor class."""
+
+    key = "downloaded"
+    label = "Downloaded"
+
+    @property
+    def state(self):
+        """Return the state of the sensor."""
+        return round(self._progress.bytes_downloaded / 1e6, 1)
+
+    @property
+    def unit_of_measurement(self):
+        """Return the unit of measurement"""
+        return "MB"
+
+
+class EDSystemDataIngestedSensor(EDSystemDataSensor):
+    """System data rows ingested sensor class."""
+
+    key = "ingested"
+    label = "Ingested"
+
+    @property
+    def state(self):
+        """Return the state of the sensor."""
+        return self._progress.rows_ingested
+
+    @property
+    def unit_of_measurement(self):
+        """Return the unit of measurement"""
+        return "systems"
+
+
+class EDSystemDataEtaSensor(EDSystemDataSensor):
+    """System data refresh remaining time sensor class."""
+
+    key = "eta"
+    label = "Refresh ETA"
+
+    @property
+    def state(self):
+        """Return the state of the sensor."""
+        eta = self._progress.eta
+        return round(eta) if eta is not None else None
+
+    @property
+    def unit_of_measurement(self):
+        """Return the unit of measurement"""
+        return "s"
+
+
+def _span_value(stats, key):
+    """Get a value from span stats, None if the span was never recorded."""
+    return stats[key] if stats is not None else None
+
+
+class EDDiagnosticSensor(CoordinatorEntity):
+    """Base class of the performance diagnostic sensors, updated with every coordinator update."""
+
+    key = None
+    label = None
+
+    def __init__(self, coordinator, cmdr_name):
+        super().__init__(coordinator)
+        self._cmdr_name = cmdr_name
+
+    @property
+    def unique_id(self):
+        """Return a unique ID to use for this entity."""
+        cmdr_name_id = self._cmdr_name.replace(" ", "_")
+        return f"{cmdr_name_id}_diagnostics_{self.key}"
+
+    @property
+    def name(self):
+        """Return the name of the sensor."""
+        return f"CMDR {self._cmdr_name} {self.label}"
+
+    @property
+    def available(self):
+        """Diagnostics stay available while updates fail, they help finding out why."""
+        return True
+
+    @property
+    def icon(self):
+        """Return the icon of the sensor."""
+        return ICON_DIAGNOSTICS
+
+
+class EDUpdateDurationSensor(EDDiagnosticSensor):
+    """Duration of the last coordinator update sensor class."""
+
+    key = "update_duration"
+    label = "Update Duration"
+
+    @property
+    def state(self):
+        """Return the state of the sensor."""
+        return _span_value(self.coordinator.api.telemetry.as_dict().get("coordinator.update"), "last_ms")
+
+    @property
+    def unit_of_measurement(self):
+        """Return the unit of measurement"""
+        return "ms"
+
+    @property
+    def device_state_attributes(self):
+        """Return the state attributes."""
+        return self.coordinator.api.telemetry.as_dict()
+
+
+class EDApiLatencySensor(EDDiagnosticSensor):
+    """Remote API latency sensor class."""
+
+    def __init__(self, coordinator, cmdr_name, api, api_label):
+        super().__init__(coordinator, cmdr_name)
+        self._span = f"api.{api}"
+        self.key = f"{api}_latency"
+        self.label = f"{api_label} Latency"
+
+    @property
+    def state(self):
+        """Return the state of the sensor."""
+        return _span_value(self.coordinator.api.telemetry.as_dict(self._span).get(self._span), "p50_ms")
+
+    @property
+    def unit_of_measurement(self):
+        """Return the unit of measurement"""
+        return "ms"
+
+    @property
+    def device_state_attributes(self):
+        """Return the state attributes."""
+        return self.coordinator.api.telemetry.as_dict(self._span).get(self._span, {})
+
+
+class EDDatabaseLatencySensor(EDDiagnosticSensor):
+    """Database query latency sensor class."""
+
+    key = "db_latency"
+    label = "Database Query Latency"
+
+    @property
+    def state(self):
+        """Return the state of the sensor."""
+        return _span_value(self.coordinator.api.db_telemetry.as_dict("db.read").get("db.read"), "p50_ms")
+
+    @property
+    def unit_of_measurement(self):
+        """Return the unit of measurement"""
+        return "ms"
+
+    @property
+    def device_state_attributes(self):
+        """Return the state attributes."""
+        return self.coordinator.api.db_telemetry.as_dict("db.")
+
+
+class EDDatabaseSizeSensor(EDDiagnosticSensor):
+    """Database file size sensor class."""
+
+    key = "db_size"
+    label = "Database Size"
+
+    @property
+    def state(self):
+        """Return the state of the sensor."""
+        size = self.coordinator.api.db_file_size
+        return round(size / 1e6, 1) if size is not None else None
+
+    @property
+    def unit_of_measurement(self):
+        """Return the unit of measurement"""
+        return "MB"
+
+
+class EDIngestDurationSensor(EDDiagnosticSensor):
+    """Duration of the last system data ingest sensor class."""
+
+    key = "ingest_duration"
+    label = "System Data Ingest Duration"
+
+    @property
+    def state(self):
+        """Return the state of the sensor."""
+        seconds = self.coordinator.api.system_data_progress.last_ingest_seconds
+        return round(seconds, 1) if seconds is not None else None
+
+    @property
+    def unit_of_measurement(self):
+        """Return the unit of measurement"""
+        return "s"
+
+    @property
+    def device_state_attributes(self):
+        """Return the state attributes."""
+        return self.coordinator.api.db_telemetry.as_dict("ingest.")
+
+
+class EDIngestRateSensor(EDDiagnosticSensor):
+    """Rows per second of the last system data ingest sensor class."""
+
+    key = "ingest_rate"
+    label = "System Data Ingest Rate"
+
+    @property
+    def state(self):
+        """Return the state of the sensor."""
+        rate = self.coordinator.api.system_data_progress.last_ingest_rate
+        return round(rate) if rate is not None else None
+
+    @property
+    def unit_of_measurement(self):
+        """Return the unit of measurement"""
+        return "systems/s"
+
+
+class EDCacheHitRateSensor(EDDiagnosticSensor):
+    """System lookup cache hit rate sensor class."""
+
+    key = "cache_hit_rate"
+    label = "Cache Hit Rate"
+
+    @property
+    def state(self):
+        """Return the state of the sensor."""
+        return round(self.coordinator.api.system_cache_stats["hit_rate"] * 100, 1)
+
+    @property
+    def unit_of_measurement(self):
+        """Return the unit of measurement"""
+        return "%"
+
+    @property
+    def device_state_attributes(self):
+        """Return the state attributes."""
+        return {"system_cache": self.coordinator.api.system_cache_stats, **self.coordinator.api.cache_stats}
+
+
+class EDRouteSensor(Entity):
+    """Last planned route sensor class, pushed whenever the plan_route service planned a route."""
+
+    def __init__(self, coordinator, cmdr_name):
+        self._api = coordinator.api
+        self._cmdr_name = cmdr_name
+
+    async def async_added_to_hass(self):
+        """Subscribe to planned routes."""
+        self.async_on_remove(
+            async_dispatcher_connect(self.hass, SIGNAL_ROUTE_PLANNED, self.async_write_ha_state)
+        )
+
+    @property
+    def should_poll(self):
+        """No polling needed, routes are pushed."""
+        return False
+
+    @property
+    def unique_id(self):
+        """Return a unique ID to use for this entity."""
+        cmdr_name_id = self._cmdr_name.replace(" ", "_")
+        return f"{cmdr_name_id}_route"
+
+    @property
+    def name(self):
+        """Return the name of the sensor."""
+        return f"CMDR {self._cmdr_name} Route"
+
+    @property
+    def state(self):
+        """Return the number of jumps of the route."""
+        return self._api.route.jumps if self._api.route is not None else None
+
+    @property
+    def unit_of_measurement(self):
+        """Return the unit of measurement"""
+        return "jumps"
+
+    @property
+    def device_state_attributes(self):
+        """Return the state attributes."""
+        return self._api.route.as_dict() if self._api.route is not None else {}
+
+    @property
+    def icon(self):
+        """Return the icon of the sensor."""
+        return ICON_ROUTE
@@ -0,0 +1,315 @@
+"""Services of ed_integration."""
+import logging
+import uuid
+
+from homeassistant.core import HomeAssistant, ServiceCall
+from homeassistant.exceptions import HomeAssistantError
+import voluptuous as vol
+
+from .const import DOMAIN, KEY_OUTPUT_LOCATION_STR
+from .db import ATTRIBUTE_COLUMNS, System, SystemFilter
+from .profiling import profile_path, write_report
+from .systems import REFRESH_STATE_RUNNING
+
+_LOGGER = logging.getLogger(__name__)
+
+SERVICE_PROFILE = "profile"
+SERVICE_PLAN_ROUTE = "plan_route"
+SERVICE_SEARCH_SYSTEMS = "search_systems"
+SERVICE_COUNT_SYSTEMS = "count_systems"
+SERVICE_TOP_SYSTEMS = "top_systems"
+EVENT_PROFILE_FINISHED = f"{DOMAIN}_profile_finished"
+EVENT_ROUTE_PLANNED = f"{DOMAIN}_route_planned"
+EVENT_SEARCH_RESULTS = f"{DOMAIN}_search_results"
+EVENT_SYSTEM_COUNTS = f"{DOMAIN}_system_counts"
+EVENT_TOP_SYSTEMS = f"{DOMAIN}_top_systems"
+ATTR_OPERATION = "operation"
+ATTR_RESET = "reset"
+ATTR_SYSTEM = "system"
+ATTR_COUNT = "count"
+ATTR_TOP_ALLOCATIONS = "top_allocations"
+ATTR_SOURCE = "source"
+ATTR_DESTINATION = "destination"
+ATTR_JUMP_RANGE = "jump_range"
+ATTR_X = "x"
+ATTR_Y = "y"
+ATTR_Z = "z"
+ATTR_RADIUS = "radius"
+ATTR_PAGE_SIZE = "page_size"
+ATTR_MAX_RESULTS = "max_results"
+ATTR_MIN_POPULATION = "min_population"
+ATTR_MAX_POPULATION = "max_population"
+ATTR_NEEDS_PERMIT = "needs_permit"
+ATTR_GROUP_BY = "group_by"
+ATTR_LIMIT = "limit"
+FILTER_NAMES = ("economy", "security", "allegiance", "government", "power", "power_state")
+OPERATION_REFRESH_SYSTEM_DATA = "refresh_system_data"
+OPERATION_NEAREST_SYSTEMS = "nearest_systems"
+
+PROFILE_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_OPERATION): vol.In([OPERATION_REFRESH_SYSTEM_DATA, OPERATION_NEAREST_SYSTEMS]),
+        vol.Optional(ATTR_RESET, default=True): bool,
+        vol.Optional(ATTR_SYSTEM): str,
+        vol.Optional(ATTR_COUNT, default=10): vol.All(int, vol.Range(min=1, max=1000)),
+        vol.Optional(ATTR_TOP_ALLOCATIONS, default=25): vol.All(int, vol.Range(min=1, max=500)),
+    }
+)
+
+PLAN_ROUTE_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_SOURCE): str,
+        vol.Required(ATTR_DESTINATION): str,
+        vol.Required(ATTR_JUMP_RANGE): vol.All(vol.Coerce(float), vol.Range(min=1, max=500)),
+    }
+)
+
+# center, radius and filters shared by the system query services
+SYSTEM_QUERY_FIELDS = {
+    vol.Optional(ATTR_SYSTEM): str,
+    vol.Inclusive(ATTR_X, "coordinates"): vol.Coerce(float),
+    vol.Inclusive(ATTR_Y, "coordinates"): vol.Coerce(float),
+    vol.Inclusive(ATTR_Z, "coordinates"): vol.Coerce(float),
+    vol.Required(ATTR_RADIUS): vol.All(vol.Coerce(float), vol.Range(min=0, max=1000)),
+    **{vol.Optional(field): str for field in FILTER_NAMES},
+    vol.Optional(ATTR_MIN_POPULATION): vol.All(vol.Coerce(int), vol.Range(min=0)),
+    vol.Optional(ATTR_MAX_POPULATION): vol.All(vol.Coerce(int), vol.Range(min=0)),
+    vol.Optional(ATTR_NEEDS_PERMIT): bool,
+}
+
+SEARCH_SYSTEMS_SCHEMA = vol.Schema(
+    {
+        **SYSTEM_QUERY_FIELDS,
+        vol.Optional(ATTR_PAGE_SIZE, default=50): vol.All(int, vol.Range(min=1, max=500)),
+        vol.Optional(ATTR_MAX_RESULTS, default=100): vol.All(int, vol.Range(min=1, max=10000)),
+    }
+)
+
+COUNT_SYSTEMS_SCHEMA = vol.Schema(
+    {
+        **SYSTEM_QUERY_FIELDS,
+        vol.Required(ATTR_GROUP_BY): vol.In(list(ATTRIBUTE_COLUMNS)),
+    }
+)
+
+TOP_SYSTEMS_SCHEMA = vol.Schema(
+    {
+        **SYSTEM_QUERY_FIELDS,
+        vol.Optional(ATTR_LIMIT, default=10): vol.All(int, vol.Range(min=1, max=500)),
+    }
+)
+
+
+def _first_coordinator(hass: HomeAssistant):
+    coordinators = list(hass.data.get(DOMAIN, {}).values())
+    if not coordinators:
+        raise HomeAssistantError("No CMDR is set up")
+    return coordinators[0]
+
+
+def _cmdr_location(coordinator):
+    return (coordinator.data or {}).get(KEY_OUTPUT_LOCATION_STR)
+
+
+def _query_center(call: ServiceCall, coordinator):
+    """
+    :return: name of the center system or None, coordinates of the center or None
+    """
+    system = call.data.get(ATTR_SYSTEM)
+    if ATTR_X in call.data:
+        if system is not None:
+            raise HomeAssistantError("Either a system or coordinates may be given, not both")
+        return None, (call.data[ATTR_X], call.data[ATTR_Y], call.data[ATTR_Z])
+    system = system or _cmdr_location(coordinator)
+    if not system:
+        raise HomeAssistantError("No system or coordinates given and the CMDR location is unknown")
+    return system, None
+
+
+def _query_filter(call: ServiceCall) -> SystemFilter:
+    return SystemFilter(
+        **{field: call.data.get(field) for field in FILTER_NAMES + (ATTR_MIN_POPULATION, ATTR_MAX_POPULATION)},
+        needs_permit=call.data.get(ATTR_NEEDS_PERMIT),
+    )
+
+
+def _system_attributes(system: System, distance: float) -> dict:
+    return {
+        "system": system.name,
+        "distance": round(distance, 2),
+        "economy": system.primary_economy,
+        "security": system.security,
+        "allegiance": system.allegiance,
+        "government": system.government,
+        "power": system.power,
+        "power_state": system.power_state,
+        "population": system.population,
+        "needs_permit": bool(system.needs_permit),
+    }
+
+
+def async_register_services(hass: HomeAssistant) -> None:
+    """Register the services of the integration, once for all config entries."""
+    if hass.services.has_service(DOMAIN, SERVICE_PROFILE):
+        return
+    running = set()
+
+    async def async_profile(call: ServiceCall) -> None:
+        """
+        Run one operation under cProfile and tracemalloc and write the report to the config directory.
+        The summary is logged and fired as event.
+        """
+        if running:
+            raise HomeAssistantError("Another operation is being profiled")
+        coordinator = _first_coordinator(hass)
+        operation = call.data[ATTR_OPERATION]
+        if operation == OPERATION_REFRESH_SYSTEM_DATA:
+            # the profile would only show waiting for it
+            if coordinator.api.system_data_progress.state == REFRESH_STATE_RUNNING:
+                raise HomeAssistantError("A system data refresh is already running")
+            title = f"refresh_system_data(reset={call.data[ATTR_RESET]})"
+            profiled = coordinator.api.refresh_system_data(call.data[ATTR_RESET])
+        else:
+            system = call.data.get(ATTR_SYSTEM) or _cmdr_location(coordinator)
+            if not system:
+                raise HomeAssistantError("No system given and the CMDR location is unknown")
+            title = f"get_nearest_systems({system!r}, {call.data[ATTR_COUNT]})"
+            profiled = coordinator.api.get_nearest_systems(system, call.data[ATTR_COUNT])
+
+        running.add(operation)
+        try:
+            _LOGGER.info(f"Profiling {title}...")
+            result = await coordinator.api.async_profile(profiled)
+            summary = await hass.async_add_executor_job(
+                write_report,
+                profile_path(hass.config.path, operation),
+                title,
+                result,
+                call.data[ATTR_TOP_ALLOCATIONS],
+            )
+        except ValueError as e:
+            raise HomeAssistantError(str(e)) from e
+        finally:
+            running.discard(operation)
+        _LOGGER.info(f"Profiled {title} in {summary['duration']} s, report written to <{summary['report']}>")
+        hass.bus.async_fire(EVENT_PROFILE_FINISHED, summary)
+
+    async def async_plan_route(call: ServiceCall) -> None:
+        """
+        Plan a route with few jumps, shown by the route sensor and fired as event.
+        """
+        coordinator = _first_coordinator(hass)
+        source = call.data.get(ATTR_SOURCE) or _cmdr_location(coordinator)
+        if not source:
+            raise HomeAssistantError("No source given and the CMDR location is unknown")
+        try:
+            route = await coordinator.api.plan_route(source, call.data[ATTR_DESTINATION], call.data[ATTR_JUMP_RANGE])
+        except ValueError as e:
+            raise HomeAssistantError(str(e)) from e
+        if route is None:
+            _LOGGER.warning(
+                f"No route from <{source}> to <{call.data[ATTR_DESTINATION]}> "
+                f"with a jump range of {call.data[ATTR_JUMP_RANGE]} ly"
+            )
+            hass.bus.async_fire(EVENT_ROUTE_PLANNED, {**call.data, ATTR_SOURCE: source, "jumps": None})
+            return
+        hass.bus.async_fire(EVENT_ROUTE_PLANNED, route.as_dict())
+
+    async def async_search_systems(call: ServiceCall) -> None:
+        """
+        Search the systems within a radius around a system or coordinates which match the filters.
+        Results are fired page by page as events sharing a search_id, the last one flagged.
+        """
+        coordinator = _first_coordinator(hass)
+        system, position = _query_center(call, coordinator)
+        max_results = call.data[ATTR_MAX_RESULTS]
+        try:
+            pages = await coordinator.api.search_systems(
+                call.data[ATTR_RADIUS],
+                system,
+                position,
+                _query_filter(call),
+                min(call.data[ATTR_PAGE_SIZE], max_results),
+            )
+        except ValueError as e:
+            raise HomeAssistantError(str(e)) from e
+
+        search_id = uuid.uuid4().hex
+        found = 0
+        page_number = 0
+        async for page in pages:
+            systems = page.systems[:max_results - found]
+            found += len(systems)
+            last = page.next_cursor is None or found >= max_results
+            hass.bus.async_fire(
+                EVENT_SEARCH_RESULTS,
+                {
+                    "search_id": search_id,
+                    "page": page_number,
+                    "systems": [_system_attributes(found_system, distance) for found_system, distance in systems],
+                    "last": last,
+                },
+            )
+            page_number += 1
+            if last:
+                break
+        _LOGGER.debug(f"Search {search_id} found {found} systems in {page_number} pages")
+
+    async def async_count_systems(call: ServiceCall) -> None:
+        """
+        Count the systems within a radius around a system or coordinates which match the filters per value of an
+        attribute, e.g. the Control systems per power, fired as event.
+        """
+        coordinator = _first_coordinator(hass)
+        system, position = _query_center(call, coordinator)
+        try:
+            counts = await coordinator.api.count_systems(
+                call.data[ATTR_RADIUS], call.data[ATTR_GROUP_BY], system, position, _query_filter(call)
+            )
+        except ValueError as e:
+            raise HomeAssistantError(str(e)) from e
+        hass.bus.async_fire(
+            EVENT_SYSTEM_COUNTS,
+            {
+                **call.data,
+                ATTR_SYSTEM: system,
+                "counts": [{"name": name, "systems": count} for name, count in counts],
+            },
+        )
+
+    async def async_top_systems(call: ServiceCall) -> None:
+        """
+        Find the most populated systems within a radius around a system or coordinates which match the filters,
+        fired as event.
+        """
+        coordinator = _first_coordinator(hass)
+        system, position = _query_center(call, coordinator)
+        try:
+            systems = await coordinator.api.get_top_systems(
+                call.data[ATTR_RADIUS], call.data[ATTR_LIMIT], system, position, _query_filter(call)
+            )
+        except ValueError as e:
+            raise HomeAssistantError(str(e)) from e
+        hass.bus.async_fire(
+            EVENT_TOP_SYSTEMS,
+            {
+                **call.data,
+                ATTR_SYSTEM: system,
+                "systems": [_system_attributes(found_system, distance) for found_system, distance in systems],
+            },
+        )
+
+    hass.services.async_register(DOMAIN, SERVICE_PROFILE, async_profile, schema=PROFILE_SCHEMA)
+    hass.services.async_register(DOMAIN, SERVICE_PLAN_ROUTE, async_plan_route, schema=PLAN_ROUTE_SCHEMA)
+    hass.services.async_register(DOMAIN, SERVICE_SEARCH_SYSTEMS, async_search_systems, schema=SEARCH_SYSTEMS_SCHEMA)
+    hass.services.async_register(DOMAIN, SERVICE_COUNT_SYSTEMS, async_count_systems, schema=COUNT_SYSTEMS_SCHEMA)
+    hass.services.async_register(DOMAIN, SERVICE_TOP_SYSTEMS, async_top_systems, schema=TOP_SYSTEMS_SCHEMA)
+
+
+def async_unregister_services(hass: HomeAssistant) -> None:
+    """Remove the services of the integration once the last config entry is unloaded."""
+    hass.services.async_remove(DOMAIN, SERVICE_PROFILE)
+    hass.services.async_remove(DOMAIN, SERVICE_PLAN_ROUTE)
+    hass.services.async_remove(DOMAIN, SERVICE_SEARCH_SYSTEMS)
+    hass.services.async_remove(DOMAIN, SERVICE_COUNT_SYSTEMS)
+    hass.services.async_remove(DOMAIN, SERVICE_TOP_SYSTEMS)
@@ -0,0 +1,168 @@
+"""Memory-mapped columnar snapshot of the system coordinates for vectorized spatial queries"""
+from array import array
+import math
+import mmap
+import os
+import struct
+import sys
+from typing import Iterable, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # snapshots are still written, but queries fall back to SQL
+    np = None
+
+MAGIC = b"EDCOORDS"
+VERSION = 1
+# magic, version, number of systems, generation of the data, padded to 32 bytes
+HEADER = struct.Struct("<8sIIq8x")
+# column name, array typecode, numpy dtype, each column holds one little-endian value per system, ordered by id
+COLUMNS = (
+    ("ids", "i", "<i4"),
+    ("x", "f", "<f4"),
+    ("y", "f", "<f4"),
+    ("z", "f", "<f4"),
+    ("power_ids", "i", "<i4"),  # -1 for none
+    ("power_state_ids", "i", "<i4"),  # -1 for none
+)
+COLUMN_ITEMSIZE = 4
+
+SnapshotRow = Tuple[int, float, float, float, int, int]
+
+
+def write_snapshot(path: str, generation: int, rows: Iterable[SnapshotRow]) -> int:
+    """
+    Writes a snapshot, replacing the previous one at once so it is never read half-written. Blocking.
+    :param path: snapshot file
+    :param generation: generation of the data the rows were read from
+    :param rows: tuples of EDDB ID, x, y, z, power id and power state id, ordered by EDDB ID
+    :return: number of systems written
+    """
+    columns = [array(typecode) for _, typecode, _ in COLUMNS]
+    appends = [column.append for column in columns]
+    for row in rows:
+        for append, value in zip(appends, row):
+            append(value)
+    count = len(columns[0])
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as snapshot_file:
+        snapshot_file.write(HEADER.pack(MAGIC, VERSION, count, generation))
+        for column in columns:
+            if sys.byteorder == "big":
+                column.byteswap()
+            column.tofile(snapshot_file)
+    # a mapping of the replaced file stays valid until it is closed
+    os.replace(tmp_path, path)
+    return count
+
+
+class CoordinateSnapshot:
+    """
+    Mapping of a snapshot file. The columns are views of the mapped pages, so opening a snapshot neither reads
+    nor parses the file and the pages are loaded by the OS as queries touch them. Queries and patches need numpy,
+    see available.
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: snapshot file
+        :raises OSError: if the file can't be opened
+        :raises ValueError: if the file is no complete snapshot of this version
+        """
+        with open(path, "r+b") as snapshot_file:
+            size = os.fstat(snapshot_file.fileno()).st_size
+            if size < HEADER.size:
+                raise ValueError(f"Snapshot truncated: {path}")
+            # shared and writable, so patches go to the file as well
+            self._mmap = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_WRITE)
+        magic, version, self.count, self.generation = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"No snapshot of version {VERSION}: {path}")
+        if size != HEADER.size + len(COLUMNS) * COLUMN_ITEMSIZE * self.count:
+            raise ValueError(f"Snapshot truncated: {path}")
+        self.path = path
+        if np is not None:
+            for index, (name, _, dtype) in enumerate(COLUMNS):
+                offset = HEADER.size + index * COLUMN_ITEMSIZE * self.count
+                setattr(self, name, np.frombuffer(self._mmap, dtype, self.count, offset))
+
+    @staticmethod
+    def available() -> bool:
+        """
+        :return: if numpy is installed, which queries need
+        """
+        return np is not None
+
+    def query(
+            self,
+            x: float,
+            y: float,
+            z: float,
+            radius: float = math.inf,
+            k: int = -1,
+            power_id: Optional[int] = None,
+            power_state_id: Optional[int] = None,
+            exclude_sid: Optional[int] = None,
+    ) -> List[Tuple[int, float]]:
+        """
+        Finds the systems closest to a point by computing all distances at once.
+        Coordinates are stored as 32-bit floats, so distances are exact to about 1e-7 of the coordinates only.
+        :param x: x-coordinate of the center
+        :param y: y-coordinate of the center
+        :param z: z-coordinate of the center
+        :param radius: search radius in ly
+        :param k: maximum number of systems, negative for no limit
+        :param power_id: only systems of this power, if set
+        :param power_state_id: only systems in this power state, if set
+        :param exclude_sid: EDDB ID of a system to leave out
+        :return: EDDB IDs and distances, closest first
+        """
+        distance_sq = (self.x - x) ** 2 + (self.y - y) ** 2 + (self.z - z) ** 2
+        mask = distance_sq <= radius * radius
+        if power_id is not None:
+            mask &= self.power_ids == power_id
+        if power_state_id is not None:
+            mask &= self.power_state_ids == power_state_id
+        if exclude_sid is not None:
+            mask &= self.ids != exclude_sid
+        candidates = np.flatnonzero(mask)
+        if 0 <= k < len(candidates):
+            candidates = candidates[np.argpartition(distance_sq[candidates], k)[:k]] if k > 0 else candidates[:0]
+        candidates = candidates[np.argsort(distance_sq[candidates], kind="stable")]
+        return [
+            (int(sid), math.sqrt(float(squared)))
+            for sid, squared in zip(self.ids[candidates], distance_sq[candidates])
+        ]
+
+    def patch_powers(self, rows: Iterable[Tuple[int, int, int]], generation: int) -> int:
+        """
+        Overwrites the power columns of systems in place, e.g. after live updates, which never move systems.
+        The generation in the header is written last, so a snapshot left behind half-patched is found outdated.
+        :param rows: tuples of EDDB ID, power id and power state id
+        :param generation: generation of the data after the update
+        :return: number of systems patched, those missing from the snapshot are skipped
+        """
+        rows = list(rows)
+        if rows:
+            sids, power_ids, power_state_ids = (np.array(column) for column in zip(*rows))
+            indices = np.minimum(np.searchsorted(self.ids, sids), max(self.count - 1, 0))
+            found = self.ids[indices] == sids if self.count else np.zeros(len(sids), bool)
+            self.power_ids[indices[found]] = power_ids[found]
+            self.power_state_ids[indices[found]] = power_state_ids[found]
+            patched = int(found.sum())
+        else:
+            patched = 0
+        self._mmap[:HEADER.size] = HEADER.pack(MAGIC, VERSION, self.count, generation)
+        self.generation = generation
+        return patched
+
+
+def open_snapshot(path: str) -> Optional[CoordinateSnapshot]:
+    """
+    :param path: snapshot file
+    :return: mapped snapshot, None if there is no valid one
+    """
+    try:
+        return CoordinateSnapshot(path)
+    except (OSError, ValueError):
+        return None
@@ -0,0 +1,26 @@
+UPDATE SYSTEMS
+SET population                   = coalesce(:population, population),
+    is_populated                 = coalesce(:population > 0, is_populated),
+    government_id                = coalesce((SELECT min(id) FROM GOVERNMENTS WHERE name = :government), government_id),
+    allegiance_id                = coalesce((SELECT min(id) FROM ALLEGIANCES WHERE name = :allegiance), allegiance_id),
+    security_id                  = coalesce((SELECT min(id) FROM SECURITIES WHERE name = :security), security_id),
+    primary_economy_id           = coalesce((SELECT min(id) FROM ECONOMIES WHERE name = :primary_economy), primary_economy_id),
+    power_id                     = CASE
+                                       WHEN :powerless THEN NULL
+                                       ELSE coalesce((SELECT id FROM POWERS WHERE name = :power), power_id)
+                                   END,
+    -- an unknown state is kept unless it belonged to a previous power
+    power_state_id               = CASE
+                                       WHEN :powerless THEN NULL
+                                       ELSE coalesce((SELECT min(id) FROM POWER_STATES WHERE name = :power_state),
+                                                     CASE
+                                                         WHEN :power IS NULL
+                                                             OR power_id = (SELECT id FROM POWERS WHERE name = :power)
+                                                             THEN power_state_id
+                                                     END)
+                                   END,
+    controlling_minor_faction_id = coalesce((SELECT min(id) FROM FACTIONS WHERE name = :controlling_minor_faction),
+                                            controlling_minor_faction_id),
+    updated_at                   = :updated_at
+WHERE name = :name
+  AND (updated_at IS NULL OR updated_at < :updated_at);
@@ -0,0 +1,7 @@
+SELECT g.name, count(*) AS systems
+FROM SYSTEMS_RTREE r
+         JOIN SYSTEMS s ON s.id = r.id
+         JOIN {table} g ON g.id = s.{column}
+WHERE {filters}
+GROUP BY g.name
+ORDER BY systems DESC, g.name;
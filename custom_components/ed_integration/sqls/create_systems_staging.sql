@@ -0,0 +1,37 @@
+drop table if exists SYSTEMS_STAGING;
+drop table if exists SYSTEMS_RTREE_STAGING;
+
+create table SYSTEMS_STAGING
+(
+	id integer not null
+		constraint SYSTEMS_pk
+			primary key,
+	edsm_id integer,
+	name text not null,
+	x real not null,
+	y real not null,
+	z real not null,
+	population integer not null,
+	is_populated integer,
+	government_id integer,
+	allegiance_id integer,
+	security_id integer,
+	primary_economy_id integer,
+	power_id integer,
+	power_state_id integer,
+	needs_permit integer not null,
+	updated_at integer,
+	controlling_minor_faction_id integer,
+	reserve_type_id integer
+);
+
+create unique index SYSTEMS_name_uindex_{generation}
+	on SYSTEMS_STAGING (name);
+
+create virtual table SYSTEMS_RTREE_STAGING using rtree
+(
+	id,
+	min_x, max_x,
+	min_y, max_y,
+	min_z, max_z
+);
@@ -0,0 +1,27 @@
+-- conditions shared by the filtered system queries, on SYSTEMS_RTREE r joined with SYSTEMS s
+r.max_x >= :x - :radius AND r.min_x <= :x + :radius
+AND r.max_y >= :y - :radius AND r.min_y <= :y + :radius
+AND r.max_z >= :z - :radius AND r.min_z <= :z + :radius
+AND (s.x - :x) * (s.x - :x) + (s.y - :y) * (s.y - :y) + (s.z - :z) * (s.z - :z) <= :radius * :radius
+AND (:economy IS NULL OR s.primary_economy_id IN (
+    SELECT id FROM ECONOMIES WHERE name = :economy COLLATE NOCASE
+))
+AND (:security IS NULL OR s.security_id IN (
+    SELECT id FROM SECURITIES WHERE name = :security COLLATE NOCASE
+))
+AND (:allegiance IS NULL OR s.allegiance_id IN (
+    SELECT id FROM ALLEGIANCES WHERE name = :allegiance COLLATE NOCASE
+))
+AND (:government IS NULL OR s.government_id IN (
+    SELECT id FROM GOVERNMENTS WHERE name = :government COLLATE NOCASE
+))
+AND (:power IS NULL OR s.power_id IN (
+    SELECT id FROM POWERS WHERE name = :power COLLATE NOCASE
+))
+AND (:power_state IS NULL OR s.power_state_id IN (
+    SELECT id FROM POWER_STATES WHERE name = :power_state COLLATE NOCASE
+))
+AND (:min_population IS NULL OR s.population >= :min_population)
+AND (:max_population IS NULL OR s.population <= :max_population)
+AND (:needs_permit IS NULL OR s.needs_permit = :needs_permit)
+AND s.id IS NOT :exclude_sid
@@ -0,0 +1 @@
+SELECT etag, last_modified, content_length FROM SYSTEMS_META WHERE id = 1
\ No newline at end of file
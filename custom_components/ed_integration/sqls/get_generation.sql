@@ -0,0 +1 @@
+SELECT generation FROM SYSTEMS_META WHERE id = 1
@@ -0,0 +1 @@
+SELECT id, x, y, z FROM SYSTEMS
@@ -0,0 +1,3 @@
+SELECT id, x, y, z, coalesce(power_id, -1), coalesce(power_state_id, -1)
+FROM SYSTEMS
+ORDER BY id;
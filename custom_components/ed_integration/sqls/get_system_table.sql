@@ -0,0 +1,6 @@
+SELECT id, x, y, z, coalesce(population, -1), coalesce(needs_permit, -1),
+       coalesce(primary_economy_id, -1), coalesce(security_id, -1), coalesce(allegiance_id, -1),
+       coalesce(government_id, -1), coalesce(power_id, -1), coalesce(power_state_id, -1)
+FROM SYSTEMS
+{where}
+ORDER BY id;
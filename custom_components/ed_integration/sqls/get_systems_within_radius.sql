@@ -0,0 +1,13 @@
+SELECT {columns},
+       (s.x - :x) * (s.x - :x) + (s.y - :y) * (s.y - :y) + (s.z - :z) * (s.z - :z) AS distance_sq
+FROM SYSTEMS_RTREE r
+         JOIN SYSTEMS_VIEW s ON s.id = r.id
+WHERE r.max_x >= :x - :radius AND r.min_x <= :x + :radius
+  AND r.max_y >= :y - :radius AND r.min_y <= :y + :radius
+  AND r.max_z >= :z - :radius AND r.min_z <= :z + :radius
+  AND distance_sq <= :radius * :radius
+  AND (:power IS NULL OR s.power_id IN (SELECT id FROM POWERS WHERE name = :power))
+  AND (:power_state IS NULL OR s.power_state_id IN (SELECT id FROM POWER_STATES WHERE name = :power_state))
+  AND s.id IS NOT :exclude_sid
+ORDER BY distance_sq
+LIMIT :limit;
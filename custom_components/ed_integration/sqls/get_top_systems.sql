@@ -0,0 +1,14 @@
+WITH top AS (
+    SELECT s.id,
+           s.population,
+           (s.x - :x) * (s.x - :x) + (s.y - :y) * (s.y - :y) + (s.z - :z) * (s.z - :z) AS distance_sq
+    FROM SYSTEMS_RTREE r
+             JOIN SYSTEMS s ON s.id = r.id
+    WHERE {filters}
+    ORDER BY s.population DESC, s.id
+    LIMIT :limit
+)
+SELECT {columns}, top.distance_sq
+FROM top
+         JOIN SYSTEMS_VIEW s ON s.id = top.id
+ORDER BY top.population DESC, s.id;
@@ -0,0 +1 @@
+UPDATE SYSTEMS_META SET generation = generation + 1 WHERE id = 1
\ No newline at end of file
@@ -0,0 +1,6 @@
+insert into SYSTEMS_RTREE_STAGING (id, min_x, max_x, min_y, max_y, min_z, max_z)
+select id, x, x, y, y, z, z
+from SYSTEMS_STAGING;
+
+create index SYSTEMS_power_index_{generation}
+	on SYSTEMS_STAGING (power_id, power_state_id);
@@ -1,4 +1,8 @@
+drop view if exists SYSTEMS_VIEW;
 drop table if exists SYSTEMS;
+drop table if exists SYSTEMS_STAGING;
+drop table if exists SYSTEMS_RTREE;
+drop table if exists SYSTEMS_RTREE_STAGING;
 
 create table SYSTEMS
 (
@@ -13,22 +17,15 @@ create table SYSTEMS
 	population integer not null,
 	is_populated integer,
 	government_id integer,
-	government text,
 	allegiance_id integer,
-	allegiance text,
 	security_id integer,
-	security text,
 	primary_economy_id integer,
-	primary_economy text,
-	power text,
-	power_state text,
+	power_id integer,
 	power_state_id integer,
 	needs_permit integer not null,
 	updated_at integer,
 	controlling_minor_faction_id integer,
-	controlling_minor_faction text,
-	reserve_type_id integer,
-	reserve_type text
+	reserve_type_id integer
 );
 
 create unique index SYSTEMS_id_uindex
@@ -37,6 +34,114 @@ create unique index SYSTEMS_id_uindex
 create unique index SYSTEMS_name_uindex
 	on SYSTEMS (name);
 
+create index SYSTEMS_power_index
+	on SYSTEMS (power_id, power_state_id);
+
+create virtual table SYSTEMS_RTREE using rtree
+(
+	id,
+	min_x, max_x,
+	min_y, max_y,
+	min_z, max_z
+);
+
+drop table if exists GOVERNMENTS;
+drop table if exists ALLEGIANCES;
+drop table if exists SECURITIES;
+drop table if exists ECONOMIES;
+drop table if exists POWERS;
+drop table if exists POWER_STATES;
+drop table if exists FACTIONS;
+drop table if exists RESERVE_TYPES;
+
+create table GOVERNMENTS
+(
+	id integer not null
+		constraint GOVERNMENTS_pk
+			primary key,
+	name text not null
+);
+
+create table ALLEGIANCES
+(
+	id integer not null
+		constraint ALLEGIANCES_pk
+			primary key,
+	name text not null
+);
+
+create table SECURITIES
+(
+	id integer not null
+		constraint SECURITIES_pk
+			primary key,
+	name text not null
+);
+
+create table ECONOMIES
+(
+	id integer not null
+		constraint ECONOMIES_pk
+			primary key,
+	name text not null
+);
+
+-- EDDB has no power ids, they are assigned here
+create table POWERS
+(
+	id integer not null
+		constraint POWERS_pk
+			primary key,
+	name text not null
+);
+
+create unique index POWERS_name_uindex
+	on POWERS (name);
+
+create table POWER_STATES
+(
+	id integer not null
+		constraint POWER_STATES_pk
+			primary key,
+	name text not null
+);
+
+create table FACTIONS
+(
+	id integer not null
+		constraint FACTIONS_pk
+			primary key,
+	name text not null
+);
+
+create index FACTIONS_name_index
+	on FACTIONS (name);
+
+create table RESERVE_TYPES
+(
+	id integer not null
+		constraint RESERVE_TYPES_pk
+			primary key,
+	name text not null
+);
+
+create view SYSTEMS_VIEW as
+select s.id, s.edsm_id, s.name, s.x, s.y, s.z, s.population, s.is_populated,
+       s.government_id, g.name as government, s.allegiance_id, a.name as allegiance,
+       s.security_id, sec.name as security, s.primary_economy_id, e.name as primary_economy,
+       p.name as power, ps.name as power_state, s.power_state_id, s.needs_permit, s.updated_at,
+       s.controlling_minor_faction_id, f.name as controlling_minor_faction, s.reserve_type_id, r.name as reserve_type,
+       s.power_id
+from SYSTEMS s
+         left join GOVERNMENTS g on g.id = s.government_id
+         left join ALLEGIANCES a on a.id = s.allegiance_id
+         left join SECURITIES sec on sec.id = s.security_id
+         left join ECONOMIES e on e.id = s.primary_economy_id
+         left join POWERS p on p.id = s.power_id
+         left join POWER_STATES ps on ps.id = s.power_state_id
+         left join FACTIONS f on f.id = s.controlling_minor_faction_id
+         left join RESERVE_TYPES r on r.id = s.reserve_type_id;
+
 drop table if exists SYSTEMS_META;
 
 create table SYSTEMS_META
@@ -44,7 +149,11 @@ create table SYSTEMS_META
     id integer not null
         constraint META_pk
             primary key,
-    last_updated timestamp
+    last_updated timestamp,
+    generation integer default 0 not null,
+    etag text,
+    last_modified text,
+    content_length integer
 );
 
 create unique index SYSTEMS_META_id_uindex
@@ -53,8 +162,12 @@ create unique index SYSTEMS_META_id_uindex
 insert into SYSTEMS_META
 (
     id,
-    last_updated
+    last_updated,
+    generation
 ) VALUES (
     1,
-    NULL
-);
\ No newline at end of file
+    NULL,
+    0
+);
+
+pragma user_version = 4;
\ No newline at end of file
@@ -0,0 +1,22 @@
+-- brings databases created before the schema was versioned up to version 2, keeping the stored systems
+begin immediate;
+
+alter table SYSTEMS_META add column generation integer default 0 not null;
+
+create index SYSTEMS_power_index
+	on SYSTEMS (power, power_state);
+
+create virtual table SYSTEMS_RTREE using rtree
+(
+	id,
+	min_x, max_x,
+	min_y, max_y,
+	min_z, max_z
+);
+
+insert into SYSTEMS_RTREE (id, min_x, max_x, min_y, max_y, min_z, max_z)
+select id, x, x, y, y, z, z from SYSTEMS;
+
+pragma user_version = 2;
+
+commit;
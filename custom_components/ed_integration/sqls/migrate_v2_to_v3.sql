@@ -0,0 +1,175 @@
+-- moves the categorical text columns of SYSTEMS into lookup tables, keeping the stored systems
+begin immediate;
+
+create table GOVERNMENTS
+(
+	id integer not null
+		constraint GOVERNMENTS_pk
+			primary key,
+	name text not null
+);
+
+create table ALLEGIANCES
+(
+	id integer not null
+		constraint ALLEGIANCES_pk
+			primary key,
+	name text not null
+);
+
+create table SECURITIES
+(
+	id integer not null
+		constraint SECURITIES_pk
+			primary key,
+	name text not null
+);
+
+create table ECONOMIES
+(
+	id integer not null
+		constraint ECONOMIES_pk
+			primary key,
+	name text not null
+);
+
+-- EDDB has no power ids, they are assigned here
+create table POWERS
+(
+	id integer not null
+		constraint POWERS_pk
+			primary key,
+	name text not null
+);
+
+create unique index POWERS_name_uindex
+	on POWERS (name);
+
+create table POWER_STATES
+(
+	id integer not null
+		constraint POWER_STATES_pk
+			primary key,
+	name text not null
+);
+
+create table FACTIONS
+(
+	id integer not null
+		constraint FACTIONS_pk
+			primary key,
+	name text not null
+);
+
+create index FACTIONS_name_index
+	on FACTIONS (name);
+
+create table RESERVE_TYPES
+(
+	id integer not null
+		constraint RESERVE_TYPES_pk
+			primary key,
+	name text not null
+);
+
+insert or replace into GOVERNMENTS (id, name)
+select distinct government_id, government from SYSTEMS where government_id is not null and government is not null;
+
+insert or replace into ALLEGIANCES (id, name)
+select distinct allegiance_id, allegiance from SYSTEMS where allegiance_id is not null and allegiance is not null;
+
+insert or replace into SECURITIES (id, name)
+select distinct security_id, security from SYSTEMS where security_id is not null and security is not null;
+
+insert or replace into ECONOMIES (id, name)
+select distinct primary_economy_id, primary_economy from SYSTEMS
+where primary_economy_id is not null and primary_economy is not null;
+
+insert into POWERS (name)
+select distinct power from SYSTEMS where power is not null order by power;
+
+insert or replace into POWER_STATES (id, name)
+select distinct power_state_id, power_state from SYSTEMS
+where typeof(power_state_id) = 'integer' and power_state is not null;
+
+-- older versions stored the power state name instead of its id, these get negative ids until the next refresh
+insert into POWER_STATES (id, name)
+select -min(rowid), power_state from SYSTEMS
+where power_state is not null and power_state not in (select name from POWER_STATES)
+group by power_state;
+
+insert or replace into FACTIONS (id, name)
+select distinct controlling_minor_faction_id, controlling_minor_faction from SYSTEMS
+where controlling_minor_faction_id is not null and controlling_minor_faction is not null;
+
+insert or replace into RESERVE_TYPES (id, name)
+select distinct reserve_type_id, reserve_type from SYSTEMS where reserve_type_id is not null and reserve_type is not null;
+
+create table SYSTEMS_V3
+(
+	id integer not null
+		constraint SYSTEMS_pk
+			primary key,
+	edsm_id integer,
+	name text not null,
+	x real not null,
+	y real not null,
+	z real not null,
+	population integer not null,
+	is_populated integer,
+	government_id integer,
+	allegiance_id integer,
+	security_id integer,
+	primary_economy_id integer,
+	power_id integer,
+	power_state_id integer,
+	needs_permit integer not null,
+	updated_at integer,
+	controlling_minor_faction_id integer,
+	reserve_type_id integer
+);
+
+insert into SYSTEMS_V3 (id, edsm_id, name, x, y, z, population, is_populated, government_id, allegiance_id,
+                        security_id, primary_economy_id, power_id, power_state_id, needs_permit, updated_at,
+                        controlling_minor_faction_id, reserve_type_id)
+select s.id, s.edsm_id, s.name, s.x, s.y, s.z, s.population, s.is_populated, s.government_id, s.allegiance_id,
+       s.security_id, s.primary_economy_id, p.id,
+       coalesce(case when typeof(s.power_state_id) = 'integer' then s.power_state_id end,
+                (select min(ps.id) from POWER_STATES ps where ps.name = s.power_state)),
+       s.needs_permit, s.updated_at, s.controlling_minor_faction_id, s.reserve_type_id
+from SYSTEMS s
+         left join POWERS p on p.name = s.power;
+
+drop table SYSTEMS;
+
+alter table SYSTEMS_V3 rename to SYSTEMS;
+
+create unique index SYSTEMS_id_uindex
+	on SYSTEMS (id);
+
+create unique index SYSTEMS_name_uindex
+	on SYSTEMS (name);
+
+create index SYSTEMS_power_index
+	on SYSTEMS (power_id, power_state_id);
+
+create view SYSTEMS_VIEW as
+select s.id, s.edsm_id, s.name, s.x, s.y, s.z, s.population, s.is_populated,
+       s.government_id, g.name as government, s.allegiance_id, a.name as allegiance,
+       s.security_id, sec.name as security, s.primary_economy_id, e.name as primary_economy,
+       p.name as power, ps.name as power_state, s.power_state_id, s.needs_permit, s.updated_at,
+       s.controlling_minor_faction_id, f.name as controlling_minor_faction, s.reserve_type_id, r.name as reserve_type,
+       s.power_id
+from SYSTEMS s
+         left join GOVERNMENTS g on g.id = s.government_id
+         left join ALLEGIANCES a on a.id = s.allegiance_id
+         left join SECURITIES sec on sec.id = s.security_id
+         left join ECONOMIES e on e.id = s.primary_economy_id
+         left join POWERS p on p.id = s.power_id
+         left join POWER_STATES ps on ps.id = s.power_state_id
+         left join FACTIONS f on f.id = s.controlling_minor_faction_id
+         left join RESERVE_TYPES r on r.id = s.reserve_type_id;
+
+pragma user_version = 3;
+
+commit;
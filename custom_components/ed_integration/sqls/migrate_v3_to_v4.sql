@@ -0,0 +1,10 @@
+-- adds the validators of the downloaded systems dump, used for conditional and resumed downloads
+begin immediate;
+
+alter table SYSTEMS_META add column etag text;
+alter table SYSTEMS_META add column last_modified text;
+alter table SYSTEMS_META add column content_length integer;
+
+pragma user_version = 4;
+
+commit;
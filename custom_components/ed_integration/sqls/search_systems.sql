@@ -0,0 +1,16 @@
+WITH page AS (
+    -- rank on the base table, the lookup tables are only joined for the rows of the page
+    SELECT s.id,
+           (s.x - :x) * (s.x - :x) + (s.y - :y) * (s.y - :y) + (s.z - :z) * (s.z - :z) AS distance_sq
+    FROM SYSTEMS_RTREE r
+             JOIN SYSTEMS s ON s.id = r.id
+    WHERE {filters}
+      -- keyset paging: continue after the last row of the previous page
+      AND (distance_sq > :after_distance_sq OR (distance_sq = :after_distance_sq AND s.id > :after_sid))
+    ORDER BY distance_sq, s.id
+    LIMIT :limit
+)
+SELECT {columns}, page.distance_sq
+FROM page
+         JOIN SYSTEMS_VIEW s ON s.id = page.id
+ORDER BY page.distance_sq, s.id;
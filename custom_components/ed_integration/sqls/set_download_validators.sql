@@ -0,0 +1 @@
+UPDATE SYSTEMS_META SET etag = ?, last_modified = ?, content_length = ? WHERE id = 1
\ No newline at end of file
@@ -0,0 +1,16 @@
+-- keeps the renames below from rewriting SYSTEMS_VIEW, which refers to the dropped table in between
+pragma legacy_alter_table = on;
+
+begin immediate;
+
+drop table SYSTEMS;
+drop table SYSTEMS_RTREE;
+
+alter table SYSTEMS_STAGING rename to SYSTEMS;
+alter table SYSTEMS_RTREE_STAGING rename to SYSTEMS_RTREE;
+
+update SYSTEMS_META set generation = generation + 1 where id = 1;
+
+commit;
+
+pragma legacy_alter_table = off;
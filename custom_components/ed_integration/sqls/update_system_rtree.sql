@@ -0,0 +1,2 @@
+INSERT OR REPLACE INTO SYSTEMS_RTREE (id, min_x, max_x, min_y, max_y, min_z, max_z)
+VALUES (?, ?, ?, ?, ?, ?, ?);
@@ -0,0 +1,466 @@
+"""Provides the system database shared by all config entries and its refresh from EDDB"""
+import asyncio
+import datetime
+import io
+import logging
+from operator import itemgetter
+import sqlite3
+import time
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, Optional
+import zlib
+
+import aiohttp
+from aiohttp import hdrs
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.aiohttp_client import async_create_clientsession
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.helpers.event import async_track_time_interval
+import ijson
+
+from .const import DOMAIN
+from .db import SYSTEM_COLUMNS, Database, DownloadValidators, SystemRow
+from .eddn import EDDNSubscriber
+from .route import RoutePlanner
+
+_LOGGER = logging.getLogger(__name__)
+
+URL_EDDB_POP_SYSTEMS_JSON = "https://eddb.io/archive/v6/systems_populated.json"
+HTTP_DOWNLOAD_TIMEOUT = aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=60)
+DOWNLOAD_BUFFER_SIZE = 64 * 1024
+ACCEPT_ENCODING = "gzip, deflate"
+DECOMPRESS_WBITS = {"gzip": 16 + zlib.MAX_WBITS, "deflate": zlib.MAX_WBITS}
+MAX_RESUMES = 5
+RESUME_DELAY = 2  # s, multiplied by the number of resumes so far
+DATA_SYSTEM_DATA = f"{DOMAIN}_system_data"
+SIGNAL_SYSTEM_DATA_PROGRESS = f"{DOMAIN}_system_data_progress"
+PROGRESS_INTERVAL = datetime.timedelta(seconds=5)
+REFRESH_STATE_IDLE = "idle"
+REFRESH_STATE_RUNNING = "refreshing"
+REFRESH_STATE_FAILED = "failed"
+
+
+def iter_system_rows(stream: BinaryIO) -> Iterator[SystemRow]:
+    """
+    Lazily parses an EDDB systems JSON stream into database rows.
+    :param stream: file-like object containing the EDDB systems JSON array
+    :return: iterator of tuples as described in Database.add_system
+    """
+    # the JSON keys equal the column names, coordinates are parsed as float right away instead of Decimal
+    return map(itemgetter(*SYSTEM_COLUMNS), ijson.items(stream, "item", use_float=True))
+
+
+class RefreshProgress:
+    """
+    Progress of the running or last system data refresh.
+    Counters are written by the database writer thread and read on the event loop, each is a single int.
+    """
+
+    def __init__(self):
+        self.state = REFRESH_STATE_IDLE
+        self.started_at: Optional[float] = None
+        self.bytes_downloaded = 0
+        self.bytes_total: Optional[int] = None
+        self.rows_ingested = 0
+        self.rows_expected: Optional[int] = None
+        # of the last refresh which ingested the dump, kept while the next one runs
+        self.last_ingest_seconds: Optional[float] = None
+        self.last_ingest_rows: Optional[int] = None
+
+    def start(self, rows_expected: Optional[int]) -> None:
+        """
+        Resets the counters for a new refresh.
+        :param rows_expected: number of rows the refresh is expected to ingest, e.g. those of the last one
+        """
+        self.state = REFRESH_STATE_RUNNING
+        self.started_at = time.monotonic()
+        self.bytes_downloaded = 0
+        self.bytes_total = None
+        self.rows_ingested = 0
+        self.rows_expected = rows_expected or None
+
+    @property
+    def fraction(self) -> Optional[float]:
+        """
+        Share of the refresh done, by bytes if the download size is known, by rows otherwise.
+        :return: fraction between 0 and 1, None if unknown
+        """
+        if self.bytes_total:
+            return min(1.0, self.bytes_downloaded / self.bytes_total)
+        if self.rows_expected:
+            return min(1.0, self.rows_ingested / self.rows_expected)
+        return None
+
+    @property
+    def eta(self) -> Optional[float]:
+        """
+        Estimated seconds until the running refresh is done, extrapolated from its progress so far.
+        :return: seconds, None if not running or unknown
+        """
+        fraction = self.fraction
+        if self.state != REFRESH_STATE_RUNNING or not fraction:
+            return None
+        elapsed = time.monotonic() - self.started_at
+        return max(0.0, elapsed * (1 - fraction) / fraction)
+
+    @property
+    def last_ingest_rate(self) -> Optional[float]:
+        """
+        :return: rows per second of the last ingest, None if none finished yet
+        """
+        if not self.last_ingest_seconds:
+            return None
+        return self.last_ingest_rows / self.last_ingest_seconds
+
+    def as_dict(self) -> Dict[str, Any]:
+        """
+        :return: progress as dictionary
+        """
+        fraction = self.fraction
+        eta = self.eta
+        rate = self.last_ingest_rate
+        return {
+            "state": self.state,
+            "bytes_downloaded": self.bytes_downloaded,
+            "bytes_total": self.bytes_total,
+            "rows_ingested": self.rows_ingested,
+            "rows_expected": self.rows_expected,
+            "progress": round(fraction * 100, 1) if fraction is not None else None,
+            "eta": round(eta) if eta is not None else None,
+            "last_ingest_seconds": round(self.last_ingest_seconds, 1) if self.last_ingest_seconds is not None else None,
+            "last_ingest_rows": self.last_ingest_rows,
+            "last_ingest_rows_per_second": round(rate) if rate is not None else None,
+        }
+
+
+class ResponseStream(io.RawIOBase):
+    """
+    Blocking file-like view of an aiohttp response body, to be read from a thread other than the event loop's.
+    Each read waits for the next chunk from the loop, so only the chunk in flight is held in memory.
+    The body is decompressed on the reading thread rather than by aiohttp, so offsets count transferred bytes and
+    a dropped connection is resumed with a Range request for the rest of the same representation.
+    """
+
+    def __init__(
+            self,
+            session: aiohttp.ClientSession,
+            response: aiohttp.ClientResponse,
+            loop: asyncio.AbstractEventLoop,
+            progress: Optional[RefreshProgress] = None,
+            max_resumes: int = MAX_RESUMES,
+    ):
+        """
+        :param session: session to send resume requests with, must not decompress responses itself
+        :param response: response to read the body of
+        :param loop: event loop the response is read on
+        :param progress: progress to count the bytes read in
+        :param max_resumes: maximum number of resume requests
+        """
+        super().__init__()
+        self._session = session
+        self._response = response
+        self._loop = loop
+        self._progress = progress
+        self._max_resumes = max_resumes
+        self._resumes = 0
+        self._received = 0
+        self.validators = DownloadValidators(
+            response.headers.get(hdrs.ETAG), response.headers.get(hdrs.LAST_MODIFIED), response.content_length
+        )
+        encoding = response.headers.get(hdrs.CONTENT_ENCODING, "identity").lower()
+        if encoding != "identity" and encoding not in DECOMPRESS_WBITS:
+            raise ValueError(f"Unsupported content encoding of systems JSON: {encoding}")
+        self._decompressor = zlib.decompressobj(DECOMPRESS_WBITS[encoding]) if encoding in DECOMPRESS_WBITS else None
+        self._decoded = b""
+        self._decoded_offset = 0
+        self._eof = False
+        self.wait_seconds = 0.0  # the reading thread spent waiting for the network
+
+    @property
+    def length(self) -> Optional[int]:
+        """
+        Number of bytes transferred for the whole body, None if unknown.
+        """
+        return self.validators.content_length
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while self._decoded_offset >= len(self._decoded):
+            if self._eof:
+                return 0
+            started = time.perf_counter()
+            raw = asyncio.run_coroutine_threadsafe(self._read_raw(DOWNLOAD_BUFFER_SIZE), self._loop).result()
+            self.wait_seconds += time.perf_counter() - started
+            if not raw:
+                self._eof = True
+                raw = self._decompressor.flush() if self._decompressor is not None else b""
+            elif self._decompressor is not None:
+                raw = self._decompressor.decompress(raw)
+            self._decoded = raw
+            self._decoded_offset = 0
+        size = min(len(buffer), len(self._decoded) - self._decoded_offset)
+        buffer[:size] = self._decoded[self._decoded_offset:self._decoded_offset + size]
+        self._decoded_offset += size
+        return size
+
+    async def _read_raw(self, size: int) -> bytes:
+        """
+        Reads the next transferred bytes, resuming the download if the connection dropped.
+        """
+        while True:
+            try:
+                data = await self._response.content.read(size)
+            except (aiohttp.ClientPayloadError, aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                error = e
+            else:
+                if data or self.length is None or self._received >= self.length:
+                    self._received += len(data)
+                    if self._progress is not None:
+                        self._progress.bytes_downloaded += len(data)
+                    return data
+                error = EOFError(f"connection closed after {self._received} of {self.length} bytes")
+            if self._resumes >= self._max_resumes:
+                raise error
+            self._resumes += 1
+            _LOGGER.warning(f"Systems JSON download interrupted ({error}), resuming at byte {self._received}...")
+            await self._resume()
+
+    async def _resume(self) -> None:
+        self._response.release()
+        headers = {
+            hdrs.ACCEPT_ENCODING: ACCEPT_ENCODING,
+            hdrs.RANGE: f"bytes={self._received}-",
+        }
+        # the server sends the whole, possibly changed, body instead of the rest if the validator does not match
+        validator = self.validators.etag or self.validators.last_modified
+        if validator:
+            headers[hdrs.IF_RANGE] = validator
+        await asyncio.sleep(RESUME_DELAY * self._resumes)
+        response = await self._session.get(self._response.url, headers=headers)
+        if response.status != 206:
+            response.release()
+            raise aiohttp.ClientPayloadError(f"Cannot resume systems JSON download, server responded {response.status}")
+        self._response = response
+
+    def release(self) -> None:
+        """
+        Releases the connection of the current response. Has to be called on the event loop.
+        """
+        self._response.release()
+
+
+class SystemDataService:
+    """
+    Owns the system database of a Home Assistant instance, shared by the clients of all config entries.
+    Refreshes are single-flight: a refresh requested while another one is running joins it instead of downloading
+    and ingesting the dump once more, only a reset is queued to run after it. Their progress is announced with
+    SIGNAL_SYSTEM_DATA_PROGRESS.
+    """
+
+    def __init__(self, hass: HomeAssistant):
+        self._hass = hass
+        self.db = Database(_LOGGER)
+        # decompressed by ResponseStream, so interrupted downloads can be resumed at a byte offset
+        # closed by Home Assistant on shutdown
+        self._session = async_create_clientsession(hass, auto_decompress=False, timeout=HTTP_DOWNLOAD_TIMEOUT)
+        self._eddn: Optional[EDDNSubscriber] = None
+        self._refresh: Optional[asyncio.Task] = None
+        self._refresh_is_reset = False
+        self._queued_reset: Optional[asyncio.Task] = None
+        self._refresh_lock = asyncio.Lock()
+        self.progress = RefreshProgress()
+        self.routes = RoutePlanner(self.db)
+        self.users = 0
+
+    async def is_expired(self, refresh_interval: int) -> bool:
+        """
+        Check in accordance to user settings and last refresh if the systems database needs to be refreshed from EDDB.
+        :param refresh_interval: hours after which the data expires
+        :return: Boolean if data is expired
+        :rtype: bool
+        """
+        last_download_time = await self.db.get_last_refreshed_datetime()
+        if last_download_time is None:
+            return True
+        time_delta = datetime.datetime.now() - last_download_time
+        return not int(time_delta.total_seconds() / 60 / 60) < refresh_interval
+
+    async def async_refresh(self, refresh_interval: int, incremental: bool = True, reset: bool = False) -> None:
+        """
+        Redownloads system data and refreshes database if needed, or waits for the refresh already running.
+        A reset requested while a refresh which is not a reset is running waits for it and runs afterwards.
+        :param refresh_interval: hours after which the data expires
+        :param incremental: only write new or changed systems instead of rebuilding the systems table
+        :param reset: force full rebuild, ignoring the refresh interval
+        """
+        # checking and starting under a lock, so callers arriving together can't both find the data expired
+        async with self._refresh_lock:
+            if self._refresh is None:
+                if not reset and not await self.is_expired(refresh_interval):
+                    _LOGGER.debug("Skipping refresh of non-expired systems JSON.")
+                    return
+                _LOGGER.debug("System data expired, redownload needed.")
+                self._refresh = asyncio.ensure_future(self._async_refresh_tracked(incremental and not reset, not reset))
+                self._refresh.add_done_callback(self._refresh_done)
+                self._refresh_is_reset = reset
+                refresh = self._refresh
+            elif reset and not self._refresh_is_reset:
+                _LOGGER.debug("Queueing reset of system data after the running refresh.")
+                if self._queued_reset is None:
+                    self._queued_reset = asyncio.ensure_future(self._async_reset_after(self._refresh, refresh_interval))
+                refresh = self._queued_reset
+            else:
+                _LOGGER.debug("Joining running refresh of system data.")
+                refresh = self._refresh
+        # shielded so a caller timing out does not abort the refresh others wait for
+        await asyncio.shield(refresh)
+
+    def _refresh_done(self, _task: asyncio.Task) -> None:
+        self._refresh = None
+
+    async def _async_reset_after(self, running: asyncio.Task, refresh_interval: int) -> None:
+        """
+        Waits for a running refresh, whatever its outcome, and then resets the system data.
+        :param running: refresh to wait for
+        :param refresh_interval: hours after which the data expires
+        """
+        await asyncio.wait([running])
+        self._queued_reset = None
+        await self.async_refresh(refresh_interval, reset=True)
+
+    async def _async_refresh_tracked(self, incremental: bool, conditional: bool) -> None:
+        """
+        Runs a refresh, announcing its progress periodically while it runs.
+        :param incremental: only write new or changed systems
+        :param conditional: skip the refresh if the dump did not change since the last one
+        """
+        self.progress.start(await self.db.get_system_count())
+        self._announce_progress()
+        unsub = async_track_time_interval(self._hass, self._announce_progress, PROGRESS_INTERVAL)
+        try:
+            await self._async_refresh(incremental, conditional)
+        except BaseException:
+            self.progress.state = REFRESH_STATE_FAILED
+            raise
+        else:
+            self.progress.state = REFRESH_STATE_IDLE
+        finally:
+            unsub()
+            self._announce_progress()
+
+    def _announce_progress(self, _now=None) -> None:
+        async_dispatcher_send(self._hass, SIGNAL_SYSTEM_DATA_PROGRESS)
+
+    def _count_rows(self, rows: Iterable[SystemRow]) -> Iterator[SystemRow]:
+        for row in rows:
+            self.progress.rows_ingested += 1
+            yield row
+
+    async def _async_refresh(self, incremental: bool, conditional: bool = True) -> None:
+        """
+        Unless disabled, only new or changed systems are written, otherwise the systems table is rebuilt and
+        swapped in once complete. Lookups keep seeing the previous data until then, and a failed refresh leaves
+        it untouched.
+        The dump is decompressed and parsed while it is being downloaded and written to the database in chunks,
+        so neither the raw file nor the full list of systems is ever held at once.
+        :param incremental: only write new or changed systems
+        :param conditional: send the validators of the last download, skipping the ingest if the dump did not change
+        """
+        validators = await self.db.get_download_validators()
+        headers = {hdrs.ACCEPT_ENCODING: ACCEPT_ENCODING}
+        if conditional and validators.etag:
+            headers[hdrs.IF_NONE_MATCH] = validators.etag
+        if conditional and validators.last_modified:
+            headers[hdrs.IF_MODIFIED_SINCE] = validators.last_modified
+        telemetry = self.db.telemetry
+        started = time.perf_counter()
+        try:
+            with telemetry.span("ingest.request"):
+                response = await self._session.get(URL_EDDB_POP_SYSTEMS_JSON, headers=headers)
+            async with response:
+                if response.status == 304:
+                    _LOGGER.info("Systems JSON did not change since the last refresh, skipping ingest.")
+                    await self.db.set_last_refreshed_datetime(datetime.datetime.now())
+                    return
+                response.raise_for_status()
+                raw = ResponseStream(self._session, response, asyncio.get_running_loop(), self.progress)
+                self.progress.bytes_total = raw.length or validators.content_length
+                try:
+                    # the database writer thread decompresses and parses the stream
+                    stream = io.BufferedReader(raw, DOWNLOAD_BUFFER_SIZE)
+                    rows = self._count_rows(iter_system_rows(stream))
+                    _LOGGER.debug("Streaming systems JSON into database...")
+                    if incremental:
+                        result = await self.db.update_systems(rows)
+                    else:
+                        result = await self.db.add_systems(rows)
+                finally:
+                    raw.release()
+                    telemetry.record("ingest.download_wait", raw.wait_seconds)
+        except sqlite3.Error as e:
+            if not incremental:
+                _LOGGER.error("Error while rebuilding systems table, keeping previous data.", exc_info=e)
+                return
+            _LOGGER.warning("Error while updating systems table, trying to rebuild it.", exc_info=e)
+            self.progress.start(self.progress.rows_expected)
+            await self._async_refresh(False, False)
+            return
+        if incremental:
+            _LOGGER.info(
+                "Refreshed systems: %i inserted, %i updated, %i unchanged, %i removed.",
+                result.inserted, result.updated, result.unchanged, result.removed,
+            )
+        else:
+            _LOGGER.info("Refreshed systems: %i written.", result)
+        self.progress.last_ingest_seconds = time.perf_counter() - started
+        self.progress.last_ingest_rows = self.progress.rows_ingested
+        telemetry.record("ingest.total", self.progress.last_ingest_seconds)
+        await self.db.set_download_validators(raw.validators)
+        _LOGGER.debug("Updating last_download...")
+        await self.db.set_last_refreshed_datetime(datetime.datetime.now())
+
+    def start_live_updates(self) -> None:
+        """
+        Starts applying system updates from EDDN to the database, once for all config entries.
+        """
+        if self._eddn is None:
+            self._eddn = EDDNSubscriber(self.db)
+            self._eddn.start()
+
+    async def async_close(self) -> None:
+        """
+        Stops live updates and running refreshes and closes the database.
+        """
+        if self._eddn is not None:
+            await self._eddn.stop()
+        if self._queued_reset is not None:
+            self._queued_reset.cancel()
+        if self._refresh is not None:
+            self._refresh.cancel()
+        await self._hass.async_add_executor_job(self.db.close)
+
+
+def async_get_system_data(hass: HomeAssistant) -> SystemDataService:
+    """
+    Gets the shared system data service, creating it for the first user. Release it with async_release_system_data.
+    :param hass: Home Assistant instance
+    :return: shared service
+    """
+    service = hass.data.get(DATA_SYSTEM_DATA)
+    if service is None:
+        service = hass.data[DATA_SYSTEM_DATA] = SystemDataService(hass)
+    service.users += 1
+    return service
+
+
+async def async_release_system_data(hass: HomeAssistant) -> None:
+    """
+    Releases the shared system data service, closing it once the last user released it.
+    :param hass: Home Assistant instance
+    """
+    service: SystemDataService = hass.data[DATA_SYSTEM_DATA]
+    service.users -= 1
+    if service.users == 0:
+        hass.data.pop(DATA_SYSTEM_DATA)
+        await service.async_close()
@@ -0,0 +1,145 @@
+"""Records durations, counts and errors of the integration's hot paths"""
+from collections import deque
+from contextlib import contextmanager
+import math
+import threading
+import time
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+WINDOW_SIZE = 256  # recent durations percentiles are computed from
+
+
+def percentile(ordered: List[float], percent: float) -> float:
+    """
+    Gets a percentile by nearest rank.
+    :param ordered: sorted, non-empty values
+    :param percent: percentile between 0 and 100
+    :return: smallest value at least percent of all values are less or equal to
+    """
+    return ordered[max(0, math.ceil(percent / 100 * len(ordered)) - 1)]
+
+
+class SpanStats:
+    """
+    Durations and outcomes of one kind of operation, e.g. requests to an API or a database query.
+    Counters cover all operations, percentiles only the most recent ones.
+    """
+
+    def __init__(self, name: str, window_size: int = WINDOW_SIZE):
+        """
+        :param name: name of the operation
+        :param window_size: number of recent durations kept for percentiles
+        """
+        self.name = name
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.last: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._recent: Deque[float] = deque(maxlen=window_size)
+
+    def record(self, duration: float, error: Optional[BaseException] = None) -> None:
+        """
+        :param duration: seconds the operation took
+        :param error: exception the operation failed with, None if it succeeded
+        """
+        self.count += 1
+        self.total += duration
+        self.last = duration
+        self._recent.append(duration)
+        if error is not None:
+            self.errors += 1
+            self.last_error = type(error).__name__
+
+    @property
+    def error_rate(self) -> float:
+        """
+        :return: share of failed operations, 0 if none were recorded
+        """
+        return self.errors / self.count if self.count else 0.0
+
+    def percentile(self, percent: float) -> Optional[float]:
+        """
+        Gets a percentile of the recent durations by nearest rank.
+        :param percent: percentile between 0 and 100
+        :return: seconds, None if nothing was recorded
+        """
+        if not self._recent:
+            return None
+        return percentile(sorted(self._recent), percent)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """
+        :return: counters and durations in milliseconds as dictionary
+        """
+
+        def ms(seconds: Optional[float]) -> Optional[float]:
+            return round(seconds * 1000, 3) if seconds is not None else None
+
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "error_rate": round(self.error_rate, 3),
+            "last_error": self.last_error,
+            "last_ms": ms(self.last),
+            "mean_ms": ms(self.total / self.count if self.count else None),
+            "p50_ms": ms(self.percentile(50)),
+            "p95_ms": ms(self.percentile(95)),
+            "p99_ms": ms(self.percentile(99)),
+        }
+
+
+class Telemetry:
+    """
+    Named spans of a component. Spans are recorded from the event loop as well as the database threads.
+    """
+
+    def __init__(self, window_size: int = WINDOW_SIZE):
+        """
+        :param window_size: number of recent durations kept per span for percentiles
+        """
+        self._window_size = window_size
+        self._spans: Dict[str, SpanStats] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, duration: float, error: Optional[BaseException] = None) -> None:
+        """
+        Records a finished operation.
+        :param name: name of the span, e.g. api.edsm
+        :param duration: seconds the operation took
+        :param error: exception the operation failed with, None if it succeeded
+        """
+        with self._lock:
+            stats = self._spans.get(name)
+            if stats is None:
+                stats = self._spans[name] = SpanStats(name, self._window_size)
+            stats.record(duration, error)
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        """
+        Times the enclosed block, which may await, counting it as failed if it raises.
+        :param name: name of the span
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            self.record(name, time.perf_counter() - started, e)
+            raise
+        self.record(name, time.perf_counter() - started)
+
+    def get(self, name: str) -> Optional[SpanStats]:
+        """
+        :param name: name of the span
+        :return: stats of the span, None if it was never recorded
+        """
+        return self._spans.get(name)
+
+    def as_dict(self, prefix: str = "") -> Dict[str, Dict[str, Any]]:
+        """
+        :param prefix: only include spans starting with this, e.g. db.
+        :return: stats per span name
+        """
+        with self._lock:
+            return {name: stats.as_dict() for name, stats in sorted(self._spans.items()) if name.startswith(prefix)}
@@ -0,0 +1,155 @@
+"""Fixtures shared by the tests"""
+import asyncio
+import datetime
+import logging
+import random
+
+import pytest
+
+# values of a system as found in the EDDB dump, overridden per test
+SYSTEM_DEFAULTS = {
+    "edsm_id": 1,
+    "x": 0.0,
+    "y": 0.0,
+    "z": 0.0,
+    "population": 1000,
+    "is_populated": True,
+    "government_id": 64,
+    "government": "Corporate",
+    "allegiance_id": 3,
+    "allegiance": "Federation",
+    "security_id": 48,
+    "security": "High",
+    "primary_economy_id": 4,
+    "primary_economy": "Industrial",
+    "power": None,
+    "power_state": None,
+    "power_state_id": None,
+    "needs_permit": False,
+    "updated_at": 1,
+    "controlling_minor_faction_id": 1,
+    "controlling_minor_faction": "Test Faction",
+    "reserve_type_id": 1,
+    "reserve_type": "Common",
+}
+
+
+@pytest.fixture
+def db_filepath(tmp_path, monkeypatch):
+    """
+    Moves the database file into a temporary directory.
+    """
+    from custom_components.ed_integration import db
+
+    path = str(tmp_path / "database.db")
+    monkeypatch.setattr(db, "DB_FILEPATH", path)
+    return path
+
+
+@pytest.fixture
+def database(db_filepath):
+    """
+    Database in a temporary directory, closed after the test.
+    """
+    from custom_components.ed_integration.db import Database
+
+    database = Database(logging.getLogger("ed_integration_test"))
+    yield database
+    database.close()
+
+
+@pytest.fixture
+def system_row():
+    """
+    Factory of system rows as passed to Database.add_systems, taking the EDDB ID, name and the values to change.
+    """
+    from custom_components.ed_integration.db import SYSTEM_COLUMNS
+
+    def make(sid: int, name: str, **values) -> tuple:
+        row = {**SYSTEM_DEFAULTS, "id": sid, "name": name, **values}
+        return tuple(row[column] for column in SYSTEM_COLUMNS)
+
+    return make
+
+
+@pytest.fixture
+def galaxy(system_row):
+    """
+    Seeded random systems around Sol with varied attributes, as many share each value as queries need to tell
+    the in-memory and SQL paths apart.
+    """
+    rng = random.Random(24)
+    governments = [(64, "Corporate"), (96, "Democracy"), (128, "Dictatorship"), (144, "Feudal")]
+    allegiances = [(1, "Alliance"), (2, "Empire"), (3, "Federation"), (4, "Independent")]
+    securities = [(16, "Low"), (32, "Medium"), (48, "High")]
+    economies = [(1, "Agriculture"), (4, "Industrial"), (5, "High Tech"), (9, "Extraction")]
+    powers = [None, "Zachary Hudson", "Felicia Winters", "Aisling Duval"]
+    rows = []
+    for sid in range(1, 401):
+        power = rng.choice(powers)
+        power_state, power_state_id = rng.choice([("Control", 16), ("Exploited", 32)]) if power else (None, None)
+        government_id, government = rng.choice(governments)
+        allegiance_id, allegiance = rng.choice(allegiances)
+        security_id, security = rng.choice(securities)
+        economy_id, economy = rng.choice(economies)
+        rows.append(system_row(
+            sid,
+            f"System {sid}",
+            x=rng.uniform(-60, 60),
+            y=rng.uniform(-60, 60),
+            z=rng.uniform(-60, 60),
+            population=rng.choice([0, rng.randrange(1, 10 ** 10)]),
+            government_id=government_id,
+            government=government,
+            allegiance_id=allegiance_id,
+            allegiance=allegiance,
+            security_id=security_id,
+            security=security,
+            primary_economy_id=economy_id,
+            primary_economy=economy,
+            power=power,
+            power_state=power_state,
+            power_state_id=power_state_id,
+            needs_permit=rng.random() < 0.2,
+        ))
+    return rows
+
+
+@pytest.fixture
+def query_paths(db_filepath, galaxy, monkeypatch):
+    """
+    Runs queries over the galaxy once without numpy, so they are answered by SQL, and once more with the coordinate
+    snapshot and the in-memory system table.
+    The queries are a coroutine function taking the database, the results of both runs are returned.
+    """
+    from custom_components.ed_integration import engine, snapshot
+    from custom_components.ed_integration.db import Database
+
+    def run(queries):
+        async def add_and_query(database):
+            await database.add_systems(galaxy)
+            assert database._current_snapshot() is None and database._current_table() is None
+            return await queries(database)
+
+        async def query(database):
+            # queued behind building the table, so the queries don't fall back to SQL meanwhile
+            await database.set_last_refreshed_datetime(datetime.datetime.now())
+            assert database._current_snapshot() is not None and database._current_table() is not None
+            return await queries(database)
+
+        with monkeypatch.context() as without_numpy:
+            without_numpy.setattr(snapshot, "np", None)
+            without_numpy.setattr(engine, "np", None)
+            database = Database(logging.getLogger("ed_integration_test"))
+            try:
+                from_sql = asyncio.run(add_and_query(database))
+            finally:
+                database.close()
+        # the snapshot written without numpy is used as well
+        database = Database(logging.getLogger("ed_integration_test"))
+        try:
+            return from_sql, asyncio.run(query(database))
+        finally:
+            database.close()
+
+    return run
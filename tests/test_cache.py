@@ -0,0 +1,127 @@
+"""Tests of the response and lookup caches"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from custom_components.ed_integration import cache  # noqa: E402
+from custom_components.ed_integration.cache import LRUCache, TTLCache  # noqa: E402
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    # the cache module's time only, the event loop keeps the real clock
+    monkeypatch.setattr(cache, "time", SimpleNamespace(monotonic=clock))
+    return clock
+
+
+class Source:
+    """
+    Fetches increasing numbers, optionally waiting until released.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.release = None
+
+    async def fetch(self) -> int:
+        self.calls += 1
+        if self.release is not None:
+            await self.release.wait()
+        return self.calls
+
+
+def test_ttl_cache_serves_fresh_then_stale_while_revalidating(clock):
+    ttl_cache = TTLCache("test", ttl=30, stale_ttl=30)
+    source = Source()
+
+    async def run():
+        values = [await ttl_cache.get("key", source.fetch)]
+        clock.now += 10
+        values.append(await ttl_cache.get("key", source.fetch))
+        # stale: served at once, revalidated in the background
+        clock.now += 30
+        values.append(await ttl_cache.get("key", source.fetch))
+        await asyncio.sleep(0)
+        values.append(await ttl_cache.get("key", source.fetch))
+        # beyond the grace period the caller waits for the fetch
+        clock.now += 61
+        values.append(await ttl_cache.get("key", source.fetch))
+        return values
+
+    assert asyncio.run(run()) == [1, 1, 1, 2, 3]
+    assert source.calls == 3
+    assert ttl_cache.stats.as_dict() == {"hits": 2, "stale_hits": 1, "misses": 2, "errors": 0, "hit_rate": 0.6}
+
+
+def test_ttl_cache_shares_one_fetch_between_concurrent_callers(clock):
+    ttl_cache = TTLCache("test", ttl=30)
+    source = Source()
+
+    async def run():
+        source.release = asyncio.Event()
+        callers = [asyncio.ensure_future(ttl_cache.get("key", source.fetch)) for _ in range(5)]
+        # a caller giving up does not abort the fetch the others wait for
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(ttl_cache.get("key", source.fetch), 0.01)
+        source.release.set()
+        return await asyncio.gather(*callers), await ttl_cache.get("key", source.fetch)
+
+    values, cached = asyncio.run(run())
+    assert values == [1] * 5
+    assert cached == 1
+    assert source.calls == 1
+
+
+def test_ttl_cache_skips_errors_and_uncacheable_values(clock):
+    ttl_cache = TTLCache("test", ttl=30)
+    source = Source()
+
+    async def failing():
+        raise ConnectionError("unreachable")
+
+    async def run():
+        with pytest.raises(ConnectionError):
+            await ttl_cache.get("key", failing)
+        odd = [await ttl_cache.get("key", source.fetch, lambda value: value % 2 == 0) for _ in range(2)]
+        return odd, await ttl_cache.get("key", source.fetch)
+
+    assert asyncio.run(run()) == ([1, 2], 2)
+    assert (ttl_cache.stats.errors, source.calls) == (1, 2)
+
+
+def test_lru_cache_evicts_least_recently_used():
+    lru_cache = LRUCache("test", maxsize=2)
+    lru_cache.get("a", 1)
+    lru_cache.put("a", "A", 1)
+    lru_cache.put("b", "B", 1)
+    assert lru_cache.get("a", 1) == "A"
+    lru_cache.put("c", "C", 1)
+
+    assert [lru_cache.get(key, 1) for key in ("a", "b", "c")] == ["A", None, "C"]
+    assert lru_cache.evictions == 1
+
+
+def test_lru_cache_drops_entries_of_older_generations():
+    lru_cache = LRUCache("test", maxsize=10)
+    lru_cache.get("a", 1)
+    lru_cache.put("a", "A", 1)
+
+    assert lru_cache.get("a", 2) is None
+    assert len(lru_cache) == 0
+    # looked up before the data changed, so it must not be cached for the new generation
+    lru_cache.put("a", "A", 1)
+    assert lru_cache.get("a", 2) is None
+    lru_cache.put("a", "A2", 2)
+    assert lru_cache.get("a", 2) == "A2"
@@ -0,0 +1,44 @@
+"""Tests of the update coordinator"""
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from custom_components.ed_integration import (  # noqa: E402
+    MIN_SCAN_INTERVAL,
+    SCAN_INTERVAL,
+    EDDataUpdateCoordinator,
+)
+from custom_components.ed_integration.const import KEY_OUTPUT_BALANCE_STR, KEY_OUTPUT_LOCATION_STR  # noqa: E402
+
+
+def _data(location: str, balance: str) -> dict:
+    return {KEY_OUTPUT_LOCATION_STR: location, KEY_OUTPUT_BALANCE_STR: balance, "power": "Zachary Hudson"}
+
+
+def test_update_interval_shrinks_on_activity_and_doubles_while_idle():
+    coordinator = SimpleNamespace(
+        update_interval=SCAN_INTERVAL, max_update_interval=timedelta(minutes=5), _last_activity=None
+    )
+    updates = [
+        _data("Sol", "1,000 Cr"),
+        _data("Sol", "1,000 Cr"),
+        _data("Sol", "1,000 Cr"),
+        _data("Sol", "1,000 Cr"),
+        _data("Sol", "1,000 Cr"),
+        _data("Alpha Centauri", "1,000 Cr"),
+        _data("Alpha Centauri", "1,000 Cr"),
+        _data("Alpha Centauri", "2,000 Cr"),
+    ]
+    intervals = []
+    for data in updates:
+        EDDataUpdateCoordinator._adapt_update_interval(coordinator, data)
+        intervals.append(coordinator.update_interval)
+
+    minutes = timedelta(minutes=1)
+    assert intervals == [
+        SCAN_INTERVAL, 2 * minutes, 4 * minutes, 5 * minutes, 5 * minutes,
+        MIN_SCAN_INTERVAL, 2 * MIN_SCAN_INTERVAL, MIN_SCAN_INTERVAL,
+    ]
@@ -0,0 +1,242 @@
+"""Tests of the system database"""
+import asyncio
+import datetime
+import logging
+import sqlite3
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from custom_components.ed_integration.db import (  # noqa: E402
+    SCHEMA_VERSION,
+    SYSTEM_COLUMNS,
+    Database,
+    DownloadValidators,
+    SystemsDelta,
+)
+
+# schema of the databases created before it was versioned
+BASELINE_SCHEMA = """
+create table SYSTEMS
+(
+    id integer not null constraint SYSTEMS_pk primary key,
+    edsm_id integer,
+    name text not null,
+    x real not null,
+    y real not null,
+    z real not null,
+    population integer not null,
+    is_populated integer,
+    government_id integer,
+    government text,
+    allegiance_id integer,
+    allegiance text,
+    security_id integer,
+    security text,
+    primary_economy_id integer,
+    primary_economy text,
+    power text,
+    power_state text,
+    power_state_id integer,
+    needs_permit integer not null,
+    updated_at integer,
+    controlling_minor_faction_id integer,
+    controlling_minor_faction text,
+    reserve_type_id integer,
+    reserve_type text
+);
+create unique index SYSTEMS_id_uindex on SYSTEMS (id);
+create unique index SYSTEMS_name_uindex on SYSTEMS (name);
+create table SYSTEMS_META
+(
+    id integer not null constraint META_pk primary key,
+    last_updated timestamp
+);
+create unique index SYSTEMS_META_id_uindex on SYSTEMS_META (id);
+insert into SYSTEMS_META (id, last_updated) values (1, '2020-10-01 12:00:00');
+"""
+
+
+def test_update_systems_skips_older_rows(database, system_row):
+    async def run():
+        await database.add_systems([
+            system_row(1, "Sol", population=10, updated_at=100),
+            system_row(2, "Alpha Centauri", population=20, updated_at=100),
+        ])
+        delta = await database.update_systems([
+            system_row(1, "Sol", population=11, updated_at=50),
+            system_row(2, "Alpha Centauri", population=21, updated_at=200),
+            system_row(3, "Barnard's Star", population=30, updated_at=100),
+        ])
+        return delta, [await database.get_system_by_id(sid) for sid in (1, 2, 3)]
+
+    delta, systems = asyncio.run(run())
+    assert delta == SystemsDelta(inserted=1, updated=1, unchanged=1, removed=0)
+    assert [system.population for system in systems] == [10, 21, 30]
+    assert [system.updated_at for system in systems] == [100, 200, 100]
+
+
+def test_update_systems_writes_rows_without_updated_at(database, system_row):
+    async def run():
+        await database.add_systems([
+            system_row(1, "Sol", population=10, updated_at=100),
+            system_row(2, "Alpha Centauri", population=20, updated_at=None),
+        ])
+        delta = await database.update_systems([
+            system_row(1, "Sol", population=11, updated_at=None),
+            system_row(2, "Alpha Centauri", population=21, updated_at=100),
+        ])
+        return delta, [await database.get_system_by_id(sid) for sid in (1, 2)]
+
+    delta, systems = asyncio.run(run())
+    assert delta == SystemsDelta(inserted=0, updated=2, unchanged=0, removed=0)
+    assert [(system.population, system.updated_at) for system in systems] == [(11, None), (21, 100)]
+
+
+def _live_update(name: str, updated_at: int, **values) -> dict:
+    update = dict.fromkeys((
+        "population", "government", "allegiance", "security", "primary_economy", "power", "power_state",
+        "controlling_minor_faction",
+    ))
+    return {**update, "name": name, "updated_at": updated_at, "powerless": False, **values}
+
+
+@pytest.mark.parametrize("power_state", ["HomeSystem", "InPrepareRadius", None])
+def test_apply_system_updates_keeps_unknown_power_state(database, system_row, power_state):
+    async def run():
+        await database.add_systems([
+            system_row(1, "Sol", power="Zachary Hudson", power_state="Control", power_state_id=16, updated_at=100),
+        ])
+        updated = await database.apply_system_updates([
+            _live_update("Sol", 200, population=5, power="Zachary Hudson", power_state=power_state),
+        ])
+        return updated, await database.get_system_by_id(1)
+
+    updated, system = asyncio.run(run())
+    assert updated == 1
+    assert (system.population, system.updated_at) == (5, 200)
+    assert (system.power, system.power_state, system.power_state_id) == ("Zachary Hudson", "Control", 16)
+
+
+@pytest.mark.parametrize("update, power, power_state", [
+    # contested, the power is not reported
+    ({}, "Zachary Hudson", "Control"),
+    ({"power_state": "Exploited"}, "Zachary Hudson", "Exploited"),
+    # the state of the previous power is not kept for a new one
+    ({"power": "Felicia Winters", "power_state": "HomeSystem"}, "Felicia Winters", None),
+    ({"power": "Felicia Winters", "power_state": "Exploited"}, "Felicia Winters", "Exploited"),
+    ({"powerless": True}, None, None),
+])
+def test_apply_system_updates_changes_power_and_state_together(database, system_row, update, power, power_state):
+    async def run():
+        await database.add_systems([
+            system_row(1, "Sol", power="Zachary Hudson", power_state="Control", power_state_id=16, updated_at=100),
+            system_row(2, "Lave", power="Felicia Winters", power_state="Exploited", power_state_id=32, updated_at=100),
+        ])
+        await database.apply_system_updates([_live_update("Sol", 200, **update)])
+        return await database.get_system_by_id(1)
+
+    system = asyncio.run(run())
+    assert (system.power, system.power_state) == (power, power_state)
+
+
+def test_add_system_invalidates_cached_lookups(database, system_row):
+    async def run():
+        await database.add_systems([system_row(1, "Sol", population=10)])
+        before = await database.get_system_by_name("Sol"), await database.get_system_by_name("Alpha Centauri")
+        generation = await database.get_generation()
+        await database.add_system(*system_row(1, "Sol", population=11))
+        await database.add_system(*system_row(2, "Alpha Centauri", population=20))
+        after = await database.get_system_by_name("Sol"), await database.get_system_by_name("Alpha Centauri")
+        return before, after, await database.get_generation() - generation
+
+    (sol, missing), (sol_after, added), generations = asyncio.run(run())
+    assert (sol.population, missing.sid, missing.is_populated) == (10, -1, False)
+    assert (sol_after.population, added.sid, added.population) == (11, 2, 20)
+    assert generations == 2
+
+
+def test_statements_are_recorded_by_function_name(database):
+    async def run():
+        await database.get_system_count()
+        await database.set_last_refreshed_datetime(datetime.datetime(2020, 10, 1, 12))
+        await database.get_last_refreshed_datetime()
+        await database.set_download_validators(DownloadValidators('"v1"', None, 10))
+        return await database.get_download_validators()
+
+    assert asyncio.run(run()) == DownloadValidators('"v1"', None, 10)
+    spans = database.telemetry.as_dict("db.")
+    assert {
+        "db.select_system_count", "db.update_last_refreshed_datetime", "db.select_last_refreshed_datetime",
+        "db.update_download_validators", "db.select_download_validators",
+    } <= spans.keys()
+    assert not [name for name in spans if "<" in name]
+
+
+def test_failed_ingest_keeps_previous_systems(database, system_row):
+    def interrupted():
+        for sid in range(1, 1001):
+            if sid == 700:
+                raise ConnectionError("download interrupted")
+            yield system_row(sid, f"New {sid}")
+
+    async def run():
+        await database.add_systems([system_row(1, "Sol", population=10), system_row(2, "Alpha Centauri")])
+        generation = await database.get_generation()
+        with pytest.raises(ConnectionError):
+            await database.add_systems(interrupted(), chunk_size=100)
+        return (
+            generation,
+            await database.get_generation(),
+            await database.get_system_count(),
+            await database.get_system_by_id(1),
+            await database.get_systems_within_radius(0, 0, 0, 10),
+            # the staging table of the failed ingest is gone, so the next one starts afresh
+            await database.add_systems([system_row(3, "Barnard's Star")]),
+            await database.get_generation(),
+        )
+
+    generation, generation_after, count, sol, nearby, written, generation_retried = asyncio.run(run())
+    assert generation_after == generation
+    assert count == 2
+    assert (sol.name, sol.population) == ("Sol", 10)
+    assert sorted(system.name for system, _ in nearby) == ["Alpha Centauri", "Sol"]
+    assert (written, generation_retried) == (1, generation + 1)
+
+
+def test_baseline_database_is_migrated(db_filepath, system_row):
+    conn = sqlite3.connect(db_filepath)
+    conn.executescript(BASELINE_SCHEMA)
+    conn.executemany(f"INSERT INTO SYSTEMS VALUES ({', '.join('?' * len(SYSTEM_COLUMNS))})", [
+        system_row(1, "Sol", population=10, power="Zachary Hudson", power_state="Control", power_state_id=16),
+        system_row(2, "Alpha Centauri", x=3.0, population=20),
+    ])
+    conn.commit()
+    conn.close()
+
+    database = Database(logging.getLogger("ed_integration_test"))
+
+    async def run():
+        return (
+            await database.get_system_count(),
+            await database.get_system_by_id(1),
+            await database.get_nearest_systems(3.0, 0.0, 0.0),
+            await database.get_last_refreshed_datetime(),
+            await database.get_generation(),
+        )
+
+    try:
+        count, sol, nearest, last_refreshed, generation = asyncio.run(run())
+    finally:
+        database.close()
+    conn = sqlite3.connect(db_filepath)
+    schema_version = conn.execute("PRAGMA user_version").fetchone()[0]
+    conn.close()
+    assert schema_version == SCHEMA_VERSION
+    assert count == 2
+    assert (sol.population, sol.government) == (10, "Corporate")
+    assert (sol.power, sol.power_state) == ("Zachary Hudson", "Control")
+    assert [system.name for system, _ in nearest] == ["Alpha Centauri"]
+    assert last_refreshed == datetime.datetime(2020, 10, 1, 12)
+    assert generation == 0
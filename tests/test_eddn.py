@@ -0,0 +1,146 @@
+"""Tests of the live system updates from EDDN"""
+import asyncio
+import json
+import logging
+import sys
+import zlib
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from custom_components.ed_integration import eddn  # noqa: E402
+from custom_components.ed_integration.eddn import EDDN_JOURNAL_SCHEMA, EDDNSubscriber, parse_message  # noqa: E402
+
+TIMEOUT = 10  # s
+
+
+def _message(system: str, timestamp: str, **values) -> bytes:
+    message = {"event": "FSDJump", "StarSystem": system, "timestamp": timestamp, **values}
+    return zlib.compress(json.dumps({"$schemaRef": EDDN_JOURNAL_SCHEMA, "message": message}).encode())
+
+
+def test_parse_message():
+    update = parse_message(_message(
+        "Sol",
+        "2020-10-01T12:00:00Z",
+        Population=22780919531,
+        SystemGovernment="$government_Democracy;",
+        SystemAllegiance="Federation",
+        SystemSecurity="$SYSTEM_SECURITY_high;",
+        SystemEconomy="$economy_HighTech;",
+        Powers=["Zachary Hudson"],
+        PowerplayState="Controlled",
+        SystemFaction={"Name": "Mother Gaia"},
+    ))
+    assert update == {
+        "name": "Sol",
+        "updated_at": 1601553600,
+        "population": 22780919531,
+        "government": "Democracy",
+        "allegiance": "Federation",
+        "security": "High",
+        "primary_economy": "High Tech",
+        "power": "Zachary Hudson",
+        "power_state": "Control",
+        "powerless": False,
+        "controlling_minor_faction": "Mother Gaia",
+    }
+    contested = parse_message(_message("Sol", "2020-10-01T12:00:00Z", Powers=["A", "B"]))
+    assert (contested["power"], contested["powerless"]) == (None, False)
+    powerless = parse_message(_message("Sol", "2020-10-01T12:00:00Z"))
+    assert (powerless["power"], powerless["power_state"], powerless["powerless"]) == (None, None, True)
+    assert parse_message(b"not compressed") is None
+    assert parse_message(zlib.compress(json.dumps({"$schemaRef": "other", "message": {}}).encode())) is None
+
+
+async def _wait_for(condition, publish=None):
+    """
+    Waits until a condition is met, publishing a message meanwhile since subscribers miss messages sent before
+    they connected.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + TIMEOUT
+    while not condition():
+        assert loop.time() < deadline, "timed out"
+        if publish is not None:
+            publish()
+        await asyncio.sleep(0.05)
+
+
+def test_subscriber_is_disabled_without_pyzmq(database, monkeypatch, caplog):
+    # a None entry makes the import fail
+    monkeypatch.setitem(sys.modules, "zmq", None)
+    monkeypatch.setitem(sys.modules, "zmq.asyncio", None)
+
+    async def run():
+        subscriber = EDDNSubscriber(database)
+        started = subscriber.start()
+        await subscriber.stop()
+        return started, subscriber._task
+
+    with caplog.at_level(logging.ERROR, logger=eddn.__name__):
+        assert asyncio.run(run()) == (False, None)
+    assert "pyzmq" in caplog.text
+
+
+def test_subscriber_batches_and_applies_updates(database, system_row, monkeypatch):
+    zmq = pytest.importorskip("zmq")
+    monkeypatch.setattr(eddn, "RECONNECT_DELAY", 0)
+    context = zmq.Context()
+    publisher = context.socket(zmq.PUB)
+    publisher.setsockopt(zmq.LINGER, 0)
+    port = publisher.bind_to_random_port("tcp://127.0.0.1")
+
+    batches = []
+    apply_system_updates = database.apply_system_updates
+
+    async def record_batch(updates):
+        updates = list(updates)
+        batches.append(updates)
+        if len(batches) == 2:
+            raise RuntimeError("database closed")
+        return await apply_system_updates(updates)
+
+    monkeypatch.setattr(database, "apply_system_updates", record_batch)
+
+    def publish_unknown():
+        publisher.send(_message("Nowhere", "2020-10-01T12:00:00Z"))
+
+    async def run():
+        await database.add_systems([
+            system_row(1, "Sol", population=10, updated_at=100),
+            system_row(2, "Alpha Centauri", population=20, updated_at=100),
+        ])
+        subscriber = EDDNSubscriber(database, f"tcp://127.0.0.1:{port}", batch_size=100, batch_interval=0.5)
+        subscriber.start()
+        try:
+            # an unknown system until the subscriber is connected and wrote it
+            await _wait_for(lambda: batches, publish_unknown)
+            assert batches[0][0]["name"] == "Nowhere"
+
+            # the second batch fails, the subscriber drops it and reconnects
+            await _wait_for(lambda: len(batches) >= 2, publish_unknown)
+            await _wait_for(lambda: len(batches) >= 3, publish_unknown)
+
+            await _wait_for(lambda: not subscriber._pending)
+            batches.clear()
+            applied = subscriber.applied
+            publisher.send(_message("Sol", "2020-10-01T12:01:00Z", Population=12))
+            publisher.send(_message("Sol", "2020-10-01T12:00:00Z", Population=11))
+            publisher.send(_message("Alpha Centauri", "2020-10-01T12:00:00Z", Population=21))
+            await _wait_for(lambda: subscriber.applied >= applied + 2)
+        finally:
+            await subscriber.stop()
+        return [await database.get_system_by_id(sid) for sid in (1, 2)]
+
+    try:
+        systems = asyncio.run(run())
+    finally:
+        publisher.close()
+        context.term()
+    # one batch, the later update of Sol replaced the earlier one
+    assert [[(update["name"], update["population"]) for update in batch] for batch in batches] == [
+        [("Sol", 12), ("Alpha Centauri", 21)],
+    ]
+    assert [system.population for system in systems] == [12, 21]
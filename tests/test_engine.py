@@ -0,0 +1,48 @@
+"""Tests of the filtered and aggregate queries served from the in-memory system table"""
+import pytest
+
+pytest.importorskip("homeassistant")
+pytest.importorskip("numpy")
+
+from custom_components.ed_integration.db import ATTRIBUTE_COLUMNS, SystemFilter  # noqa: E402
+
+CENTERS = [(0.0, 0.0, 0.0), (12.3, -4.5, 20.1)]
+FILTERS = [
+    SystemFilter(),
+    # names are matched case-insensitively
+    SystemFilter(economy="industrial", security="High"),
+    SystemFilter(allegiance="Federation", government="Democracy", needs_permit=False),
+    SystemFilter(power="Zachary Hudson", power_state="control"),
+    SystemFilter(min_population=1, max_population=5 * 10 ** 9),
+    SystemFilter(power="Unknown Power"),
+]
+
+
+def _rows(systems):
+    return [(system.sid, system.name, system.population, distance) for system, distance in systems]
+
+
+def test_filtered_queries_match_sql(query_paths):
+    async def queries(database):
+        results = []
+        for x, y, z in CENTERS:
+            (nearest, _), = await database.get_nearest_systems(x, y, z)
+            for filters in FILTERS:
+                pages = []
+                async for page in database.iter_search_systems(
+                        x, y, z, 50.0, filters, page_size=7, exclude_sid=nearest.sid
+                ):
+                    pages.append(_rows(page.systems))
+                results += [
+                    pages,
+                    _rows(await database.get_top_systems(x, y, z, 40.0, 10, filters)),
+                    _rows(await database.get_top_systems(x, y, z, 40.0, 500, filters, exclude_sid=nearest.sid)),
+                ]
+                for group_by in ATTRIBUTE_COLUMNS:
+                    results.append(await database.count_systems(x, y, z, 35.0, group_by, filters, nearest.sid))
+        return results
+
+    from_sql, from_table = query_paths(queries)
+    assert any(len(pages) > 3 for pages in from_sql)
+    # the table computes distances like SQL, so they are equal to the last bit
+    assert from_table == from_sql
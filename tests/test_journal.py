@@ -0,0 +1,107 @@
+"""Tests of reading the game journal"""
+import json
+import sys
+import threading
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from custom_components.ed_integration.journal import JournalTailer  # noqa: E402
+
+FIRST_JOURNAL = "Journal.2020-10-01T120000.01.log"
+SECOND_PART = "Journal.2020-10-01T120000.02.log"
+NEXT_SESSION = "Journal.2020-10-01T180000.01.log"
+LEGACY_JOURNAL = "Journal.200930120000.01.log"
+
+
+def _lines(*events: dict) -> str:
+    return "".join(json.dumps({"timestamp": "2020-10-01T12:00:00Z", **event}) + "\n" for event in events)
+
+
+def _append(directory, filename: str, text: str) -> None:
+    with open(directory / filename, "a") as journal:
+        journal.write(text)
+
+
+def test_poll_reads_load_game_and_jumps(tmp_path):
+    _append(tmp_path, LEGACY_JOURNAL, _lines({"event": "LoadGame", "Commander": "Old", "Credits": 1}))
+    _append(tmp_path, FIRST_JOURNAL, _lines(
+        {"event": "Fileheader", "part": 1},
+        {"event": "LoadGame", "Commander": "Jameson", "Credits": 1000, "Loan": 0},
+        {"event": "Location", "StarSystem": "Sol", "SystemAddress": 10477373803, "StarPos": [0.0, 0.0, 0.0]},
+    ))
+    tailer = JournalTailer(str(tmp_path))
+
+    assert tailer.poll()
+    assert (tailer.state.cmdr_name, tailer.state.credits, tailer.state.system_name) == ("Jameson", 1000, "Sol")
+    assert not tailer.poll()
+
+    # the second line is still being written
+    _append(tmp_path, FIRST_JOURNAL, _lines({"event": "FSDJump", "StarSystem": "Alpha Centauri"}) + '{"event": "FSD')
+    assert tailer.poll()
+    assert tailer.state.system_name == "Alpha Centauri"
+
+    _append(tmp_path, FIRST_JOURNAL, 'Jump", "StarSystem": "Barnard\'s Star"}\n{"event": "Music"}\n')
+    assert tailer.poll()
+    assert tailer.state.system_name == "Barnard's Star"
+
+
+def test_poll_follows_rotation_through_all_newer_files(tmp_path):
+    _append(tmp_path, FIRST_JOURNAL, _lines(
+        {"event": "LoadGame", "Commander": "Jameson", "Credits": 1000},
+        {"event": "Location", "StarSystem": "Sol"},
+    ))
+    tailer = JournalTailer(str(tmp_path))
+    tailer.poll()
+
+    # written to the old file right before the game switched, then two files started between polls
+    _append(tmp_path, FIRST_JOURNAL, _lines({"event": "FSDJump", "StarSystem": "Alpha Centauri"}))
+    _append(tmp_path, SECOND_PART, _lines(
+        {"event": "Fileheader", "part": 2},
+        {"event": "LoadGame", "Commander": "Jameson", "Credits": 2000},
+    ))
+    _append(tmp_path, NEXT_SESSION, _lines(
+        {"event": "Fileheader", "part": 1},
+        {"event": "FSDJump", "StarSystem": "Barnard's Star", "StarPos": [-3.03, 1.38, 4.94]},
+    ))
+    seen = []
+    apply = tailer.state.apply
+    tailer.state.apply = lambda event: seen.append(event.get("StarSystem")) or apply(event)
+
+    assert tailer.poll()
+    assert [system for system in seen if system] == ["Alpha Centauri", "Barnard's Star"]
+    assert tailer.state.credits == 2000
+    assert tailer.state.system_name == "Barnard's Star"
+    assert tailer.state.star_pos == [-3.03, 1.38, 4.94]
+    assert not tailer.poll()
+
+
+def test_concurrent_polls_apply_every_event_once(tmp_path):
+    _append(tmp_path, FIRST_JOURNAL, _lines({"event": "LoadGame", "Commander": "Jameson", "Credits": 0}))
+    tailer = JournalTailer(str(tmp_path))
+    tailer.poll()
+    jumps = []
+    apply = tailer.state.apply
+    tailer.state.apply = lambda event: jumps.append(event.get("StarSystem")) or apply(event)
+
+    def poll_repeatedly():
+        for _ in range(200):
+            tailer.poll()
+
+    pollers = [threading.Thread(target=poll_repeatedly) for _ in range(4)]
+    # switch threads as often as possible, so unserialized polls would interleave
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        for poller in pollers:
+            poller.start()
+        for number in range(500):
+            _append(tmp_path, FIRST_JOURNAL, _lines({"event": "FSDJump", "StarSystem": f"System {number}"}))
+        for poller in pollers:
+            poller.join()
+    finally:
+        sys.setswitchinterval(switch_interval)
+    tailer.poll()
+
+    assert jumps == [f"System {number}" for number in range(500)]
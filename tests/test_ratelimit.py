@@ -0,0 +1,145 @@
+"""Tests of the API rate limiting"""
+import asyncio
+import datetime
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from custom_components.ed_integration import ratelimit  # noqa: E402
+from custom_components.ed_integration.ratelimit import RateLimitedError, RateLimiter, parse_retry_after  # noqa: E402
+
+
+class Clock:
+    """
+    Monotonic clock of the rate limiter, advanced by its sleeps instead of waiting.
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ratelimit, "time", SimpleNamespace(monotonic=clock.monotonic))
+    monkeypatch.setattr(ratelimit, "asyncio", SimpleNamespace(Lock=asyncio.Lock, sleep=clock.sleep))
+    return clock
+
+
+def test_token_bucket_allows_bursts_then_paces_requests(clock):
+    limiter = RateLimiter("test", rate=0.5, burst=2)
+
+    async def run():
+        for _ in range(3):
+            await limiter.acquire()
+        clock.now += 10
+        for _ in range(2):
+            await limiter.acquire()
+
+    asyncio.run(run())
+    # the third request waits for a token, the refill after 10s is capped at the burst
+    assert clock.sleeps == [2.0]
+
+
+def test_token_bucket_refuses_waits_beyond_the_maximum(clock):
+    limiter = RateLimiter("test", rate=0.05, burst=1)
+
+    async def run():
+        await limiter.acquire()
+        with pytest.raises(RateLimitedError):
+            await limiter.acquire(max_wait=10)
+
+    asyncio.run(run())
+    assert clock.sleeps == []
+
+
+def test_quota_headers_limit_tokens_and_block_until_reset(clock):
+    limiter = RateLimiter("test", rate=1, burst=10)
+    limiter.update_from_headers({ratelimit.HEADER_LIMIT: "360", ratelimit.HEADER_REMAINING: "1"})
+    assert limiter.state["tokens"] == 1
+    limiter.update_from_headers({ratelimit.HEADER_REMAINING: "nan?"})
+    assert limiter.state["quota_remaining"] == 1
+
+    limiter.update_from_headers({ratelimit.HEADER_REMAINING: "0", ratelimit.HEADER_RESET: "60"})
+
+    async def acquire():
+        await limiter.acquire()
+
+    with pytest.raises(RateLimitedError):
+        asyncio.run(acquire())
+    clock.now += 60
+    asyncio.run(acquire())
+    assert limiter.state["quota_limit"] == 360
+
+
+def test_errors_back_off_exponentially_until_a_success(clock):
+    limiter = RateLimiter("test", rate=1, burst=10, backoff_base=30, backoff_max=100)
+    backoffs = []
+    for retry_after in (None, None, None, 300):
+        limiter.record_error(retry_after)
+        backoffs.append(limiter.state["backoff_remaining"])
+        clock.now += backoffs[-1]
+    limiter.record_success()
+    limiter.record_error()
+
+    # capped at the maximum, unless the API asks for longer
+    assert backoffs == [30, 60, 100, 300]
+    assert (limiter.state["backoff_remaining"], limiter.state["consecutive_errors"]) == (30, 1)
+
+
+def test_parse_retry_after():
+    now = datetime.datetime(2020, 10, 1, 12, 0, tzinfo=datetime.timezone.utc)
+    assert parse_retry_after("120", now) == 120
+    assert parse_retry_after("Thu, 01 Oct 2020 12:01:30 GMT", now) == 90
+    assert parse_retry_after("Thu, 01 Oct 2020 11:00:00 GMT", now) == 0
+    assert parse_retry_after("soon", now) is None
+    assert parse_retry_after(None, now) is None
+
+
+def test_client_backs_off_as_long_as_a_429_asks(monkeypatch):
+    from aiohttp import ClientResponseError, ClientSession, web
+    from aiohttp.test_utils import TestServer
+
+    from custom_components.ed_integration import client
+    from custom_components.ed_integration.client import API_EDSM, Client, Configuration
+    from custom_components.ed_integration.const import KEY_CACHE_TTL_POSITION
+
+    requests = []
+
+    async def throttled(request: web.Request) -> web.Response:
+        requests.append(request.path)
+        retry_at = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(hours=1)
+        return web.Response(status=429, headers={"Retry-After": retry_at.strftime("%a, %d %b %Y %H:%M:%S GMT")})
+
+    app = web.Application()
+    app.router.add_get("/api", throttled)
+    monkeypatch.setattr(client, "async_get_clientsession", lambda _hass: ClientSession())
+
+    async def run():
+        server = TestServer(app)
+        await server.start_server()
+        api = Client(None, Configuration("Jameson", "key", "key"), SimpleNamespace(db=None))
+        url = str(server.make_url("/api"))
+        try:
+            with pytest.raises(ClientResponseError):
+                await api._request_json(API_EDSM, KEY_CACHE_TTL_POSITION, "GET", url, lambda data: True)
+            with pytest.raises(RateLimitedError):
+                await api._request_json(API_EDSM, KEY_CACHE_TTL_POSITION, "GET", url, lambda data: True)
+            return api.rate_limit_state[API_EDSM]
+        finally:
+            await api._session.close()
+            await server.close()
+
+    state = asyncio.run(run())
+    assert requests == ["/api"]
+    assert 3500 < state["backoff_remaining"] <= 3600
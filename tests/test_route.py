@@ -0,0 +1,72 @@
+"""Tests of the route planning between systems"""
+from collections import deque
+import random
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from custom_components.ed_integration import route  # noqa: E402
+from custom_components.ed_integration.route import HEURISTIC_WEIGHT, RouteGraph  # noqa: E402
+
+
+def _fewest_jumps(graph: RouteGraph, source: int, destination: int):
+    """
+    Plain breadth-first search, the number of jumps of the shortest route or None.
+    """
+    jumps = {source: 0}
+    frontier = deque([source])
+    while frontier:
+        current = frontier.popleft()
+        if current == destination:
+            return jumps[current]
+        for neighbour, _ in graph.neighbours(current):
+            if neighbour not in jumps:
+                jumps[neighbour] = jumps[current] + 1
+                frontier.append(neighbour)
+    return None
+
+
+def _random_graph(seed: int, count: int = 300, extent: float = 100.0, jump_range: float = 12.0) -> RouteGraph:
+    rng = random.Random(seed)
+    positions = {
+        sid: (rng.uniform(0, extent), rng.uniform(0, extent / 4), rng.uniform(-extent, 0)) for sid in range(count)
+    }
+    return RouteGraph(positions, jump_range)
+
+
+@pytest.mark.parametrize("backward_search_min", [route.BACKWARD_SEARCH_MIN, 0])
+@pytest.mark.parametrize("seed", range(10))
+def test_plan_matches_breadth_first_search(seed, backward_search_min, monkeypatch):
+    # without the minimum, the search from the destination is dropped early
+    monkeypatch.setattr(route, "BACKWARD_SEARCH_MIN", backward_search_min)
+    graph = _random_graph(seed)
+    rng = random.Random(seed)
+    for _ in range(20):
+        source, destination = rng.sample(sorted(graph.positions), 2)
+        fewest = _fewest_jumps(graph, source, destination)
+        planned = graph.plan(source, destination)
+        if fewest is None:
+            assert planned is None
+            continue
+        assert planned is not None
+        assert (planned[0], planned[-1]) == (source, destination)
+        assert all(graph.distance(a, b) <= graph.jump_range for a, b in zip(planned, planned[1:]))
+        assert fewest <= len(planned) - 1 <= HEURISTIC_WEIGHT * fewest
+        assert len(graph.plan(source, destination, weight=1)) - 1 == fewest
+
+
+@pytest.mark.parametrize("backward_search_min", [route.BACKWARD_SEARCH_MIN, 0])
+def test_plan_without_route(backward_search_min, monkeypatch):
+    monkeypatch.setattr(route, "BACKWARD_SEARCH_MIN", backward_search_min)
+    # a chain of systems the source is part of and one far out of range of all of them
+    positions = {sid: (sid * 5.0, 0.0, 0.0) for sid in range(50)}
+    positions[50] = (100.0, 100.0, 0.0)
+    graph = RouteGraph(positions, 10.0)
+    assert graph.plan(0, 50) is None
+    assert graph.plan(50, 0) is None
+
+
+def test_plan_to_the_source():
+    graph = _random_graph(0)
+    assert graph.plan(7, 7) == [7]
@@ -0,0 +1,42 @@
+"""Tests of the spatial queries served from the coordinate snapshot"""
+import pytest
+
+pytest.importorskip("homeassistant")
+pytest.importorskip("numpy")
+
+CENTERS = [(0.0, 0.0, 0.0), (12.3, -4.5, 20.1), (-55.5, 40.25, 7.7)]
+
+
+def _rows(systems):
+    return [(system.sid, system.name, system.power, system.power_state, distance) for system, distance in systems]
+
+
+def test_spatial_queries_match_sql(query_paths):
+    async def queries(database):
+        results = []
+        for x, y, z in CENTERS:
+            for k in (1, 5, 40):
+                results.append(await database.get_nearest_systems(x, y, z, k))
+            nearest = results[-1][0][0]
+            results += [
+                await database.get_nearest_systems(x, y, z, 10, exclude_sid=nearest.sid),
+                await database.get_nearest_systems(x, y, z, 10, power="Felicia Winters"),
+                await database.get_nearest_systems(x, y, z, 10, power_state="Control"),
+                await database.get_nearest_systems(
+                    x, y, z, 10, nearest.power, nearest.power_state, exclude_sid=nearest.sid
+                ),
+                await database.get_nearest_systems(x, y, z, 10, power="Unknown Power"),
+                await database.get_systems_within_radius(x, y, z, 30.0),
+                await database.get_systems_within_radius(x, y, z, 30.0, limit=7, exclude_sid=nearest.sid),
+                await database.get_systems_within_radius(x, y, z, 45.0, "Aisling Duval", "Control"),
+                await database.get_systems_within_radius(x, y, z, 0.0),
+            ]
+        return [_rows(systems) for systems in results]
+
+    from_sql, from_snapshot = query_paths(queries)
+    assert any(len(rows) > 10 for rows in from_sql)
+    assert len(from_snapshot) == len(from_sql)
+    for snapshot_rows, sql_rows in zip(from_snapshot, from_sql):
+        # coordinates are stored as 32-bit floats in the snapshot
+        assert [row[:-1] for row in snapshot_rows] == [row[:-1] for row in sql_rows]
+        assert [row[-1] for row in snapshot_rows] == pytest.approx([row[-1] for row in sql_rows], abs=1e-4)
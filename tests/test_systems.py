@@ -0,0 +1,140 @@
+"""Tests of the system data refresh from EDDB"""
+import asyncio
+import gzip
+import json
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from aiohttp import ClientSession, hdrs, web  # noqa: E402
+from aiohttp.test_utils import TestServer  # noqa: E402
+
+from custom_components.ed_integration import systems  # noqa: E402
+from custom_components.ed_integration.db import SYSTEM_COLUMNS  # noqa: E402
+from custom_components.ed_integration.systems import SystemDataService  # noqa: E402
+
+
+class DumpServer:
+    """
+    Stand-in for the EDDB archive serving a gzipped systems dump with an ETag, answering conditional and range
+    requests. Drops the connection halfway through the body once if asked to.
+    """
+
+    def __init__(self):
+        self.etag = None
+        self.body = b""
+        self.drop_next = False
+        self.requests = []
+
+    def publish(self, etag: str, rows) -> None:
+        self.etag = f'"{etag}"'
+        self.body = gzip.compress(json.dumps([dict(zip(SYSTEM_COLUMNS, row)) for row in rows]).encode())
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        self.requests.append(dict(request.headers))
+        headers = {hdrs.ETAG: self.etag, hdrs.CONTENT_ENCODING: "gzip"}
+        if request.headers.get(hdrs.IF_NONE_MATCH) == self.etag:
+            return web.Response(status=304, headers={hdrs.ETAG: self.etag})
+        body, status = self.body, 200
+        if hdrs.RANGE in request.headers and request.headers.get(hdrs.IF_RANGE) == self.etag:
+            start = int(request.headers[hdrs.RANGE][len("bytes="):].rstrip("-"))
+            body, status = body[start:], 206
+            headers[hdrs.CONTENT_RANGE] = f"bytes {start}-{len(self.body) - 1}/{len(self.body)}"
+        response = web.StreamResponse(status=status, headers=headers)
+        response.content_length = len(body)
+        await response.prepare(request)
+        if self.drop_next:
+            self.drop_next = False
+            await response.write(body[:len(body) // 2])
+            await asyncio.sleep(0.1)
+            request.transport.close()
+            return response
+        await response.write(body)
+        await response.write_eof()
+        return response
+
+
+def test_refresh_downloads_conditionally_and_resumes(db_filepath, system_row, monkeypatch):
+    dump = DumpServer()
+    app = web.Application()
+    app.router.add_get("/systems_populated.json", dump.handle)
+    monkeypatch.setattr(systems, "RESUME_DELAY", 0)
+    monkeypatch.setattr(systems, "async_create_clientsession", lambda _hass, **kwargs: ClientSession(**kwargs))
+
+    first = [system_row(sid, f"System {sid}", population=sid, updated_at=100) for sid in range(1, 201)]
+    second = [system_row(sid, f"System {sid}", population=sid * 10, updated_at=200) for sid in range(1, 201)]
+
+    async def run():
+        server = TestServer(app)
+        await server.start_server()
+        monkeypatch.setattr(systems, "URL_EDDB_POP_SYSTEMS_JSON", str(server.make_url("/systems_populated.json")))
+        service = SystemDataService(None)
+        try:
+            dump.publish("v1", first)
+            first_length = len(dump.body)
+            await service._async_refresh(True)
+            after_download = await service.db.get_download_validators(), await service.db.get_system_by_id(7)
+
+            await service._async_refresh(True)
+            after_not_modified = await service.db.get_system_by_id(7)
+
+            dump.publish("v2", second)
+            dump.drop_next = True
+            await service._async_refresh(True)
+            after_resume = await service.db.get_download_validators(), await service.db.get_system_by_id(7)
+            count = await service.db.get_system_count()
+        finally:
+            await service._session.close()
+            service.db.close()
+            await server.close()
+        return first_length, after_download, after_not_modified, after_resume, count
+
+    first_length, (validators, system), not_modified, (resumed_validators, resumed), count = asyncio.run(run())
+
+    assert (validators.etag, validators.content_length) == ('"v1"', first_length)
+    assert system.population == 7
+    assert not_modified.population == 7
+    assert (resumed_validators.etag, resumed_validators.content_length) == ('"v2"', len(dump.body))
+    assert (resumed.population, resumed.updated_at, count) == (70, 200, 200)
+
+    initial, conditional, changed, resume = dump.requests
+    assert hdrs.IF_NONE_MATCH not in initial
+    assert conditional[hdrs.IF_NONE_MATCH] == '"v1"'
+    assert changed[hdrs.IF_NONE_MATCH] == '"v1"'
+    assert resume[hdrs.IF_RANGE] == '"v2"'
+    assert 0 < int(resume[hdrs.RANGE][len("bytes="):].rstrip("-")) < len(dump.body)
+
+
+def test_reset_requested_during_a_refresh_runs_after_it(db_filepath, monkeypatch):
+    monkeypatch.setattr(systems, "async_create_clientsession", lambda _hass, **kwargs: None)
+    service = SystemDataService(None)
+    refreshes = []
+
+    async def run():
+        release = asyncio.Event()
+
+        async def refresh_tracked(incremental, conditional):
+            refreshes.append((incremental, conditional))
+            if len(refreshes) == 1:
+                await release.wait()
+
+        monkeypatch.setattr(service, "_async_refresh_tracked", refresh_tracked)
+        callers = [asyncio.ensure_future(service.async_refresh(24))]
+        while not refreshes:
+            await asyncio.sleep(0)
+        callers.append(asyncio.ensure_future(service.async_refresh(24)))
+        callers += [asyncio.ensure_future(service.async_refresh(24, reset=True)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        running = list(refreshes)
+        release.set()
+        await asyncio.wait_for(asyncio.gather(*callers), 5)
+        return running
+
+    try:
+        running = asyncio.run(run())
+    finally:
+        service.db.close()
+    # the second caller joined the running refresh, both resets share one full rebuild after it
+    assert running == [(True, True)]
+    assert refreshes == [(True, True), (False, False)]